@@ -1,16 +1,15 @@
-import re
-import datetime as dt
 from pathlib import Path
 
 import pandas as pd
 import streamlit as st
-import openpyxl
+
+from schade_data import CACHE_VERSIES, laad_dataset
+from schade_index import NgramIndex, SuggestieIndex, suggestie_indexen
+from schade_opwarmen import registreer
 
 
 APP_DIR = Path(__file__).parent
-XLSM_PATH = APP_DIR / "schade met macro.xlsm"
 LOGO_PATH = APP_DIR / "logo.png"
-SHEET_NAME = "BRON"
 
 REQUIRED_COLS = [
     "personeelsnr",
@@ -28,131 +27,78 @@ def norm(s) -> str:
     return str(s).strip().lower()
 
 
-def parse_year(v) -> int | None:
-    if v is None:
-        return None
-    if isinstance(v, (dt.date, dt.datetime)):
-        return v.year
+def find_bron_col(df: pd.DataFrame, col: str) -> str | None:
+    header_map = {norm(h): h for h in df.columns}
+    key = norm(col)
+    if key in header_map:
+        return header_map[key]
+    # tolerant voor varianten
+    if col == "bus/tram":
+        for alt in ["bus/ tram", "bus / tram", "bus - tram"]:
+            if alt in header_map:
+                return header_map[alt]
+    if col == "volledige naam":
+        for alt in ["naam", "volledige naam.", "volledige naam "]:
+            if alt in header_map:
+                return header_map[alt]
+    return None
 
-    s = str(v).strip()
-    if not s:
-        return None
 
-    m = re.match(r"^(\d{1,2})[/-](\d{1,2})[/-](\d{4})", s)
-    if m:
-        return int(m.group(3))
+def load_bron_df() -> pd.DataFrame:
+    # gedeelde, voorbereide BRON (zie schade_data.bereid_bron_voor): _jaar en _search zitten er al in
+    return laad_dataset().bron
 
-    m2 = re.match(r"^(\d{4})[/-](\d{1,2})[/-](\d{1,2})", s)
-    if m2:
-        return int(m2.group(1))
 
-    try:
-        return dt.datetime.fromisoformat(s).year
-    except Exception:
-        return None
+@st.cache_resource(show_spinner=False, max_entries=CACHE_VERSIES)
+def load_zoekindex(versie: str, _ds) -> NgramIndex:
+    # n-gram-index op _search, één keer per dataset-versie
+    return NgramIndex(_ds.bron["_search"])
 
 
-@st.cache_data(show_spinner=False)
-def load_bron_df() -> pd.DataFrame:
-    if not XLSM_PATH.exists():
-        raise FileNotFoundError(f"Bestand niet gevonden: {XLSM_PATH.name}")
-
-    wb = openpyxl.load_workbook(XLSM_PATH, data_only=True, keep_vba=True)
-    if SHEET_NAME not in wb.sheetnames:
-        raise ValueError(f"Tabblad '{SHEET_NAME}' niet gevonden in {XLSM_PATH.name}")
-
-    ws = wb[SHEET_NAME]
-
-    header = [c.value for c in ws[1]]
-    header_map = {norm(h): idx for idx, h in enumerate(header)}
-
-    def find_idx(col: str) -> int | None:
-        key = norm(col)
-        if key in header_map:
-            return header_map[key]
-        # tolerant voor varianten
-        if col == "bus/tram":
-            for alt in ["bus/ tram", "bus / tram", "bus - tram"]:
-                if alt in header_map:
-                    return header_map[alt]
-        if col == "volledige naam":
-            for alt in ["naam", "volledige naam.", "volledige naam "]:
-                if alt in header_map:
-                    return header_map[alt]
-        return None
-
-    idx_map = {c: find_idx(c) for c in REQUIRED_COLS}
-
-    rows = []
-    for r in ws.iter_rows(min_row=2, values_only=True):
-        obj = {}
-        any_val = False
-        for col in REQUIRED_COLS:
-            i = idx_map.get(col)
-            val = r[i] if (i is not None and i < len(r)) else None
-
-            if val is not None and str(val).strip() != "":
-                any_val = True
-
-            if col == "Datum" and isinstance(val, (dt.date, dt.datetime)):
-                val = val.isoformat()
-
-            obj[col] = val
-
-        if any_val:
-            rows.append(obj)
-
-    df = pd.DataFrame(rows)
-
-    # Zorg dat alle vereiste kolommen bestaan (ook als leeg)
-    for c in REQUIRED_COLS:
-        if c not in df.columns:
-            df[c] = None
-
-    df["_jaar"] = df["Datum"].apply(parse_year)
-
-    # zoekveld index
-    df["_search"] = (
-        df["personeelsnr"].fillna("").astype(str) + " " +
-        df["volledige naam"].fillna("").astype(str) + " " +
-        df["voertuig"].fillna("").astype(str)
-    ).str.lower()
-
-    return df
-
-
-def build_suggestions(df: pd.DataFrame, q: str, limit: int = 10) -> list[str]:
-    q = (q or "").strip().lower()
-    if not q:
-        return []
-
-    candidates = []
-
-    # unieke suggesties uit 3 velden
-    for col in ["personeelsnr", "volledige naam", "voertuig"]:
-        vals = df[col].dropna().astype(str).unique().tolist()
-        for v in vals:
-            if q in v.lower():
-                candidates.append(v)
-
-    # dedup + limit
-    seen = set()
-    out = []
-    for v in candidates:
-        key = v.lower()
-        if key in seen:
-            continue
-        seen.add(key)
-        out.append(v)
-        if len(out) >= limit:
-            break
+def toon_kolommen(df: pd.DataFrame) -> pd.DataFrame:
+    """Enkel REQUIRED_COLS, met de namen zoals in deze app (ontbrekende kolommen leeg)."""
+    out = pd.DataFrame(index=df.index)
+    for col in REQUIRED_COLS:
+        c = find_bron_col(df, col)
+        out[col] = df[c] if c is not None else None
     return out
 
 
+@st.cache_resource(show_spinner=False, max_entries=CACHE_VERSIES)
+def load_suggestie_index(versie: str, _ds) -> dict[int | None, SuggestieIndex]:
+    # per jaar (+ None = alle jaren), uit 3 velden
+    bron = _ds.bron
+    kolommen = [c for c in (find_bron_col(bron, k) for k in ["personeelsnr", "volledige naam", "voertuig"]) if c]
+    return suggestie_indexen(bron, kolommen, "_jaar")
+
+
+_OPWARM_LOADERS = (load_zoekindex, load_suggestie_index)
+
+
+def opwarmen(ds, vorige=None) -> None:
+    # op de achtergrond (schade_opwarmen), ook na een gewijzigd bronbestand;
+    # daarna de entries van de vorige versie weg, de nieuwe vervangt ze
+    try:
+        for loader in _OPWARM_LOADERS:
+            loader(ds.versie, ds)
+    finally:
+        if vorige is not None:
+            for loader in _OPWARM_LOADERS:
+                loader.clear(vorige.versie, vorige)
+
+
+def build_suggestions(jaar: int | None, q: str, limit: int = 10) -> list[str]:
+    # prefix-treffers eerst, dan de rest; telkens meest voorkomend eerst
+    ds = laad_dataset()
+    index = load_suggestie_index(ds.versie, ds).get(jaar)
+    return index.suggesties(q, limit) if index is not None else []
+
+
 # =========================
 # Streamlit UI
 # =========================
 st.set_page_config(page_title="Analyse en rapportering OT Gent", layout="wide")
+registreer("app", opwarmen)
 
 # Sidebar
 with st.sidebar:
@@ -169,14 +115,14 @@ except Exception as e:
     st.stop()
 
 # Jaarfilter
-years = sorted([y for y in df["_jaar"].dropna().unique().tolist() if y is not None], reverse=True)
+years = sorted(laad_dataset().opties["jaren"], reverse=True)
 with st.sidebar:
     year_choice = st.selectbox("Jaar", ["Alle"] + [str(y) for y in years], index=0)
 
 if year_choice != "Alle":
-    df_view = df[df["_jaar"] == int(year_choice)].copy()
+    df_view = df[df["_jaar"] == int(year_choice)]
 else:
-    df_view = df.copy()
+    df_view = df
 
 # Top menu (tabs)
 tab_dashboard, tab_chauffeur, tab_voertuig, tab_locatie, tab_coaching, tab_analyse = st.tabs(
@@ -197,7 +143,7 @@ with tab_dashboard:
         key="q_input",
     )
 
-    suggestions = build_suggestions(df_view, q, limit=10)
+    suggestions = build_suggestions(None if year_choice == "Alle" else int(year_choice), q, limit=10)
 
     # Dropdown met suggesties (bij typen)
     sel = st.selectbox(
@@ -216,14 +162,17 @@ with tab_dashboard:
     q_norm = (st.session_state.q or "").strip().lower()
 
     if q_norm:
-        hits = df_view[df_view["_search"].str.contains(re.escape(q_norm), na=False)].copy()
+        ds = laad_dataset()
+        hits = df.iloc[load_zoekindex(ds.versie, ds).zoek(q_norm)]
+        if year_choice != "Alle":
+            hits = hits[hits["_jaar"] == int(year_choice)]
     else:
-        hits = df_view.copy()
+        hits = df_view
 
     st.caption(f"Records: {len(hits)} (jaarfilter: {year_choice})")
 
     # Toon alleen jouw kolommen
-    hits_show = hits[REQUIRED_COLS].head(200).copy()
+    hits_show = toon_kolommen(hits.head(200))
 
     st.data_editor(
         hits_show,
@@ -0,0 +1,493 @@
+# benchmark.py
+# ============================================================
+# Kleine meetscripts voor de datalaag (geen Streamlit nodig).
+#
+#   python benchmark.py ingest [--rijen 50000]
+#   python benchmark.py datums [--cellen 100000]
+#   python benchmark.py zoeken [--keer 100]
+#   python benchmark.py geheugen [--keer 100]
+#   python benchmark.py rerun [--keer 100]
+#   python benchmark.py export [--keer 100]
+#   python benchmark.py mail [--berichten 200]
+#
+# Elke meting toont de duur (beste van --herhaal) en de piek van
+# het Python-geheugen (tracemalloc) per variant; op Linux ook de
+# RSS-piek boven het vertrekpunt, die ook Arrow-buffers meetelt.
+# ============================================================
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import io
+import re
+import smtplib
+import socketserver
+import tempfile
+import threading
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import schade_bron
+import schade_data
+from schade_bron import MACRO_PATH, SHEET_BRON, lees_blad_kolommen, open_werkboek
+from schade_data import BRON_DIMENSIES, compacteer, geheugen_per_kolom, geheugen_rapport, laad_dataset, to_datetime_utc_series
+from schade_cache import WeergaveCache
+from schade_export import als_bestand, schrijf_export
+from schade_index import BitmapIndex, NgramIndex, zoek_in
+from schade_mail import Mailer, SmtpConfig, bericht
+
+
+_STATUS = Path("/proc/self/status")
+
+
+def _rss() -> tuple[int, int] | None:
+    """(huidig, piek) RSS in bytes, of None buiten Linux."""
+    try:
+        vm = dict(r.split(":", 1) for r in _STATUS.read_text().splitlines() if r.startswith("Vm"))
+        return int(vm["VmRSS"].split()[0]) * 1024, int(vm["VmHWM"].split()[0]) * 1024
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def meet(label: str, fn, herhaal: int = 3) -> None:
+    beste = float("inf")
+    for _ in range(herhaal):
+        t0 = time.perf_counter()
+        fn()
+        beste = min(beste, time.perf_counter() - t0)
+    try:
+        Path("/proc/self/clear_refs").write_text("5")   # RSS-piek terugzetten
+        start = _rss()
+    except OSError:
+        start = None
+    tracemalloc.start()
+    fn()
+    _, piek = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = f"   rss +{(_rss()[1] - start[0]) / 2**20:7.1f} MiB" if start else ""
+    print(f"  {label:<42} {beste * 1000:9.1f} ms   piek {piek / 2**20:8.1f} MiB{rss}")
+
+
+# ============================================================
+# INGEST
+# ============================================================
+def _synthetisch_werkboek(rijen: int, map_: Path) -> Path:
+    """Werkboek met één BRON-blad: de echte BRON-rijen herhaald tot `rijen`."""
+    import openpyxl
+
+    bron = schade_bron.lees_macro_bladen(bladen=(SHEET_BRON,))[SHEET_BRON]
+    bron = bron[bron.notna().any(axis=1)]
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(SHEET_BRON)
+    ws.append(list(bron.columns))
+    waarden = bron.astype(object).where(bron.notna(), None).values.tolist()
+    for i in range(rijen):
+        ws.append([v.to_pydatetime() if isinstance(v, pd.Timestamp) else v for v in waarden[i % len(waarden)]])
+    pad = map_ / f"bron_{rijen}.xlsx"
+    wb.save(pad)
+    return pad
+
+
+def _oud_app_load(pad: Path) -> pd.DataFrame:
+    # de oorspronkelijke load_bron_df: volledige celboom + dict per rij
+    import openpyxl
+
+    wb = openpyxl.load_workbook(pad, data_only=True, keep_vba=pad.suffix == ".xlsm")
+    ws = wb[SHEET_BRON]
+    header = [c.value for c in ws[1]]
+    rows = []
+    for r in ws.iter_rows(min_row=2, values_only=True):
+        obj = {}
+        for i, h in enumerate(header):
+            val = r[i] if i < len(r) else None
+            if h == "Datum" and isinstance(val, (dt.date, dt.datetime)):
+                val = val.isoformat()
+            obj[h] = val
+        rows.append(obj)
+    return pd.DataFrame(rows)
+
+
+def _streaming(pad: Path) -> pd.DataFrame:
+    wb = open_werkboek(pad)
+    try:
+        return lees_blad_kolommen(wb[SHEET_BRON])
+    finally:
+        wb.close()
+
+
+def bench_ingest(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        pad = _synthetisch_werkboek(args.rijen, Path(tmp)) if args.rijen else MACRO_PATH
+        print(f"BRON inlezen uit {pad.name} ({args.rijen or 'echte'} rijen)")
+        meet("load_workbook + dict per rij (oud)", lambda: _oud_app_load(pad), args.herhaal)
+        meet("pd.read_excel", lambda: pd.read_excel(pad, sheet_name=SHEET_BRON), args.herhaal)
+        meet("read-only streaming naar kolommen", lambda: _streaming(pad), args.herhaal)
+
+
+# ============================================================
+# DATUMS
+# ============================================================
+def _oud_to_datetime_utc_series(s: pd.Series) -> pd.Series:
+    # de oorspronkelijke versie: parse_one per cel via .apply
+    def parse_one(x):
+        if pd.isna(x):
+            return pd.NaT
+        if isinstance(x, (dt.datetime, pd.Timestamp)):
+            return pd.to_datetime(x, utc=True, errors="coerce")
+        if isinstance(x, (int, float)) and not pd.isna(x):
+            return pd.to_datetime("1899-12-30", utc=True) + pd.to_timedelta(float(x), unit="D")
+        try:
+            return pd.to_datetime(str(x), utc=True, errors="coerce", dayfirst=True)
+        except Exception:
+            return pd.NaT
+
+    return pd.to_datetime(s.apply(parse_one), utc=True)
+
+
+def _gemengde_datums(cellen: int) -> pd.Series:
+    """Kolom zoals in de Excel-bestanden: datetimes, seriële getallen, tekst (dayfirst), leeg, rommel."""
+    rng = np.random.default_rng(7)
+    dagen = rng.integers(0, 6 * 365, cellen)
+    basis = dt.datetime(2020, 1, 1)
+    soort = rng.integers(0, 6, cellen)
+    waarden = []
+    for d, k in zip(dagen.tolist(), soort.tolist()):
+        dag = basis + dt.timedelta(days=d)
+        if k == 0:
+            waarden.append(dag)
+        elif k == 1:
+            waarden.append(43831 + d)
+        elif k == 2:
+            waarden.append(dag.strftime("%d/%m/%Y"))
+        elif k == 3:
+            waarden.append(dag.strftime("%Y-%m-%d %H:%M"))
+        elif k == 4:
+            waarden.append(None)
+        else:
+            waarden.append("onbekend" if d % 2 else 43831.5 + d)
+    return pd.Series(waarden, dtype=object)
+
+
+def bench_datums(args) -> None:
+    s = _gemengde_datums(args.cellen)
+    print(f"Datums omzetten: {len(s)} gemengde cellen")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # dayfirst-waarschuwingen van de oude versie
+        oud = _oud_to_datetime_utc_series(s)
+        meet("parse_one per cel (oud)", lambda: _oud_to_datetime_utc_series(s), args.herhaal)
+    nieuw = to_datetime_utc_series(s)
+    meet("gevectoriseerd per soort", lambda: to_datetime_utc_series(s), args.herhaal)
+    gelijk = (oud == nieuw) | (oud.isna() & nieuw.isna())
+    print(f"  identiek resultaat: {'ja' if gelijk.all() else f'NEE ({int((~gelijk).sum())} verschillen)'}")
+
+
+# ============================================================
+# ZOEKEN
+# ============================================================
+ZOEK_KOLOMMEN = ("volledige naam", "personeelsnr", "voertuig")
+ZOEKTERMEN = ("k", "ker", "kerremans", "410", "van de", "xyz")
+
+
+def bench_zoeken(args) -> None:
+    bron = laad_dataset().bron
+    bron = pd.concat([bron] * args.keer, ignore_index=True)  # zoveel jaren historiek
+    print(f"Zoeken in {len(bron)} BRON-rijen (naam, P-nr, voertuig)")
+    teksten = [bron[c].astype(str).str.lower() for c in ZOEK_KOLOMMEN]
+
+    def contains():
+        for q in ZOEKTERMEN:
+            m = np.zeros(len(bron), dtype=bool)
+            for t in teksten:
+                m |= t.str.contains(re.escape(q), na=False).to_numpy()
+
+    indexen = [NgramIndex(t) for t in teksten]
+    meet("index opbouwen (één keer per versie)", lambda: [NgramIndex(t) for t in teksten], 1)
+    meet(f"str.contains, {len(ZOEKTERMEN)} zoektermen", contains, args.herhaal)
+    meet(f"n-gram-index, {len(ZOEKTERMEN)} zoektermen", lambda: [zoek_in(indexen, q) for q in ZOEKTERMEN], args.herhaal)
+
+
+# ============================================================
+# GEHEUGEN
+# ============================================================
+def _mib(b) -> str:
+    return f"{b / 2**20:8.2f} MiB"
+
+
+def bench_geheugen(args) -> None:
+    # dataset zoals ingelezen (SCHADE_COMPACT=0) vs. compact, per tabel
+    rapporten = {}
+    for compact in (False, True):
+        schade_data.COMPACT = compact
+        rapporten[compact] = geheugen_rapport(schade_data._bouw_dataset(f"meting-{compact}"))
+    r = rapporten[False].assign(compact=rapporten[True]["bytes"])
+    print("Geheugen per tabel (deep)")
+    for t in r.itertuples():
+        print(f"  {t.tabel:<20} {t.rijen:>7} rijen  {_mib(t.bytes)} → {_mib(t.compact)}")
+    print(f"  {'totaal':<20} {'':>13}  {_mib(r['bytes'].sum())} → {_mib(r['compact'].sum())}")
+
+    bron = laad_dataset().bron
+    bron = pd.concat([bron.astype({c: "string" for c in BRON_DIMENSIES})] * args.keer, ignore_index=True)
+    compact = compacteer(bron, BRON_DIMENSIES)
+    print(f"\nBRON x{args.keer} ({len(bron)} rijen), dimensiekolommen:")
+    for naam, df in (("tekst", bron), ("category", compact)):
+        b = geheugen_per_kolom(df[list(BRON_DIMENSIES)])["bytes"].sum()
+        print(f"  {naam:<42} {_mib(b)}")
+    keuze = bron["teamcoach_disp"].dropna().unique()[:3].tolist()
+    for naam, df in (("tekst", bron), ("category", compact)):
+        meet(f"isin teamcoach ({naam})", lambda: df["teamcoach_disp"].isin(keuze), args.herhaal)
+        meet(f"groupby locatie ({naam})", lambda: df.groupby("Locatie_disp", observed=True).size(), args.herhaal)
+
+
+# ============================================================
+# RERUN (filterpijplijn van historie.py)
+# ============================================================
+def _normaliseer(kolommen: pd.Index) -> pd.Index:
+    return kolommen.astype(str).str.normalize("NFKC").str.strip()
+
+
+def _afgeleid(f: pd.DataFrame) -> tuple:
+    # wat de tabs per rerun uit de selectie halen
+    disp = f[["volledige naam", "volledige naam_disp"]].dropna().drop_duplicates().set_index("volledige naam")
+    pnrs = frozenset(f["dienstnummer"].dropna().astype(str))
+    return disp, pnrs, f["dienstnummer"].dropna().astype(str).value_counts()
+
+
+def _oud_rerun(df: pd.DataFrame, keuze: dict, ids: set) -> tuple:
+    # de oorspronkelijke pijplijn: vlag op heel BRON, isin-maskers, drie kopieën
+    df = df.assign(gecoacht_geel=df["dienstnummer"].isin(ids), gecoacht_blauw=df["dienstnummer"].isin(ids))
+    mask = (
+        df["teamcoach_disp"].isin(keuze["teamcoach"])
+        & df["Locatie_disp"].isin(keuze["locatie"])
+        & df["BusTram_disp"].isin(keuze["voertuig"])
+    )
+    f = df.loc[mask].copy()
+    f = f[(f["Datum"] >= df["Datum"].min()) & (f["Datum"] <= df["Datum"].max())]
+    f = f.copy()
+    f.columns = _normaliseer(f.columns)
+    return _afgeleid(f)
+
+
+def _nieuw_rerun(df: pd.DataFrame, vlaggen: pd.DataFrame, bitmaps: BitmapIndex, keuze: dict,
+                 cache: WeergaveCache | None = None) -> tuple:
+    # rijposities + enkel de nodige kolommen; met cache: aggregaten uit de LRU
+    df = pd.concat([df, vlaggen], axis=1)
+    df_n = df.set_axis(_normaliseer(df.columns), axis=1)
+    if cache is None:
+        rijen = bitmaps.rijen(**keuze)
+        return _afgeleid(df_n[["volledige naam", "volledige naam_disp", "dienstnummer"]].iloc[rijen])
+    w = cache.weergave("meting", "historie", keuze, lambda: bitmaps.rijen(**keuze))
+    return w.aggregaat("afgeleid", lambda: _afgeleid(
+        w.pas_toe(df_n[["volledige naam", "volledige naam_disp", "dienstnummer"]])
+    ))
+
+
+def bench_rerun(args) -> None:
+    bron = laad_dataset().bron
+    bron = pd.concat([bron] * args.keer, ignore_index=True)
+    keuze = {
+        "teamcoach": bron["teamcoach_disp"].dropna().unique().tolist(),
+        "locatie": bron["Locatie_disp"].dropna().unique().tolist(),
+        "voertuig": bron["BusTram_disp"].dropna().unique().tolist(),
+    }
+    ids = set(bron["dienstnummer"].dropna().unique()[::3])
+    print(f"Rerun van historie.py op {len(bron)} BRON-rijen, alle filterwaarden gekozen")
+
+    vlaggen = pd.DataFrame({"gecoacht_geel": bron["dienstnummer"].isin(ids), "gecoacht_blauw": bron["dienstnummer"].isin(ids)})
+    bitmaps = BitmapIndex({k: bron[c] for k, c in (("teamcoach", "teamcoach_disp"), ("locatie", "Locatie_disp"),
+                                                    ("voertuig", "BusTram_disp"))})
+    cache = WeergaveCache()
+    _nieuw_rerun(bron, vlaggen, bitmaps, keuze, cache)   # eerste bezoek: misser
+
+    meet("isin + kopieën (oud)", lambda: _oud_rerun(bron, keuze, ids), args.herhaal)
+    meet("bitmaps + rijposities", lambda: _nieuw_rerun(bron, vlaggen, bitmaps, keuze), args.herhaal)
+    meet("bitmaps + LRU-treffer", lambda: _nieuw_rerun(bron, vlaggen, bitmaps, keuze, cache), args.herhaal)
+    oud, nieuw = _oud_rerun(bron, keuze, ids), _nieuw_rerun(bron, vlaggen, bitmaps, keuze)
+    gelijk = oud[0].equals(nieuw[0]) and oud[1] == nieuw[1] and oud[2].equals(nieuw[2])
+    print(f"  identiek resultaat: {'ja' if gelijk else 'NEE'}")
+
+
+# ============================================================
+# EXPORT
+# ============================================================
+def bench_export(args) -> None:
+    bron = laad_dataset().bron
+    bron = pd.concat([bron] * args.keer, ignore_index=True)
+    rijen = np.arange(0, len(bron), 2)
+    print(f"Export van {len(rijen)} van {len(bron)} BRON-rijen")
+
+    tabellen = {"Schades": (bron, rijen)}
+
+    # telkens tot en met de bytes die st.download_button bewaart
+    def oud_csv():
+        # de oorspronkelijke df_to_csv_bytes: kopie van de selectie + hele CSV als string
+        return bron.iloc[rijen].to_csv(index=False).encode("utf-8")
+
+    def in_buffer(formaat):
+        # per blok, maar het hele bestand in een BytesIO
+        buf = io.BytesIO()
+        schrijf_export(tabellen, formaat, buf)
+        return buf.getvalue()
+
+    def op_schijf(formaat):
+        # zoals de app: tijdelijk bestand (als_bestand), dat Streamlit één keer inleest
+        with als_bestand(tabellen, formaat) as f:
+            return f.read()
+
+    meet("CSV: kopie + to_csv (oud)", oud_csv, args.herhaal)
+    for formaat in ("csv", "parquet", "xlsx"):
+        herhaal = 1 if formaat == "xlsx" else args.herhaal
+        meet(f"{formaat}: per blok in BytesIO", lambda: in_buffer(formaat), herhaal)
+        meet(f"{formaat}: per blok via tijdelijk bestand", lambda: op_schijf(formaat), herhaal)
+        print(f"  {'':<42} {len(op_schijf(formaat)) / 2**20:9.1f} MiB bestand")
+
+
+# ============================================================
+# MAIL
+# ============================================================
+class _SmtpStandIn(socketserver.ThreadingTCPServer):
+    """
+    Lokale SMTP-stand-in: aanvaardt alles, telt sessies en berichten.
+    `handshake` s wachten per nieuwe verbinding (TCP + TLS + login bij een
+    echte server); elke `weiger`-de RCPT krijgt een tijdelijke 451.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake: float, weiger: int = 0):
+        super().__init__(("127.0.0.1", 0), _SmtpSessie)
+        self.handshake, self.weiger = handshake, weiger
+        self.sessies = self.berichten = self.rcpt = 0
+        self.lock = threading.Lock()
+
+
+class _SmtpSessie(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        srv = self.server
+        time.sleep(srv.handshake)
+        with srv.lock:
+            srv.sessies += 1
+
+        def antwoord(*regels: str) -> None:
+            self.wfile.write("".join(r + "\r\n" for r in regels).encode())
+
+        antwoord("220 stand-in")
+        in_data = False
+        for raw in self.rfile:
+            regel = raw.decode("utf-8", "replace").rstrip("\r\n")
+            if in_data:
+                if regel == ".":
+                    in_data = False
+                    with srv.lock:
+                        srv.berichten += 1
+                    antwoord("250 OK")
+                continue
+            cmd = regel[:4].upper()
+            if cmd == "EHLO":
+                antwoord("250-stand-in", "250 8BITMIME")
+            elif cmd == "RCPT":
+                with srv.lock:
+                    srv.rcpt += 1
+                    weiger = srv.weiger and srv.rcpt % srv.weiger == 0
+                antwoord("451 probeer later" if weiger else "250 OK")
+            elif cmd == "DATA":
+                in_data = True
+                antwoord("354 einde met .")
+            elif cmd == "QUIT":
+                antwoord("221 tot ziens")
+                return
+            else:                       # HELO, MAIL, RSET, NOOP
+                antwoord("250 OK")
+
+
+def bench_mail(args) -> None:
+    server = _SmtpStandIn(args.handshake / 1000, args.weiger)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cfg = SmtpConfig(host="127.0.0.1", port=server.server_address[1], afzender="bench@example.org", starttls=False)
+    berichten = [bericht(cfg, f"chauffeur{i}@example.org", "Je verificatiecode", f"Code: {i:06d}")
+                 for i in range(args.berichten)]
+    weigering = f", elke {args.weiger}e ontvanger tijdelijk geweigerd" if args.weiger else ""
+    print(f"{args.berichten} berichten naar een lokale SMTP-stand-in ({args.handshake:g} ms handshake per verbinding{weigering})")
+
+    def tel_opnieuw():
+        with server.lock:
+            server.sessies = server.berichten = 0
+
+    def oud():
+        # de oorspronkelijke _send_email: per bericht verbinden, versturen, afsluiten
+        tel_opnieuw()
+        for msg in berichten:
+            with smtplib.SMTP(cfg.host, cfg.port) as s:
+                s.send_message(msg)
+
+    def nieuw():
+        tel_opnieuw()
+        mailer = Mailer(cfg, backoff=0.01)
+        fouten = [f.exception() for f in mailer.verstuur_batch(berichten)]
+        mailer.stop()
+        return mailer.stats(), sum(f is not None for f in fouten)
+
+    for label, fn in (("per bericht een sessie (oud)", oud), ("pool + wachtrij + batches", nieuw)):
+        if label.endswith("(oud)") and args.weiger:
+            continue        # het oude pad kent geen nieuwe pogingen
+        meet(label, fn, 1)
+        print(f"  {'':<42} {server.sessies} sessies, {server.berichten} berichten afgeleverd")
+    stats, fouten = nieuw()
+    print(f"  mailer: {stats} · {fouten} definitief mislukt")
+    server.shutdown()
+
+
+# ============================================================
+# MAIN
+# ============================================================
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Metingen voor de schade-datalaag.")
+    sub = parser.add_subparsers(dest="meting", required=True)
+
+    p = sub.add_parser("ingest", help="BRON inlezen: oud vs. read_excel vs. streaming")
+    p.add_argument("--rijen", type=int, default=0, help="synthetisch werkboek met zoveel rijen (0 = echt werkboek)")
+    p.add_argument("--herhaal", type=int, default=3)
+    p.set_defaults(func=bench_ingest)
+
+    p = sub.add_parser("datums", help="Excel-datums omzetten: per cel vs. gevectoriseerd")
+    p.add_argument("--cellen", type=int, default=100_000)
+    p.add_argument("--herhaal", type=int, default=3)
+    p.set_defaults(func=bench_datums)
+
+    p = sub.add_parser("zoeken", help="zoekvak: str.contains vs. n-gram-index")
+    p.add_argument("--keer", type=int, default=100, help="BRON zoveel keer herhalen")
+    p.add_argument("--herhaal", type=int, default=3)
+    p.set_defaults(func=bench_zoeken)
+
+    p = sub.add_parser("geheugen", help="geheugen per tabel + isin/groupby: tekst vs. category")
+    p.add_argument("--keer", type=int, default=100, help="BRON zoveel keer herhalen")
+    p.add_argument("--herhaal", type=int, default=3)
+    p.set_defaults(func=bench_geheugen)
+
+    p = sub.add_parser("rerun", help="filterpijplijn per rerun: isin + kopieën vs. rijposities")
+    p.add_argument("--keer", type=int, default=100, help="BRON zoveel keer herhalen")
+    p.add_argument("--herhaal", type=int, default=3)
+    p.set_defaults(func=bench_rerun)
+
+    p = sub.add_parser("export", help="export van een selectie: CSV in één stuk vs. per blok (CSV/Parquet/XLSX)")
+    p.add_argument("--keer", type=int, default=100, help="BRON zoveel keer herhalen")
+    p.add_argument("--herhaal", type=int, default=3)
+    p.set_defaults(func=bench_export)
+
+    p = sub.add_parser("mail", help="OTP-mails: per bericht een SMTP-sessie vs. pool + wachtrij")
+    p.add_argument("--berichten", type=int, default=200)
+    p.add_argument("--handshake", type=float, default=50, help="ms per nieuwe verbinding (TLS + login nabootsen)")
+    p.add_argument("--weiger", type=int, default=0, help="elke n-de ontvanger tijdelijk weigeren (0 = nooit)")
+    p.set_defaults(func=bench_mail)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,70 +26,47 @@
 
 from __future__ import annotations
 
+import os
 import re
-from pathlib import Path
-from datetime import datetime
+from dataclasses import dataclass
 
 import numpy as np
 import pandas as pd
 import plotly.express as px
 import streamlit as st
 
+from schade_data import (
+    CACHE_VERSIES,
+    FILE_COACHING,
+    FILE_GESPREKKEN,
+    FILE_SCHADE,
+    HASTUS_KOLOMMEN,
+    PNR_KOLOM,
+    find_col,
+    laad_dataset,
+    norm,
+    pnr_to_clean_string,
+    to_datetime_utc_series,
+)
+from schade_cache import WeergaveCache
+from schade_index import NaamIndex, NgramIndex, PnrIndex, naam_index, zoek_in
+from schade_kubus import Kubus
+from schade_opwarmen import registreer
+from schade_tabel import gepagineerde_tabel
+
 # ============================================================
 # CONFIG
 # ============================================================
 st.set_page_config(page_title="OT GENT - Overzicht & rapportering", layout="wide")
 
-BASE_DIR = Path(__file__).parent
-
-FILE_SCHADE = BASE_DIR / "schade met macro.xlsm"
-FILE_COACHING = BASE_DIR / "Coachingslijst.xlsx"
-FILE_GESPREKKEN = BASE_DIR / "Overzicht gesprekken (aangepast).xlsx"
-
-SHEET_BRON = "BRON"
-SHEET_HASTUS = "data hastus"
-SHEET_COACH_DONE = "Voltooide coachings"
-SHEET_COACH_PENDING = "Coaching"
+# cache-statistieken enkel met ?admin=<ADMIN_TOKEN> in de URL (geen token = nooit)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "").strip()
 
+# bestanden en tabbladen: zie schade_data.py (gedeelde dataset)
 
 # ============================================================
 # HELPERS
 # ============================================================
-def norm(x) -> str:
-    return str(x).strip().lower() if x is not None else ""
-
-
-def find_col(df: pd.DataFrame, possible_names: list[str]) -> str | None:
-    cols_norm = {norm(c): c for c in df.columns}
-    for name in possible_names:
-        key = norm(name)
-        if key in cols_norm:
-            return cols_norm[key]
-    return None
-
-
-def to_datetime_utc_series(s: pd.Series) -> pd.Series:
-    def parse_one(x):
-        if pd.isna(x):
-            return pd.NaT
-        if isinstance(x, (datetime, pd.Timestamp)):
-            return pd.to_datetime(x, utc=True, errors="coerce")
-        if isinstance(x, (int, float)) and not pd.isna(x):
-            return pd.to_datetime("1899-12-30", utc=True) + pd.to_timedelta(float(x), unit="D")
-        try:
-            return pd.to_datetime(str(x), utc=True, errors="coerce", dayfirst=True)
-        except Exception:
-            return pd.NaT
-
-    return s.apply(parse_one)
-
-
-def safe_read_excel(path: Path, sheet_name=None) -> pd.DataFrame:
-    if not path.exists():
-        raise FileNotFoundError(f"Bestand niet gevonden: {path.name}")
-    return pd.read_excel(path, sheet_name=sheet_name, engine="openpyxl")
-
-
 def clean_url(v) -> str:
     if v is None:
         return ""
@@ -105,24 +82,6 @@ def looks_like_pnr(term: str) -> bool:
     return bool(re.fullmatch(r"\d{4,}", term.strip()))
 
 
-def pnr_to_clean_string(v) -> str:
-    """Fix Excel floats zoals 41520.0 -> 41520"""
-    if v is None:
-        return ""
-    if isinstance(v, float) and np.isnan(v):
-        return ""
-    try:
-        f = float(v)
-        if f.is_integer():
-            return str(int(f))
-    except Exception:
-        pass
-    s = str(v).strip()
-    if re.fullmatch(r"\d+\.0", s):
-        return s.split(".")[0]
-    return s
-
-
 def gesprekken_keep_columns(df: pd.DataFrame) -> list[str]:
     """
     Toon alleen echte gesprek-kolommen.
@@ -135,7 +94,7 @@ def gesprekken_keep_columns(df: pd.DataFrame) -> list[str]:
     if pref_real:
         return pref_real
 
-    drop_patterns = [r"^unnamed:", r"^maand$", r"^jaar$", r"^aantal$", r"^in dienst$"]
+    drop_patterns = [r"^unnamed:", r"^maand$", r"^jaar$", r"^aantal$", r"^in dienst$", r"^_"]
     keep = []
     for c in df.columns:
         cn = norm(c)
@@ -172,79 +131,203 @@ if missing:
 # ============================================================
 # LOAD DATA (cached)
 # ============================================================
-@st.cache_data(show_spinner=True)
-def load_schade() -> tuple[pd.DataFrame, pd.DataFrame]:
-    df_bron = safe_read_excel(FILE_SCHADE, sheet_name=SHEET_BRON)
-    df_bron.columns = [str(c).strip() for c in df_bron.columns]
+def _coaching(ds) -> tuple[pd.Series, set[str], int, int]:
+    # uit de coaching-events van de dataset
+    ev = ds.coachings
+    pending = ev.loc[ev["status"].eq("Coaching"), "pnr"]  # P-nr (kolom D)
+
+    # voltooide coachings met een herkenbare beoordeling → per P-nr de datums
+    # (oplopend, regels zonder datum tellen wel mee maar tonen geen datum)
+    done = ev[ev["status"].eq("Voltooid")]
+    klasse = done["beoordeling"].map({b: coaching_status_from_text(b) for b in done["beoordeling"].dropna().unique()})
+    done = done[klasse.notna()].sort_values("datum", kind="stable", na_position="last")
+    coaching_map = (
+        done.assign(datum=done["datum"].dt.strftime("%d/%m/%Y"))
+        .groupby("pnr", sort=False)["datum"].agg(lambda d: d.dropna().tolist())
+    )
+    return coaching_map, set(pending), len(ds.coaching_voltooid), len(pending)
+
+
+@dataclass(frozen=True)
+class Model:
+    """Alles wat enkel van de data afhangt (niet van filters of knoppen), één keer per dataset-versie."""
+    coaching_map: pd.Series             # P-nr → datums voltooide coachings (dd/mm/YYYY)
+    coaching_pending: set[str]          # P-nrs met lopende coaching
+    done_raw: int
+    pending_raw: int
+    done_in_damage: int                 # voltooid/lopend én in BRON
+    pending_in_damage: int
+    gesprekken: pd.DataFrame            # + _dt, _jaar, _datum (dd/mm/YYYY)
+    gesprek_cols: list[str]
+    gesprek_datum_col: str | None
+    hastus_pnrs: pd.Series | None       # P-nrs uit 'data hastus' (None = geen P-nr kolom)
+    hastus_verdeling: pd.DataFrame | None  # P-nrs per 10.000-tal
+
+
+@st.cache_resource(show_spinner=False, max_entries=CACHE_VERSIES)
+def load_model(versie: str, _ds) -> Model:
+    # eenmaal per dataset-versie, gedeeld door alle sessies; een rerun filtert en tekent enkel nog
+    coaching_map, pending, done_raw, pending_raw = _coaching(_ds)
+    damage_pnrs = pd.Index(_ds.bron[PNR_KOLOM].dropna().unique())
+
+    g = _ds.gesprekken
+    gesprek_datum_col = find_col(g, ["datum"])
+    if gesprek_datum_col:
+        dt = to_datetime_utc_series(g[gesprek_datum_col])
+        g = g.assign(_dt=dt, _jaar=dt.dt.year, _datum=dt.dt.strftime("%d/%m/%Y"))
+
+    hastus = _ds.hastus
+    col_h_pnr = find_col(hastus, HASTUS_KOLOMMEN) if not hastus.empty else None
+    hastus_pnrs = hastus_verdeling = None
+    if col_h_pnr:
+        hastus_pnrs = hastus[PNR_KOLOM].dropna()
+        bin_size = 10000
+        bins = (pd.to_numeric(hastus[col_h_pnr], errors="coerce").dropna().astype(int) // bin_size) * bin_size
+        counts = bins.value_counts().sort_index()
+        hastus_verdeling = pd.DataFrame({
+            "Range": [f"{b}–{b + bin_size - 1}" for b in counts.index.tolist()],
+            "Aantal": counts.values,
+        })
+
+    return Model(
+        coaching_map=coaching_map,
+        coaching_pending=pending,
+        done_raw=done_raw,
+        pending_raw=pending_raw,
+        done_in_damage=int(coaching_map.index.isin(damage_pnrs).sum()),
+        pending_in_damage=int(damage_pnrs.isin(pending).sum()),
+        gesprekken=g,
+        gesprek_cols=gesprekken_keep_columns(_ds.gesprekken),
+        gesprek_datum_col=gesprek_datum_col,
+        hastus_pnrs=hastus_pnrs,
+        hastus_verdeling=hastus_verdeling,
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=CACHE_VERSIES)
+def load_zoekindex(versie: str, _ds, kolommen: tuple[str, ...]) -> list[NgramIndex]:
+    # n-gram-index per zoekkolom van BRON (zelfde tekst als astype(str).str.lower())
+    return [NgramIndex(_ds.bron[c].astype(str).str.lower()) for c in kolommen]
 
-    df_hastus = pd.DataFrame()
-    try:
-        df_hastus = safe_read_excel(FILE_SCHADE, sheet_name=SHEET_HASTUS)
-        df_hastus.columns = [str(c).strip() for c in df_hastus.columns]
-    except Exception:
-        df_hastus = pd.DataFrame()
 
-    return df_bron, df_hastus
+@st.cache_resource(show_spinner=False, max_entries=CACHE_VERSIES)
+def load_pnr_indexen(versie: str, _ds) -> dict[str, PnrIndex]:
+    # P-nr → rijposities in BRON en gesprekken
+    return {"bron": PnrIndex(_ds.bron[PNR_KOLOM]), "gesprekken": PnrIndex(_ds.gesprekken.get(PNR_KOLOM))}
 
 
-@st.cache_data(show_spinner=True)
-def load_coaching() -> tuple[pd.DataFrame, set[str], int, int]:
-    done_df = pd.DataFrame()
-    pending_set: set[str] = set()
-    done_raw = 0
-    pending_raw = 0
+@st.cache_resource(show_spinner=False, max_entries=CACHE_VERSIES)
+def load_kubus(versie: str, _ds, kolommen: tuple[tuple[str, str], ...]) -> Kubus:
+    # telkubus over BRON: jaar/kwartaal/maand + (dimensie, BRON-kolom)-paren
+    df = _ds.bron
+    dimensies = {"jaar": df["_jaar"], "kwartaal": df["KwartaalP"], "maand": df["Datum"].dt.month}
+    dimensies.update({dim: df[col] for dim, col in kolommen})
+    return Kubus(dimensies)
 
-    xls = pd.ExcelFile(FILE_COACHING, engine="openpyxl")
 
-    if SHEET_COACH_DONE in xls.sheet_names:
-        done_df = pd.read_excel(xls, sheet_name=SHEET_COACH_DONE)
-        done_df.columns = [str(c).strip() for c in done_df.columns]
-        done_raw = len(done_df)
+@st.cache_resource(show_spinner=False)
+def filter_cache() -> WeergaveCache:
+    # één LRU van gefilterde weergaven per proces: gedeeld over alle sessies
+    return WeergaveCache()
 
-    if SHEET_COACH_PENDING in xls.sheet_names:
-        pending_sheet = pd.read_excel(xls, sheet_name=SHEET_COACH_PENDING, header=None)
-        if pending_sheet.shape[1] >= 4:
-            col = pending_sheet.iloc[1:, 3]  # kolom D
-            for v in col.dropna().astype(str).map(str.strip):
-                if v:
-                    pending_raw += 1
-                    pending_set.add(v)
 
-    return done_df, pending_set, done_raw, pending_raw
+@st.cache_resource(show_spinner=False, max_entries=CACHE_VERSIES)
+def load_naamindex(versie: str, _ds) -> NaamIndex:
+    # fuzzy namen uit BRON, coachingslijst en gesprekken
+    return naam_index(_ds)
 
 
-@st.cache_data(show_spinner=True)
-def load_gesprekken() -> pd.DataFrame:
-    df = safe_read_excel(FILE_GESPREKKEN, sheet_name=0)
-    df.columns = [str(c).strip() for c in df.columns]
-    return df
+def fuzzy_naam(term: str, key: str) -> tuple[str, set] | None:
+    """Bij 0 treffers: dichtste chauffeursnamen voorstellen. (gekozen naam, spellingen) of None."""
+    if looks_like_pnr(term):
+        return None
+    index = load_naamindex(ds.versie, ds)
+    kandidaten = [naam for naam, _ in index.zoek(term, k=5)]
+    if not kandidaten:
+        return None
+    keuze = st.selectbox("Geen exacte treffers. Bedoelde je…", kandidaten, key=key)
+    return keuze, index.spellingen(keuze)
+
+
+def bron_kolommen(df: pd.DataFrame) -> dict[str, str | None]:
+    """Naam van elke gebruikte BRON-kolom (None = ontbreekt)."""
+    return {
+        "datum": find_col(df, ["datum"]),
+        "naam": find_col(df, ["volledige naam", "chauffeur", "naam", "bestuurder"]),
+        "voertuigtype": find_col(df, ["bus/tram", "bus/ tram", "voertuigtype", "type voertuig"]),
+        "voertuignr": find_col(df, ["voertuig", "voertuignummer", "voertuig nr", "busnummer", "tramnummer", "voertuignr"]),
+        "type": find_col(df, ["type"]),
+        "locatie": find_col(df, ["locatie"]),
+        "link": find_col(df, ["link"]),
+        "pnr": find_col(df, ["personeelsnr", "personeelsnummer", "personeels nr", "p-nr", "p nr"]),
+        "teamcoach": find_col(df, ["teamcoach"]),
+    }
+
+
+def zoek_kolommen(kol: dict) -> tuple[str, ...]:
+    return tuple(c for c in (kol["naam"], kol["pnr"], kol["voertuignr"] or kol["voertuigtype"]) if c)
+
+
+def kubus_kolommen(kol: dict) -> tuple[tuple[str, str], ...]:
+    return tuple(
+        (dim, kol[k]) for dim, k in (
+            ("teamcoach", "teamcoach"), ("locatie", "locatie"), ("voertuig", "voertuigtype"),
+            ("type", "type"), ("chauffeur", "naam"),
+        ) if kol[k]
+    )
+
+
+def _opwarm_sleutels(ds) -> list:
+    # (loader, argumenten): dezelfde cachesleutels als hieronder
+    kol = bron_kolommen(ds.bron)
+    return [
+        (load_model, (ds.versie, ds)),
+        (load_pnr_indexen, (ds.versie, ds)),
+        (load_zoekindex, (ds.versie, ds, zoek_kolommen(kol))),
+        (load_kubus, (ds.versie, ds, kubus_kolommen(kol))),
+        (load_naamindex, (ds.versie, ds)),
+    ]
 
 
-df_bron, df_hastus = load_schade()
-df_coach_done, coaching_pending_set, done_raw_count, pending_raw_count = load_coaching()
-df_gesprekken = load_gesprekken()
-GESPREK_COLS = gesprekken_keep_columns(df_gesprekken)
+def opwarmen(ds, vorige=None) -> None:
+    # op de achtergrond (schade_opwarmen); daarna de entries van de vorige versie weg
+    try:
+        for loader, args in _opwarm_sleutels(ds):
+            loader(*args)
+    finally:
+        if vorige is not None:
+            for loader, args in _opwarm_sleutels(vorige):
+                loader.clear(*args)
+
+
+registreer("dashboard_schade", opwarmen)
+ds = laad_dataset()
+model = load_model(ds.versie, ds)
+df_bron = ds.bron
+coaching_map, coaching_pending_set = model.coaching_map, model.coaching_pending
+df_gesprekken = model.gesprekken
+GESPREK_COLS = model.gesprek_cols
 
 # ============================================================
 # MAP COLUMNS (BRON)
 # ============================================================
-col_datum = find_col(df_bron, ["datum"])
-col_naam = find_col(df_bron, ["volledige naam", "chauffeur", "naam", "bestuurder"])
-col_voertuigtype = find_col(df_bron, ["bus/tram", "bus/ tram", "voertuigtype", "type voertuig"])
-col_voertuignr = find_col(df_bron, ["voertuig", "voertuignummer", "voertuig nr", "busnummer", "tramnummer", "voertuignr"])
-col_type = find_col(df_bron, ["type"])
-col_locatie = find_col(df_bron, ["locatie"])
-col_link = find_col(df_bron, ["link"])
-col_pnr = find_col(df_bron, ["personeelsnr", "personeelsnummer", "personeels nr", "p-nr", "p nr"])
-col_teamcoach = find_col(df_bron, ["teamcoach"])
+kolommen = bron_kolommen(df_bron)
+col_datum = kolommen["datum"]
+col_naam = kolommen["naam"]
+col_voertuigtype = kolommen["voertuigtype"]
+col_voertuignr = kolommen["voertuignr"]
+col_type = kolommen["type"]
+col_locatie = kolommen["locatie"]
+col_link = kolommen["link"]
+col_pnr = kolommen["pnr"]
+col_teamcoach = kolommen["teamcoach"]
 
 if col_datum is None:
     st.error("Kolom 'datum' niet gevonden in tab BRON.")
     st.stop()
-
-df_bron = df_bron.copy()
-df_bron["_datum_dt"] = to_datetime_utc_series(df_bron[col_datum])
-df_bron["_jaar"] = df_bron["_datum_dt"].dt.year
+pnr_index = load_pnr_indexen(ds.versie, ds)
+zoekindex = load_zoekindex(ds.versie, ds, zoek_kolommen(kolommen))
+kubus = load_kubus(ds.versie, ds, kubus_kolommen(kolommen))
 
 # ============================================================
 # SIDEBAR NAVIGATIE (links)
@@ -289,53 +372,50 @@ st.sidebar.divider()
 # SIDEBAR FILTER: JAAR
 # ============================================================
 st.sidebar.markdown("### Filter")
-years = sorted([int(y) for y in df_bron["_jaar"].dropna().unique()])
+years = ds.opties["jaren"]
 year_choice = st.sidebar.selectbox("Jaar", options=["ALL"] + years, index=0)
 
 
-def apply_year_filter(df: pd.DataFrame) -> pd.DataFrame:
-    if year_choice == "ALL":
-        return df
-    return df[df["_jaar"] == int(year_choice)]
-
+jaar_snede = {} if year_choice == "ALL" else {"jaar": int(year_choice)}   # dezelfde jaarfilter op de kubus
+# jaarfilter op BRON via de LRU: rijen + aggregaten per (versie, jaar), gedeeld over sessies
+weergave = filter_cache().weergave(
+    ds.versie, "dashboard", jaar_snede,
+    lambda: None if not jaar_snede else np.flatnonzero(
+        df_bron["_jaar"].eq(jaar_snede["jaar"]).to_numpy(dtype=bool, na_value=False)
+    ),
+)
+# pagina's werken op rijposities (weergave.beperk / pas_toe per kolom), niet op een kopie van BRON
+aantal_gefilterd = weergave.aantal(df_bron)
 
-df_filtered = apply_year_filter(df_bron)
-
-# ============================================================
-# COACHING MAP (pnr -> list dates/status)
-# ============================================================
-coaching_map: dict[str, list[dict]] = {}
-
-if not df_coach_done.empty:
-    col_done_pnr = find_col(df_coach_done, ["P-nr", "pnr", "personeelsnr", "personeelsnummer", "p nr"])
-    col_done_rating = find_col(df_coach_done, ["Beoordeling coaching"])
-    col_done_date = find_col(df_coach_done, ["datum", "datum coaching"])
-
-    if col_done_pnr and col_done_rating:
-        tmp = df_coach_done.copy()
-        tmp["_coach_dt"] = to_datetime_utc_series(tmp[col_done_date]) if col_done_date else pd.NaT
-
-        for _, r in tmp.iterrows():
-            p = r.get(col_done_pnr, None)
-            if pd.isna(p):
-                continue
-            key = pnr_to_clean_string(p)
-            status = coaching_status_from_text(r.get(col_done_rating, None))
-            if not status:
-                continue
-
-            dt = r.get("_coach_dt", pd.NaT)
-            date_str = ""
-            if pd.notna(dt):
-                date_str = pd.to_datetime(dt).strftime("%d/%m/%Y")
-
-            coaching_map.setdefault(key, []).append({"status": status, "date": dt if pd.notna(dt) else None, "dateString": date_str})
 
+def tel_per(dim: str, kolom: str, **filters) -> pd.DataFrame:
+    """Aantal per label van `dim` uit de kubus (leeg → "Onbekend"), als kolommen [kolom, Aantal]."""
+    s = kubus.tel(dim, **filters)
+    s = s.groupby(s.index.fillna("Onbekend")).sum()
+    return s.rename_axis(kolom).reset_index(name="Aantal")
 
 def sidebar_status():
-    coach_count = len(coaching_map.keys())
+    coach_count = len(coaching_map)
     filter_text = "alle jaren" if year_choice == "ALL" else f"jaar {year_choice}"
-    st.sidebar.caption(f"Klaar. {len(df_filtered)} rijen ({filter_text}). Coachings voor {coach_count} P-nrs geladen.")
+    st.sidebar.caption(f"Klaar. {aantal_gefilterd} rijen ({filter_text}). Coachings voor {coach_count} P-nrs geladen.")
+    if ADMIN_TOKEN and st.query_params.get("admin") == ADMIN_TOKEN:
+        toon_cache_stats()
+
+
+def toon_cache_stats():
+    cache = filter_cache()
+    t = cache.stats()
+    with st.sidebar.expander("⚙️ Filtercache (admin)"):
+        c1, c2 = st.columns(2)
+        c1.metric("Treffers", t["treffers"])
+        c2.metric("Missers", t["missers"])
+        st.caption(
+            f"Trefkans {t['trefkans']:.0%} · {t['weergaven']}/{t['grootte']} weergaven · "
+            f"{t['verwijderd']} verwijderd · aggregaten {t['aggregaat_treffers']} treffers / "
+            f"{t['aggregaat_missers']} missers"
+        )
+        if st.button("Cache leegmaken", key="lru_leeg"):
+            cache.leeg()
 
 
 # ============================================================
@@ -355,71 +435,70 @@ def page_dashboard():
 
     t = term.strip().lower()
 
-    def contains(colname):
-        if not colname:
-            return pd.Series([False] * len(df_filtered), index=df_filtered.index)
-        return df_filtered[colname].astype(str).str.lower().str.contains(re.escape(t), na=False)
-
-    mask = pd.Series(False, index=df_filtered.index)
-    if col_naam:
-        mask |= contains(col_naam)
-    if col_pnr:
-        mask |= contains(col_pnr)
-    if col_voertuignr:
-        mask |= contains(col_voertuignr)
-    elif col_voertuigtype:
-        mask |= contains(col_voertuigtype)
+    # naam / P-nr / voertuig via de n-gram-index, daarna de jaarfilter op enkel de treffers
+    pos = weergave.beperk(zoek_in(zoekindex, t))
 
-    results = df_filtered[mask].sort_values("_datum_dt", ascending=False)
+    if not len(pos) and col_naam:
+        fuzzy = fuzzy_naam(term, "dash_fuzzy")
+        if fuzzy:
+            term, spellingen = fuzzy
+            pos = weergave.beperk(np.flatnonzero(df_bron[col_naam].isin(spellingen).to_numpy(dtype=bool, na_value=False)))
 
-    if results.empty:
+    if not len(pos):
         st.warning("Geen resultaten gevonden (binnen de gekozen jaarfilter).")
         return
 
+    # nieuwste eerst: enkel de datumkolom van de treffers sorteren (BRON heeft een RangeIndex)
+    pos = df_bron[col_datum].iloc[pos].sort_values(ascending=False).index.to_numpy()
+
     # context chauffeur
     selected_pnr = ""
     selected_name = ""
     if col_pnr and looks_like_pnr(term):
         selected_pnr = pnr_to_clean_string(term)
-        sub_p = results[results[col_pnr].apply(pnr_to_clean_string) == selected_pnr]
-        if not sub_p.empty and col_naam:
-            selected_name = str(sub_p.iloc[0][col_naam]).strip()
+        pos_p = pos[df_bron[PNR_KOLOM].iloc[pos].eq(selected_pnr).to_numpy(dtype=bool, na_value=False)]
+        if len(pos_p) and col_naam:
+            selected_name = str(df_bron[col_naam].iloc[pos_p[0]]).strip()
         elif col_naam:
-            selected_name = str(results.iloc[0][col_naam]).strip()
+            selected_name = str(df_bron[col_naam].iloc[pos[0]]).strip()
     else:
         if col_pnr:
-            selected_pnr = pnr_to_clean_string(results.iloc[0][col_pnr])
+            selected_pnr = df_bron[PNR_KOLOM].iloc[pos[:1]].fillna("").iloc[0]
         if col_naam:
-            selected_name = str(results.iloc[0][col_naam]).strip()
+            selected_name = str(df_bron[col_naam].iloc[pos[0]]).strip()
 
     # coachings
     if selected_pnr:
-        entries = coaching_map.get(selected_pnr, [])
-        if entries:
-            entries_sorted = sorted(entries, key=lambda e: (e["date"] is None, e["date"]))
+        if selected_pnr in coaching_map:
             title = f"Coachings voor **{selected_pnr}**"
             if selected_name:
                 title += f" — {selected_name}"
             st.markdown(f"#### {title}")
-            dates = [e["dateString"] for e in entries_sorted if e.get("dateString")]
+            dates = coaching_map[selected_pnr]
             if dates:
                 st.write(" ".join([f"`{d}`" for d in dates]))
         else:
             st.caption(f"Geen coachings gevonden voor P-nr {selected_pnr}.")
 
-    # schade tabel
-    out = pd.DataFrame()
-    out["Datum"] = results["_datum_dt"].dt.strftime("%d/%m/%Y")
-    out["Chauffeur"] = results[col_naam] if col_naam else ""
-    out["Personeelsnr"] = results[col_pnr].apply(pnr_to_clean_string) if col_pnr else ""
-    out["Voertuignr"] = results[col_voertuignr] if col_voertuignr else ""
-    out["Voertuigtype"] = results[col_voertuigtype] if col_voertuigtype else ""
-    out["Type"] = results[col_type] if col_type else ""
-    out["Locatie"] = results[col_locatie] if col_locatie else ""
-    out["Link"] = results[col_link].map(clean_url) if col_link else ""
-
-    st.dataframe(
-        out,
+    # schade tabel: enkel de rijen van de zichtbare pagina opbouwen
+    def schade_rijen(deel: np.ndarray) -> pd.DataFrame:
+        results = df_bron.iloc[deel]
+        out = pd.DataFrame()
+        out["Datum"] = results[col_datum].dt.strftime("%d/%m/%Y")
+        out["Chauffeur"] = results[col_naam] if col_naam else ""
+        out["Personeelsnr"] = results[PNR_KOLOM].fillna("") if col_pnr else ""
+        out["Voertuignr"] = results[col_voertuignr] if col_voertuignr else ""
+        out["Voertuigtype"] = results[col_voertuigtype] if col_voertuigtype else ""
+        out["Type"] = results[col_type] if col_type else ""
+        out["Locatie"] = results[col_locatie] if col_locatie else ""
+        out["Link"] = results[col_link].map(clean_url) if col_link else ""
+        return out
+
+    gepagineerde_tabel(
+        "dash_resultaten",
+        pos,
+        schade_rijen,
+        sleutel=(term, year_choice),
         use_container_width=True,
         hide_index=True,
         column_config={
@@ -440,44 +519,50 @@ def page_dashboard():
 
     gesprek_nummer_col = find_col(df_gesprekken, ["nummer", "personeelsnr", "personeelsnummer", "p-nr", "p nr"])
     gesprek_naam_col = find_col(df_gesprekken, ["chauffeurnaam", "volledige naam", "naam"])
-    gesprek_datum_col = find_col(df_gesprekken, ["datum"])
-
-    df_g = df_gesprekken.copy()
-
-    # jaarfilter gesprekken
-    if gesprek_datum_col:
-        df_g["_dt"] = to_datetime_utc_series(df_g[gesprek_datum_col])
-        df_g["_jaar"] = df_g["_dt"].dt.year
-        if year_choice != "ALL":
-            df_g = df_g[df_g["_jaar"] == int(year_choice)]
-
-    gmask = pd.Series(False, index=df_g.index)
 
+    # eerst op P-nr (enkel de rijen van die P-nr, via de index), dan de jaarfilter
+    pos_g = np.empty(0, dtype=np.int64)
     if selected_pnr and gesprek_nummer_col:
-        gmask |= df_g[gesprek_nummer_col].apply(pnr_to_clean_string).astype(str).str.strip() == selected_pnr
+        pos_g = gesprekken_in_jaar(pnr_index["gesprekken"].rijen(selected_pnr))
 
     # fallback naam
-    if (not gmask.any()) and selected_name and gesprek_naam_col:
+    if not len(pos_g) and selected_name and gesprek_naam_col:
         nm = selected_name.strip().lower()
-        gmask |= df_g[gesprek_naam_col].astype(str).str.lower().str.contains(re.escape(nm), na=False)
-
-    df_g_match = df_g[gmask].copy()
+        treffer = df_gesprekken[gesprek_naam_col].astype(str).str.lower().str.contains(re.escape(nm), na=False)
+        pos_g = gesprekken_in_jaar(np.flatnonzero(treffer.to_numpy(dtype=bool)))
 
-    if df_g_match.empty:
+    if not len(pos_g):
         st.info("Geen gesprekken gevonden (binnen de gekozen jaarfilter).")
         return
 
-    if gesprek_datum_col and gesprek_datum_col in df_g_match.columns:
-        df_g_match[gesprek_datum_col] = to_datetime_utc_series(df_g_match[gesprek_datum_col]).dt.strftime("%d/%m/%Y")
+    gepagineerde_tabel(
+        "dash_gesprekken",
+        pos_g,
+        lambda deel: gesprekken_weergave(df_gesprekken.iloc[deel]),
+        sleutel=(term, year_choice),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+def gesprekken_in_jaar(pos: np.ndarray) -> np.ndarray:
+    # jaarfilter op rijposities van de gesprekken (zonder datumkolom: geen filter)
+    if not model.gesprek_datum_col or year_choice == "ALL":
+        return pos
+    return pos[df_gesprekken["_jaar"].iloc[pos].eq(int(year_choice)).to_numpy(dtype=bool, na_value=False)]
 
-    st.dataframe(df_g_match[GESPREK_COLS], use_container_width=True, hide_index=True)
 
+def gesprekken_weergave(g: pd.DataFrame) -> pd.DataFrame:
+    # te tonen kolommen, datum als dd/mm/YYYY (vooraf berekend in load_model)
+    out = g[GESPREK_COLS]
+    col = model.gesprek_datum_col
+    if col and col in out.columns:
+        out = out.assign(**{col: g["_datum"]})
+    return out
 
-def build_teamcoach_bar(df: pd.DataFrame, teamcoach_col: str) -> pd.DataFrame:
-    temp = df.copy()
-    temp["_tc"] = temp[teamcoach_col].fillna("Onbekend").astype(str).str.strip()
-    bar = temp.groupby("_tc").size().reset_index(name="Aantal").sort_values("Aantal", ascending=False)
-    return bar
+
+def build_teamcoach_bar(**filters) -> pd.DataFrame:
+    return tel_per("teamcoach", "_tc", **filters).sort_values("Aantal", ascending=False)
 
 
 def page_chauffeur():
@@ -491,8 +576,8 @@ def page_chauffeur():
     # teamcoach opties
     tc_options = ["Alle teamcoaches"]
     if col_teamcoach:
-        vals = df_filtered[col_teamcoach].dropna().astype(str).str.strip()
-        tc_options += sorted([v for v in vals.unique() if v])
+        vals = kubus.tel("teamcoach", **jaar_snede).index.dropna()
+        tc_options += sorted([v for v in vals if v])
     else:
         tc_options = ["Alle teamcoaches"]  # geen kolom -> enkel default
 
@@ -501,16 +586,13 @@ def page_chauffeur():
     lim_choice = c2.selectbox("Toon", ["Top 10", "Top 20", "Alle chauffeurs"], index=0)
     lim = 10 if lim_choice == "Top 10" else 20 if lim_choice == "Top 20" else None
 
-    df_ch = df_filtered.copy()
-
     # filter teamcoach (als kolom bestaat)
+    snede = dict(jaar_snede)
     if col_teamcoach and tc_choice != "Alle teamcoaches":
-        df_ch = df_ch[df_ch[col_teamcoach].astype(str).str.strip() == tc_choice]
+        snede["teamcoach"] = tc_choice
 
     # tabel chauffeurs
-    temp = df_ch.copy()
-    temp["_chauffeur"] = temp[col_naam].fillna("Onbekend").astype(str).str.strip()
-    table = temp.groupby("_chauffeur").size().reset_index(name="Aantal").sort_values("Aantal", ascending=False)
+    table = tel_per("chauffeur", "_chauffeur", **snede).sort_values("Aantal", ascending=False)
 
     if lim:
         table_view = table.head(lim)
@@ -531,7 +613,7 @@ def page_chauffeur():
         st.info("Kolom 'teamcoach' niet gevonden in BRON.")
         return
 
-    bar = build_teamcoach_bar(df_ch, col_teamcoach)
+    bar = build_teamcoach_bar(**snede)
 
     # als er teamcoach-filter actief is (niet alle), toont bar enkel die ene => nog steeds ok
     fig = px.bar(bar, x="_tc", y="Aantal")
@@ -548,20 +630,22 @@ def page_voertuig():
     lim_choice = st.selectbox("Toon", ["Top 10", "Top 20", "Alle types"], index=0)
     lim = 10 if lim_choice == "Top 10" else 20 if lim_choice == "Top 20" else None
 
-    temp = df_filtered.copy()
-    temp["_veh"] = temp[col_voertuigtype].fillna("Onbekend").astype(str).str.strip()
-    table = temp.groupby("_veh").size().reset_index(name="Aantal").sort_values("Aantal", ascending=False)
+    table = tel_per("voertuig", "_veh", **jaar_snede).sort_values("Aantal", ascending=False)
     table_view = table.head(lim) if lim else table
 
     st.dataframe(table_view.rename(columns={"_veh": "Type voertuig"}), use_container_width=True, hide_index=True)
 
     st.subheader("Schades per maand en voertuigtype (gestapelde balken)")
-    dm = df_filtered[df_filtered["_datum_dt"].notna()].copy()
-    dm["_maand"] = dm["_datum_dt"].dt.month
-    dm["_m_name"] = dm["_maand"].apply(lambda m: ["Jan", "Feb", "Mrt", "Apr", "Mei", "Jun", "Jul", "Aug", "Sep", "Okt", "Nov", "Dec"][m - 1])
-    dm["_veh"] = dm[col_voertuigtype].fillna("Onbekend").astype(str).str.strip()
-
-    pivot = dm.groupby(["_m_name", "_veh"]).size().reset_index(name="Aantal")
+    maanden = ["Jan", "Feb", "Mrt", "Apr", "Mei", "Jun", "Jul", "Aug", "Sep", "Okt", "Nov", "Dec"]
+    per_maand = kubus.tel(("maand", "voertuig"), **jaar_snede)
+    pivot = (
+        pd.DataFrame({
+            "_m_name": [maanden[m - 1] for m in per_maand.index.get_level_values("maand")],
+            "_veh": per_maand.index.get_level_values("voertuig").fillna("Onbekend"),
+            "Aantal": per_maand.to_numpy(),
+        })
+        .groupby(["_m_name", "_veh"], as_index=False)["Aantal"].sum()
+    )
     fig = px.bar(pivot, x="_m_name", y="Aantal", color="_veh", barmode="stack")
     fig.update_layout(xaxis_title="Maand", yaxis_title="Aantal schades")
     st.plotly_chart(fig, use_container_width=True)
@@ -576,9 +660,7 @@ def page_locatie():
     lim_choice = st.selectbox("Toon", ["Top 10", "Top 20", "Alle locaties"], index=0)
     lim = 10 if lim_choice == "Top 10" else 20 if lim_choice == "Top 20" else None
 
-    temp = df_filtered.copy()
-    temp["_loc"] = temp[col_locatie].fillna("Onbekend").astype(str).str.strip()
-    table = temp.groupby("_loc").size().reset_index(name="Aantal").sort_values("Aantal", ascending=False)
+    table = tel_per("locatie", "_loc", **jaar_snede).sort_values("Aantal", ascending=False)
     table_view = table.head(lim) if lim else table
 
     st.dataframe(table_view.rename(columns={"_loc": "Locatie"}), use_container_width=True, hide_index=True)
@@ -591,35 +673,30 @@ def page_coaching():
         st.info("Geen P-nr kolom gevonden in BRON.")
         return
 
-    damage_pnr_set = set(df_bron[col_pnr].dropna().apply(pnr_to_clean_string))
-    damage_pnr_set.discard("")
-
-    done_pnr_set = set(coaching_map.keys())
-
-    pending_in_damage = len([p for p in coaching_pending_set if p in damage_pnr_set])
-    done_in_damage = len([p for p in done_pnr_set if p in damage_pnr_set])
-
     cA, cB = st.columns(2)
     with cA:
-        st.metric("📄 Lopend – ruwe rijen (coachingslijst)", pending_raw_count)
-        st.metric("🔵 Lopend (in schadelijst)", pending_in_damage)
+        st.metric("📄 Lopend – ruwe rijen (coachingslijst)", model.pending_raw)
+        st.metric("🔵 Lopend (in schadelijst)", model.pending_in_damage)
     with cB:
-        st.metric("📄 Voltooid – ruwe rijen (coachingslijst)", done_raw_count)
-        st.metric("🟡 Voltooid (in schadelijst)", done_in_damage)
+        st.metric("📄 Voltooid – ruwe rijen (coachingslijst)", model.done_raw)
+        st.metric("🟡 Voltooid (in schadelijst)", model.done_in_damage)
 
     st.divider()
 
-    counts = df_filtered.groupby(df_filtered[col_pnr].apply(pnr_to_clean_string)).size()
-    high_damage = []
-    for pnr_key, cnt in counts.items():
-        if not pnr_key:
-            continue
-        if cnt > 2 and (pnr_key not in coaching_map) and (pnr_key not in coaching_pending_set):
-            nm = ""
-            if col_naam:
-                nm_ser = df_filtered[df_filtered[col_pnr].apply(pnr_to_clean_string) == pnr_key][col_naam].dropna()
-                nm = str(nm_ser.iloc[0]).strip() if len(nm_ser) else ""
-            high_damage.append({"P-nr": pnr_key, "Naam": nm, "Aantal": int(cnt)})
+    def _high_damage() -> list[dict]:
+        pnrs = weergave.pas_toe(df_bron[PNR_KOLOM])
+        counts = pnrs.groupby(pnrs).size()
+        out = []
+        for pnr_key, cnt in counts.items():
+            if cnt > 2 and (pnr_key not in coaching_map) and (pnr_key not in coaching_pending_set):
+                nm = ""
+                if col_naam:
+                    nm_ser = df_bron[col_naam].iloc[weergave.beperk(pnr_index["bron"].rijen(pnr_key))].dropna()
+                    nm = str(nm_ser.iloc[0]).strip() if len(nm_ser) else ""
+                out.append({"P-nr": pnr_key, "Naam": nm, "Aantal": int(cnt)})
+        return out
+
+    high_damage = weergave.aggregaat("high_damage", _high_damage)
 
     st.markdown("### P-nrs > 2 schades zonder coaching (jaarfilter)")
     st.write(f"Aantal: **{len(high_damage)}**")
@@ -631,7 +708,7 @@ def page_analyse():
     st.header("Analyse")
 
     st.subheader("1. Totaal schades")
-    st.write(f"Totaal aantal schades (jaarfilter): **{len(df_filtered)}**")
+    st.write(f"Totaal aantal schades (jaarfilter): **{aantal_gefilterd}**")
 
     st.subheader("2. Histogram — aantal schades per medewerker")
     st.caption("Mediaan is op basis van alle P-nrs in 'data hastus' indien aanwezig.")
@@ -640,20 +717,12 @@ def page_analyse():
         st.info("Geen P-nr kolom gevonden in BRON.")
         return
 
-    pnr_series = df_filtered[col_pnr].apply(pnr_to_clean_string)
-    damage_per_pnr = pnr_series.value_counts().to_dict()
+    damage_per_pnr = weergave.aggregaat("damage_per_pnr", lambda: weergave.pas_toe(df_bron[PNR_KOLOM]).value_counts())
 
-    damages_all = []
-    col_h_pnr = None
-    if not df_hastus.empty:
-        col_h_pnr = find_col(df_hastus, ["p-nr", "pnr", "personeelsnr", "personeelsnummer", "p nr"])
-
-    if col_h_pnr:
-        hastus_pnrs = df_hastus[col_h_pnr].dropna().apply(pnr_to_clean_string).tolist()
-        hastus_pnrs = [p for p in hastus_pnrs if p]
-        damages_all = [int(damage_per_pnr.get(p, 0)) for p in hastus_pnrs]
+    if model.hastus_pnrs is not None:
+        damages_all = damage_per_pnr.reindex(model.hastus_pnrs, fill_value=0).astype(int).tolist()
     else:
-        damages_all = list(map(int, damage_per_pnr.values()))
+        damages_all = damage_per_pnr.astype(int).tolist()
 
     if not damages_all:
         st.info("Geen bruikbare P-nrs gevonden.")
@@ -676,18 +745,12 @@ def page_analyse():
     st.plotly_chart(fig, use_container_width=True)
 
     st.subheader("3. Verdeling P-nrs per 10.000-tal (Hastus)")
-    if df_hastus.empty or not col_h_pnr:
+    dist_df = model.hastus_verdeling
+    if dist_df is None:
         st.info("Tabblad 'data hastus' of P-nr kolom niet gevonden.")
         return
 
-    pnrs = pd.to_numeric(df_hastus[col_h_pnr], errors="coerce").dropna().astype(int)
-    st.write(f"Totaal P-nrs in **data hastus**: **{len(pnrs)}**")
-
-    bin_size = 10000
-    bins = (pnrs // bin_size) * bin_size
-    counts = bins.value_counts().sort_index()
-    labels = [f"{b}–{b + bin_size - 1}" for b in counts.index.tolist()]
-    dist_df = pd.DataFrame({"Range": labels, "Aantal": counts.values})
+    st.write(f"Totaal P-nrs in **data hastus**: **{int(dist_df['Aantal'].sum())}**")
 
     fig2 = px.bar(dist_df, x="Range", y="Aantal")
     fig2.update_layout(xaxis_title="10.000-tal range", yaxis_title="Aantal P-nrs", showlegend=False)
@@ -700,15 +763,8 @@ def page_gesprekken():
 
     gesprek_nummer_col = find_col(df_gesprekken, ["nummer"])
     gesprek_naam_col = find_col(df_gesprekken, ["chauffeurnaam"])
-    gesprek_datum_col = find_col(df_gesprekken, ["datum"])
-
-    df_g = df_gesprekken.copy()
 
-    if gesprek_datum_col:
-        df_g["_dt"] = to_datetime_utc_series(df_g[gesprek_datum_col])
-        df_g["_jaar"] = df_g["_dt"].dt.year
-        if year_choice != "ALL":
-            df_g = df_g[df_g["_jaar"] == int(year_choice)]
+    pos = gesprekken_in_jaar(np.arange(len(df_gesprekken)))
 
     c1, c2 = st.columns([3, 1])
     g_term = c1.text_input("Zoek", placeholder="Zoek personeelsnr of naam...", label_visibility="collapsed")
@@ -718,20 +774,28 @@ def page_gesprekken():
 
     if g_term.strip():
         tt = g_term.strip().lower()
-        m = pd.Series(False, index=df_g.index)
+        m = np.zeros(len(pos), dtype=bool)
         if gesprek_nummer_col:
-            m |= df_g[gesprek_nummer_col].apply(pnr_to_clean_string).astype(str).str.lower().str.contains(re.escape(tt), na=False)
+            m |= df_gesprekken[PNR_KOLOM].iloc[pos].str.lower().str.contains(re.escape(tt), na=False).to_numpy(dtype=bool)
         if gesprek_naam_col:
-            m |= df_g[gesprek_naam_col].astype(str).str.lower().str.contains(re.escape(tt), na=False)
-        df_g = df_g[m]
-
-    st.caption(f"Resultaten: {len(df_g)}")
-
-    out = df_g.copy()
-    if gesprek_datum_col and gesprek_datum_col in out.columns:
-        out[gesprek_datum_col] = to_datetime_utc_series(out[gesprek_datum_col]).dt.strftime("%d/%m/%Y")
-
-    st.dataframe(out[GESPREK_COLS], use_container_width=True, hide_index=True)
+            namen = df_gesprekken[gesprek_naam_col].iloc[pos].astype(str).str.lower()
+            m |= namen.str.contains(re.escape(tt), na=False).to_numpy(dtype=bool)
+        if not m.any() and gesprek_naam_col:
+            fuzzy = fuzzy_naam(g_term, "gesprek_fuzzy")
+            if fuzzy:
+                m = df_gesprekken[gesprek_naam_col].iloc[pos].isin(fuzzy[1]).to_numpy(dtype=bool)
+        pos = pos[m]
+
+    st.caption(f"Resultaten: {len(pos)}")
+
+    gepagineerde_tabel(
+        "gesprekken",
+        pos,
+        lambda deel: gesprekken_weergave(df_gesprekken.iloc[deel]),
+        sleutel=(g_term.strip(), year_choice),
+        use_container_width=True,
+        hide_index=True,
+    )
 
 
 # ============================================================
@@ -3,15 +3,33 @@ import os
 import re
 import time
 import secrets
-import smtplib
-import ssl
 import hashlib
-from email.message import EmailMessage
+from concurrent.futures import TimeoutError as FutureTimeout
 from datetime import datetime
 
 import streamlit as st
+import numpy as np
 import pandas as pd
 
+from schade_data import CACHE_VERSIES, FILE_COACHING, FILE_SCHADE, PNR_KOLOM, beoordeling_emoji, laad_dataset
+from schade_cache import WeergaveCache
+from schade_index import BitmapIndex, PnrIndex
+from schade_kubus import Kubus
+from schade_mail import Mailer, SmtpConfig
+from schade_opwarmen import registreer
+from schade_overzicht import (
+    chauffeur_telling,
+    coachingstatus,
+    extract_url,
+    historie_bitmaps,
+    historie_kubus,
+    locatie_samenvatting,
+    naam_badge,
+    periode,
+    voertuig_telling,
+)
+from schade_tabel import exportknoppen, gepagineerde_tabel
+
 # =========================
 # .env / mail.env laden
 # =========================
@@ -45,6 +63,7 @@ EMAIL_FROM = os.getenv("EMAIL_FROM", SMTP_USER or "").strip()
 OTP_LENGTH = int(os.getenv("OTP_LENGTH", "6"))
 OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", "600"))
 OTP_RESEND_SECONDS = int(os.getenv("OTP_RESEND_SECONDS", "60"))
+SMTP_WACHT = float(os.getenv("SMTP_WACHT", "60"))   # s wachten op aflevering van een OTP-mail
 
 OTP_SUBJECT = os.getenv("OTP_SUBJECT", "Je verificatiecode")
 OTP_BODY_TEXT = os.getenv(
@@ -83,6 +102,9 @@ def _is_allowed_email(addr: str) -> bool:
     a = addr.strip().lower()
     return any(a.endswith("@" + d) for d in ALLOWED_EMAIL_DOMAINS)
 
+# P-nrs die de cache-statistieken in de sidebar zien
+ADMIN_PNRS = {p.strip() for p in os.getenv("ADMIN_PNRS", "").split(",") if p.strip()}
+
 def _mask_email(addr: str) -> str:
     try:
         local, dom = addr.split("@", 1)
@@ -102,35 +124,19 @@ def _gen_otp(n: int | None = None) -> str:
 def _hash_code(code: str) -> str:
     return hashlib.sha256(code.encode()).hexdigest()
 
+@st.cache_resource(show_spinner=False)
+def mailer() -> Mailer:
+    # één wachtrij + SMTP-pool per proces: logins kort na elkaar delen een ingelogde sessie
+    return Mailer(SmtpConfig.uit_env())
+
 def _send_email(to_addr: str, subject: str, body_text: str, html: str | None = None) -> None:
     if not (SMTP_HOST and SMTP_PORT and EMAIL_FROM):
         raise RuntimeError("SMTP-configuratie ontbreekt in mail.env")
-
-    msg = EmailMessage()
-    msg["From"] = EMAIL_FROM
-    msg["To"] = to_addr
-    msg["Subject"] = subject
-    msg.set_content(body_text)
-    if html:
-        msg.add_alternative(html, subtype="html")
-
-    use_ssl = (
-        str(os.getenv("SMTP_SSL", "")).strip().lower() in {"1", "true", "yes"}
-        or int(SMTP_PORT) == 465
-    )
-
-    ctx = ssl.create_default_context()
-    if use_ssl:
-        with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, context=ctx) as server:
-            if SMTP_USER and SMTP_PASS:
-                server.login(SMTP_USER, SMTP_PASS)
-            server.send_message(msg)
-    else:
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls(context=ctx)
-            if SMTP_USER and SMTP_PASS:
-                server.login(SMTP_USER, SMTP_PASS)
-            server.send_message(msg)
+    # wachten op de aflevering (incl. nieuwe pogingen), zodat een fout nog op het loginscherm komt
+    try:
+        mailer().verstuur(to_addr, subject, body_text, html=html).result(timeout=SMTP_WACHT)
+    except FutureTimeout:
+        raise RuntimeError("de mailserver reageert traag; de code kan nog toekomen, anders vraag je een nieuwe aan.")
 
 # =========================
 # Contact mapping (login)
@@ -141,26 +147,30 @@ def load_contact_map() -> dict[str, dict]:
     A = personeelsnr, B = naam, C = e-mail
     Return: { "41092": {"email": "...", "name": "..."} }
     """
-    path = "schade met macro.xlsm"
-    if not os.path.exists(path):
+    if not FILE_SCHADE.exists():
         raise RuntimeError("Bestand 'schade met macro.xlsm' niet gevonden in de projectmap.")
-
-    xls = pd.ExcelFile(path)
-    sheet = next((sh for sh in xls.sheet_names if str(sh).strip().lower() == "contact"), None)
-    if sheet is None:
+    ds = laad_dataset()
+    return _contact_map(ds.versie, ds)
+
+@st.cache_resource(show_spinner=False, max_entries=CACHE_VERSIES)
+def _contact_map(versie: str, _ds) -> dict[str, dict]:
+    # eenmaal per dataset-versie (ook bij OTP-submit geen nieuwe opbouw)
+    contact = _ds.contact
+    if contact.empty and contact.shape[1] == 0:
         raise RuntimeError("Tabblad 'contact' niet gevonden in 'schade met macro.xlsm'.")
 
-    df = pd.read_excel(xls, sheet_name=sheet, header=None, usecols="A:C")
+    # gedeelde dataset heeft de kopregel als kolomnamen; A:C positioneel
+    df = contact.iloc[:, :3]
     if df.empty or df.shape[1] < 3:
         raise RuntimeError("Tabblad 'contact' bevat geen gegevens in kolommen A:C.")
+    df.columns = [0, 1, 2]
 
     mapping: dict[str, dict] = {}
-    for _, row in df.iterrows():
-        pnr = str(row[0]).strip() if pd.notna(row[0]) else ""
-        if not pnr:
+    for pnr, naam, mail in zip(contact[PNR_KOLOM], df[1], df[2]):  # P-nr-sleutel van kolom A
+        if pd.isna(pnr):
             continue
-        name = str(row[1]).strip() if pd.notna(row[1]) else ""
-        email = str(row[2]).strip() if pd.notna(row[2]) else ""
+        name = str(naam).strip() if pd.notna(naam) else ""
+        email = str(mail).strip() if pd.notna(mail) else ""
         if not email or email.lower() in {"nan", "none", ""}:
             continue
         mapping[pnr] = {"email": email, "name": name}
@@ -169,274 +179,97 @@ def load_contact_map() -> dict[str, dict]:
         raise RuntimeError("Geen geldige rijen in tabblad 'contact'.")
     return mapping
 
-# =========================
-# Badge helpers
-# =========================
-def naam_naar_dn(naam: str) -> str | None:
-    if pd.isna(naam):
-        return None
-    s = str(naam).strip()
-    m = re.match(r"\s*(\d+)", s)
-    return m.group(1) if m else None
-
-def _beoordeling_emoji(rate: str) -> str:
-    r = (rate or "").strip().lower()
-    if r in {"zeer goed", "goed"}: return "🟢 "
-    if r in {"voldoende"}:         return "🟠 "
-    if r in {"slecht", "onvoldoende", "zeer slecht"}: return "🔴 "
-    return ""
-
-def badge_van_chauffeur(naam: str) -> str:
-    dn = naam_naar_dn(naam)
-    if not dn:
-        return ""
-    sdn = str(dn).strip()
-    info = st.session_state.get("excel_info", {}).get(sdn, {})
-    beoordeling = info.get("beoordeling")
-    status_excel = info.get("status")
-    kleur = _beoordeling_emoji(beoordeling)
-    coaching_ids = st.session_state.get("coaching_ids", set())
-    lopend = (status_excel == "Coaching") or (sdn in coaching_ids)
-    return f"{kleur}{'⚫ ' if lopend else ''}"
-
-# =========================
-# CSV / URL helpers
-# =========================
-@st.cache_data
-def df_to_csv_bytes(d: pd.DataFrame) -> bytes:
-    return d.to_csv(index=False).encode("utf-8")
-
-def extract_url(x) -> str | None:
-    if pd.isna(x):
-        return None
-    s = str(x).strip()
-    if s.startswith(("http://", "https://")):
-        return s
-    m = re.search(r'HYPERLINK\(\s*"([^"]+)"', s, flags=re.IGNORECASE)
-    return m.group(1) if m else None
-
 # =========================
 # Data laden / voorbereiden
 # =========================
-@st.cache_data(show_spinner=False, ttl=3600)
-def load_schade_prepared(path="schade met macro.xlsm", sheet="BRON"):
-    df_raw = pd.read_excel(path, sheet_name=sheet)
-    df_raw.columns = df_raw.columns.str.strip()
-
-    d1 = pd.to_datetime(df_raw["Datum"], errors="coerce", dayfirst=True)
-    need_retry = d1.isna()
-    if need_retry.any():
-        d2 = pd.to_datetime(df_raw.loc[need_retry, "Datum"], errors="coerce", dayfirst=False)
-        d1.loc[need_retry] = d2
-    df_raw["Datum"] = d1
-    df_ok = df_raw[df_raw["Datum"].notna()].copy()
-
-    for col in ("volledige naam", "teamcoach", "Locatie", "Bus/ Tram", "Link"):
-        if col in df_ok.columns:
-            df_ok[col] = df_ok[col].astype("string").str.strip()
-
-    df_ok["dienstnummer"] = (
-        df_ok["volledige naam"].astype(str).str.extract(r"^(\d+)", expand=False).astype("string").str.strip()
-    )
-    df_ok["KwartaalP"] = df_ok["Datum"].dt.to_period("Q")
-    df_ok["Kwartaal"]  = df_ok["KwartaalP"].astype(str)
-
-    def _clean_display_series(s: pd.Series) -> pd.Series:
-        s = s.astype("string").str.strip()
-        bad = s.isna() | s.eq("") | s.str.lower().isin({"nan", "none", "<na>"})
-        return s.mask(bad, "onbekend")
-
-    df_ok["volledige naam_disp"] = _clean_display_series(df_ok["volledige naam"])
-    df_ok["teamcoach_disp"]      = _clean_display_series(df_ok["teamcoach"])
-    df_ok["Locatie_disp"]        = _clean_display_series(df_ok["Locatie"])
-    df_ok["BusTram_disp"]        = _clean_display_series(df_ok["Bus/ Tram"])
-
-    options = {
-        "teamcoach": sorted(df_ok["teamcoach_disp"].dropna().unique().tolist()),
-        "locatie":   sorted(df_ok["Locatie_disp"].dropna().unique().tolist()),
-        "voertuig":  sorted(df_ok["BusTram_disp"].dropna().unique().tolist()),
-        "kwartaal":  sorted(df_ok["KwartaalP"].dropna().astype(str).unique().tolist()),
-        "min_datum": df_ok["Datum"].min().normalize(),
-        "max_datum": df_ok["Datum"].max().normalize(),
-    }
-    return df_ok, options
+def load_schade_prepared():
+    # gedeelde, voorbereide BRON (zie schade_data.bereid_bron_voor)
+    ds = laad_dataset()
+    return ds.bron, ds.opties
 
 # ========= Coachingslijst inlezen =========
-@st.cache_data(show_spinner=False)
-def lees_coachingslijst(pad="Coachingslijst.xlsx"):
-    ids_geel, ids_blauw = set(), set()
-    total_geel_rows, total_blauw_rows = 0, 0
-    excel_info = {}
-    df_voltooide_clean = None  # <— nieuw
-    try:
-        xls = pd.ExcelFile(pad)
-    except Exception as e:
-        return ids_geel, ids_blauw, total_geel_rows, total_blauw_rows, excel_info, f"Coachingslijst niet gevonden of onleesbaar: {e}"
-
-    def vind_sheet(xls, naam):
-        return next((s for s in xls.sheet_names if s.strip().lower() == naam), None)
-
-    pnr_keys        = ["p-nr", "p_nr", "pnr", "pnummer", "dienstnummer", "p nr"]
-    fullname_keys   = ["volledige naam", "chauffeur", "bestuurder", "name"]
-    voornaam_keys   = ["voornaam", "firstname", "first name", "given name"]
-    achternaam_keys = ["achternaam", "familienaam", "lastname", "last name", "surname", "naam"]
-    coach_keys      = ["teamcoach", "coach", "team coach"]
-    rating_keys     = ["beoordeling coaching", "beoordeling", "rating", "evaluatie"]
-    # nieuw: mogelijke datumkolommen
-    date_hints      = ["datum coaching", "datumcoaching", "coaching datum", "datum"]
-
-    def lees_sheet(sheetnaam, status_label):
-        ids = set()
-        total_rows = 0
-        try:
-            dfc = pd.read_excel(xls, sheet_name=sheetnaam)
-        except Exception:
-            return ids, total_rows, None
-
-        dfc.columns = dfc.columns.str.strip().str.lower()
-        cols_lower = {c.lower().strip(): c for c in dfc.columns}
-
-        kol_pnr   = next((k for k in pnr_keys if k in dfc.columns), None)
-        kol_full  = next((k for k in fullname_keys if k in dfc.columns), None)
-        kol_vn    = next((k for k in voornaam_keys if k in dfc.columns), None)
-        kol_an    = next((k for k in achternaam_keys if k in dfc.columns), None)
-        kol_coach = next((k for k in coach_keys if k in dfc.columns), None)
-        kol_rate  = next((k for k in rating_keys if k in dfc.columns), None)
-
-        # nieuw: datumkolom zoeken
-        kol_date = None
-        for hint in date_hints:
-            if hint in dfc.columns:
-                kol_date = hint
-                break
-        # fallback: kolom die zowel 'datum' als 'coach' bevat
-        if not kol_date:
-            for k in dfc.columns:
-                if ("datum" in k) and ("coach" in k):
-                    kol_date = k
-                    break
-
-        if kol_pnr is None:
-            return ids, total_rows, None
-
-        # strings voor pnr
-        s_pnr = (
-            dfc[kol_pnr].astype(str)
-            .str.extract(r"(\d+)", expand=False)
-            .dropna().str.strip()
+@st.cache_resource(show_spinner=False, max_entries=CACHE_VERSIES)
+def lees_coachingslijst(versie: str, _ds):
+    # eenmaal per dataset-versie, gedeeld door alle sessies (niet wijzigen);
+    # uit de coaching-events van de dataset (zie schade_data.bouw_coachings)
+    fout = _ds.fouten.get(FILE_COACHING.name)
+    if fout:
+        return set(), set(), 0, 0, f"Coachingslijst niet gevonden of onleesbaar: {fout}"
+
+    ev = _ds.coachings
+    voltooid = ev.loc[ev["status"].eq("Voltooid"), "pnr"]
+    lopend = ev.loc[ev["status"].eq("Coaching"), "pnr"]
+    return set(voltooid), set(lopend), len(voltooid), len(lopend), None
+
+
+@st.cache_resource(show_spinner=False, max_entries=CACHE_VERSIES)
+def load_pnr_indexen(versie: str, _ds) -> dict[str, PnrIndex]:
+    # dienstnummer → rijposities in BRON en in de coaching-events
+    return {
+        "bron": PnrIndex(_ds.bron["dienstnummer"]),
+        "coaching": PnrIndex(_ds.coachings["pnr"]),
+    }
+
+
+@st.cache_resource(show_spinner=False)
+def filter_cache() -> WeergaveCache:
+    # één LRU van gefilterde weergaven per proces: gedeeld over alle sessies
+    return WeergaveCache()
+
+
+def toon_cache_stats():
+    cache = filter_cache()
+    t = cache.stats()
+    with st.sidebar.expander("⚙️ Filtercache (admin)"):
+        c1, c2 = st.columns(2)
+        c1.metric("Treffers", t["treffers"])
+        c2.metric("Missers", t["missers"])
+        st.caption(
+            f"Trefkans {t['trefkans']:.0%} · {t['weergaven']}/{t['grootte']} weergaven · "
+            f"{t['verwijderd']} verwijderd · aggregaten {t['aggregaat_treffers']} treffers / "
+            f"{t['aggregaat_missers']} missers"
         )
-        total_rows = int(s_pnr.shape[0])
-        ids = set(s_pnr.tolist())
-
-        # loop en vul excel_info
-        s_pnr_reset = s_pnr.reset_index(drop=True)
-        for i in range(len(s_pnr_reset)):
-            pnr = s_pnr_reset.iloc[i]
-            if pd.isna(pnr):
-                continue
-            vn = str(dfc[kol_vn].iloc[i]).strip() if kol_vn else ""
-            an = str(dfc[kol_an].iloc[i]).strip() if kol_an else ""
-            if not (vn or an):
-                full = str(dfc[kol_full].iloc[i]).strip() if kol_full else ""
-                naam = full if full.lower() not in {"nan", "none", ""} else None
-            else:
-                naam = f"{vn} {an}".strip() or None
-                if naam and naam.lower() in {"nan", "none", ""}:
-                    naam = None
-            tc = str(dfc[kol_coach].iloc[i]).strip() if kol_coach else None
-            if tc and tc.lower() in {"nan", "none", ""}:
-                tc = None
-
-            info = excel_info.get(pnr, {})
-            if naam: info["naam"] = naam
-            if tc:   info["teamcoach"] = tc
-            info["status"] = status_label
-
-            if kol_rate and status_label == "Voltooid":
-                raw_rate = str(dfc[kol_rate].iloc[i]).strip().lower()
-                if raw_rate and raw_rate not in {"nan", "none", ""}:
-                    mapping = {
-                        "zeer goed": "zeer goed",
-                        "goed": "goed",
-                        "voldoende": "voldoende",
-                        "slecht": "slecht",
-                        "zeer slecht": "zeer slecht",
-                        "zeergoed": "zeer goed",
-                        "zeerslecht": "zeer slecht",
-                    }
-                    info["beoordeling"] = mapping.get(raw_rate, raw_rate)
-
-            # nieuw: datum coaching verzamelen
-            if kol_date:
-                d_raw = dfc[kol_date].iloc[i]
-                d = pd.to_datetime(d_raw, errors="coerce", dayfirst=True)
-                if pd.notna(d):
-                    lst = info.get("coaching_datums", [])
-                    if d.strftime("%d-%m-%Y") not in lst:
-                        lst.append(d.strftime("%d-%m-%Y"))
-                    info["coaching_datums"] = lst
-
-            excel_info[pnr] = info
-
-        # nieuw: compacte DF teruggeven voor session_state
-# ... nadat kol_pnr, kol_date, kol_rate gevonden zijn
-
-            df_small = None
-            if kol_date:
-                df_small = dfc[[kol_pnr, kol_date]].copy()
-                df_small.columns = ["dienstnummer", "Datum coaching"]
-                df_small["dienstnummer"] = (
-                    df_small["dienstnummer"].astype(str).str.extract(r"(\d+)", expand=False).str.strip()
-                )
-                df_small["Datum coaching"] = pd.to_datetime(
-                    df_small["Datum coaching"], errors="coerce", dayfirst=True
-                )
-            
-                # ▼ nieuw: beoordeling per rij normaliseren
-                if kol_rate:
-                    map_rate = {
-                        "zeer goed": "zeer goed",
-                        "goed": "goed",
-                        "voldoende": "voldoende",
-                        "onvoldoende": "onvoldoende",
-                        "slecht": "slecht",
-                        "zeer slecht": "zeer slecht",
-                        "zeergoed": "zeer goed",
-                        "zeerslecht": "zeer slecht",
-                    }
-                    df_small["Beoordeling"] = (
-                        dfc[kol_rate].astype(str).str.strip().str.lower().replace(map_rate)
-                    )
-                else:
-                    df_small["Beoordeling"] = None
+        if st.button("Cache leegmaken", key="lru_leeg"):
+            cache.leeg()
 
 
-        return ids, total_rows, df_small
+@st.cache_resource(show_spinner=False, max_entries=CACHE_VERSIES)
+def load_coach_vlaggen(versie: str, _ds) -> pd.DataFrame:
+    # afgeleide kolommen per BRON-rij (voor de export): op de voltooide / lopende coachingslijst
+    ids_geel, ids_blauw, *_ = lees_coachingslijst(versie, _ds)
+    pnr = _ds.bron["dienstnummer"]
+    return pd.DataFrame({
+        "gecoacht_geel": pnr.isin(ids_geel),
+        "gecoacht_blauw": pnr.isin(ids_blauw),
+    })
 
-    s_geel  = vind_sheet(xls, "voltooide coachings")
-    s_blauw = vind_sheet(xls, "coaching")
 
-    if s_geel:
-        ids_geel,  total_geel_rows,  df_voltooide_clean = lees_sheet(s_geel,  "Voltooid")
-    if s_blauw:
-        ids_blauw, total_blauw_rows, _                 = lees_sheet(s_blauw, "Coaching")
+@st.cache_resource(show_spinner=False, max_entries=CACHE_VERSIES)
+def load_bitmaps(versie: str, _ds) -> BitmapIndex:
+    # bitmaps per sidebar-filterwaarde → rijposities in BRON (zie schade_overzicht)
+    return historie_bitmaps(_ds.bron)
 
-    # NIEUW: zet de DF in session_state zodat Tab 'Opzoeken' ze kan gebruiken
-    if isinstance(df_voltooide_clean, pd.DataFrame):
-        st.session_state["coachings_df"] = df_voltooide_clean
 
-    # normaliseer/unique datums per pnr
-    for p, inf in excel_info.items():
-        if "coaching_datums" in inf and isinstance(inf["coaching_datums"], list):
-            # sorteer en dedup
-            try:
-                dd = sorted(set(inf["coaching_datums"]),
-                            key=lambda x: pd.to_datetime(x, dayfirst=True, errors="coerce"))
-            except Exception:
-                dd = sorted(set(inf["coaching_datums"]))
-            inf["coaching_datums"] = dd
+@st.cache_resource(show_spinner=False, max_entries=CACHE_VERSIES)
+def load_kubus(versie: str, _ds) -> Kubus:
+    # telkubus over BRON: de sidebar-filters + de dimensies van de tabs (zie schade_overzicht)
+    return historie_kubus(_ds.bron)
+
 
-    return ids_geel, ids_blauw, total_geel_rows, total_blauw_rows, excel_info, None
+# _contact_map laatst: faalt als het tabblad 'contact' ontbreekt
+_OPWARM_LOADERS = (lees_coachingslijst, load_pnr_indexen, load_coach_vlaggen, load_bitmaps, load_kubus, _contact_map)
+
+
+def opwarmen(ds, vorige=None) -> None:
+    # op de achtergrond (schade_opwarmen): terwijl iemand inlogt, staat alles al klaar;
+    # daarna de entries van de vorige versie weg, de nieuwe vervangt ze
+    try:
+        for loader in _OPWARM_LOADERS:
+            loader(ds.versie, ds)
+    finally:
+        if vorige is not None:
+            for loader in _OPWARM_LOADERS:
+                loader.clear(vorige.versie, vorige)
 
 
 # =========================
@@ -445,10 +278,6 @@ def lees_coachingslijst(pad="Coachingslijst.xlsx"):
 def login_gate():
     st.title("🔐 Beveiligde toegang")
     st.caption("Log in met je personeelsnummer. Je ontvangt een verificatiecode per e-mail.")
-    try:
-        contacts = load_contact_map()
-    except Exception as e:
-        st.error(str(e)); st.stop()
 
     if "otp" not in st.session_state:
         st.session_state.otp = {"pnr":None,"email":None,"hash":None,"expires":0.0,"last_sent":0.0,"sent":False}
@@ -463,6 +292,12 @@ def login_gate():
     pnr_digits = "".join(re.findall(r"\d", pnr_input or ""))
 
     if want_code:
+        # contacten pas nu: het loginscherm wacht niet op de dataset (die wordt intussen opgewarmd)
+        try:
+            with st.spinner("Gegevens laden…"):
+                contacts = load_contact_map()
+        except Exception as e:
+            st.error(str(e)); st.stop()
         if not pnr_digits:
             st.error("Vul een geldig personeelsnummer in.")
         else:
@@ -539,15 +374,19 @@ def run_dashboard():
 
     # Data laden
     df, options = load_schade_prepared()
-    gecoachte_ids, coaching_ids, total_geel, total_blauw, excel_info, coach_warn = lees_coachingslijst()
+    ds = laad_dataset()
+    (gecoachte_ids, coaching_ids, total_geel, total_blauw,
+     coach_warn) = lees_coachingslijst(ds.versie, ds)
     st.session_state["gecoachte_ids"] = gecoachte_ids    # nieuw: voltooide set bewaren
     st.session_state["coaching_ids"]  = coaching_ids
-    st.session_state["excel_info"]    = excel_info
+    pnr_index = load_pnr_indexen(ds.versie, ds)
+    kubus = load_kubus(ds.versie, ds)
+    bitmaps = load_bitmaps(ds.versie, ds)
+    chauffeurs = ds.chauffeurs
 
 
-    # Extra kolommen
-    df["gecoacht_geel"]  = df["dienstnummer"].astype(str).isin(gecoachte_ids)
-    df["gecoacht_blauw"] = df["dienstnummer"].astype(str).isin(coaching_ids)
+    # Extra kolommen, één keer per versie berekend; concat deelt de data (geen kopie van BRON)
+    df = pd.concat([df, load_coach_vlaggen(ds.versie, ds)], axis=1)
 
     # Titel + caption
     st.title("📊 Schadegevallen Dashboard")
@@ -574,49 +413,45 @@ def run_dashboard():
         selected_voertuigen  = _ms_all("Voertuig",  voertuig_options,  "— Alle voertuigen —", "flt_vt")
         selected_kwartalen   = _ms_all("Kwartaal",  kwartaal_options,  "— Alle kwartalen —",  "flt_kw")
 
-        if selected_kwartalen:
-            per_idx  = pd.PeriodIndex(selected_kwartalen, freq="Q")
-            date_from = per_idx.start_time.min().normalize()
-            date_to   = per_idx.end_time.max().normalize()
-        else:
-            date_from = options["min_datum"]
-            date_to   = options["max_datum"]
-
-    # Filter toepassen
+    # Filter toepassen: één selectie voor de bitmaps (rijen) en de kubus (tellingen).
+    # De datumgrenzen volgen uit de kwartalen (BRON heeft geen rijen zonder datum).
     apply_quarters = bool(selected_kwartalen)
     sel_periods = pd.PeriodIndex(selected_kwartalen, freq="Q") if apply_quarters else None
-
-    mask = (
-        df["teamcoach_disp"].isin(selected_teamcoaches)
-        & df["Locatie_disp"].isin(selected_locaties)
-        & df["BusTram_disp"].isin(selected_voertuigen)
-        & (df["KwartaalP"].isin(sel_periods) if apply_quarters else True)
+    snede = dict(
+        teamcoach=selected_teamcoaches,
+        locatie=selected_locaties,
+        voertuig=selected_voertuigen,
+        kwartaal=sel_periods,
     )
-    df_filtered = df.loc[mask].copy()
-    start = pd.to_datetime(date_from)
-    end   = pd.to_datetime(date_to) + pd.Timedelta(days=1)
-    df_filtered = df_filtered[(df_filtered["Datum"] >= start) & (df_filtered["Datum"] < end)]
-
-    if df_filtered.empty:
+    # rijen + aggregaten per (versie, selectie) uit de gedeelde LRU
+    # De tabs werken op deze rijposities en nemen enkel de kolommen die ze nodig hebben.
+    weergave = filter_cache().weergave(ds.versie, "historie", snede, lambda: bitmaps.rijen(**snede))
+    rijen = weergave.rijen
+    if str(st.session_state.get("user_pnr", "")) in ADMIN_PNRS:
+        toon_cache_stats()
+
+    if len(rijen) == 0:
         st.warning("⚠️ Geen schadegevallen gevonden voor de geselecteerde filters.")
         st.stop()
 
-    # KPI + CSV export
-    st.metric("Totaal aantal schadegevallen", len(df_filtered))
-    st.download_button(
-        "⬇️ Download gefilterde data (CSV)",
-        df_to_csv_bytes(df_filtered),
-        file_name=f"schade_filtered_{datetime.today().strftime('%Y%m%d')}.csv",
-        mime="text/csv",
-        help="Exporteer de huidige selectie inclusief datumfilter."
+    # KPI + export (pas bij een klik gemaakt, per blok rijen uit BRON)
+    st.metric("Totaal aantal schadegevallen", len(rijen))
+    # de interne hulpkolommen van BRON (_pnr, _jaar, _search) laat exportknoppen weg
+    exportknoppen(
+        "Download gefilterde data",
+        {"Schadegevallen": (df, rijen)},
+        f"schade_filtered_{datetime.today().strftime('%Y%m%d')}",
+        key="dl_gefilterd",
+        help="Exporteer de huidige selectie inclusief datumfilter.",
     )
 
-    # Lichte kolom-normalisatie (niet lowercased; we behouden bestaande cases)
-    df_filtered = df_filtered.copy()
-    df_filtered.columns = (
-        df_filtered.columns.astype(str)
+    # Lichte kolom-normalisatie (niet lowercased; we behouden bestaande cases).
+    # Enkel de labels: set_axis deelt de data met df.
+    df_n = df.set_axis(
+        df.columns.astype(str)
             .str.normalize("NFKC")
-            .str.strip()
+            .str.strip(),
+        axis=1,
     )
 
     # ===== Tabs =====
@@ -635,28 +470,21 @@ def run_dashboard():
                     return c
             return None
         COL_NAAM = resolve_col(
-            df_filtered,
+            df_n,
             ["volledige naam", "volledige_naam", "chauffeur", "chauffeur naam", "naam", "volledigenaam"]
         )
         COL_NAAM_DISP = resolve_col(
-            df_filtered,
+            df_n,
             ["volledige naam_disp", "volledige_naam_disp", "naam_display", "displaynaam"]
         )
 
         if not COL_NAAM:
             st.error(
-                "Kon geen kolom voor chauffeur vinden in df_filtered. "
-                f"Beschikbare kolommen: {list(df_filtered.columns)}"
+                "Kon geen kolom voor chauffeur vinden in de schadelijst. "
+                f"Beschikbare kolommen: {list(df_n.columns)}"
             )
         else:
-            grp = (
-                df_filtered
-                .groupby(COL_NAAM, dropna=False)
-                .size()
-                .sort_values(ascending=False)
-                .reset_index(name="aantal")
-                .rename(columns={COL_NAAM: "chauffeur_raw"})
-            )
+            grp = chauffeur_telling(kubus, **snede)
 
             if grp.empty:
                 st.info("Geen schadegevallen binnen de huidige filters.")
@@ -673,14 +501,14 @@ def run_dashboard():
                 st.markdown("---")
 
                 # displaynaam-map
-                if COL_NAAM_DISP and COL_NAAM_DISP in df_filtered.columns:
-                    disp_map = (
-                        df_filtered[[COL_NAAM, COL_NAAM_DISP]]
+                if COL_NAAM_DISP and COL_NAAM_DISP in df_n.columns:
+                    disp_map = weergave.aggregaat(f"disp_map:{COL_NAAM}:{COL_NAAM_DISP}", lambda: (
+                        weergave.pas_toe(df_n[[COL_NAAM, COL_NAAM_DISP]])
                         .dropna()
                         .drop_duplicates()
                         .set_index(COL_NAAM)[COL_NAAM_DISP]
                         .to_dict()
-                    )
+                    ))
                 else:
                     disp_map = {}
 
@@ -706,36 +534,31 @@ def run_dashboard():
                 st.markdown("---")
 
 
-               
-            from functools import lru_cache
-            @lru_cache(maxsize=None)
-            def _badge_safe(raw):
-                try:
-                    b = badge_van_chauffeur(raw)
-                    return b or ""
-                except Exception:
-                    return ""
+                # de lijst als één markdown-blok (één element i.p.v. één per chauffeur),
+                # met de badges via een join op de chauffeursdimensie (dienstnummer vooraan de naam)
+                def _chauffeurlijst() -> str:
+                    raw = grp["chauffeur_raw"].map(str)
+                    badges = raw.str.extract(r"^\s*(\d+)", expand=False).map(chauffeurs["badge"]).fillna("")
+                    disp = raw.map(disp_map).fillna(raw).astype(str)
+                    regels = "**" + badges + disp + "** — " + grp["aantal"].astype(int).astype(str) + " schadegevallen"
+                    return "\n\n".join(regels)
 
-            for _, row in grp.iterrows():
-                raw = str(row["chauffeur_raw"])
-                disp = disp_map.get(raw, raw)
-                badge = _badge_safe(raw)
-                st.markdown(f"**{badge}{disp}** — {int(row['aantal'])} schadegevallen")
+                st.markdown(weergave.aggregaat(f"chauffeurlijst:{COL_NAAM}:{COL_NAAM_DISP}", _chauffeurlijst))
 
     # ===== Tab 2: Voertuig =====
     with voertuig_tab:
         st.subheader("🚘 Schadegevallen per voertuigtype")
 
-        if "BusTram_disp" not in df_filtered.columns:
+        if "BusTram_disp" not in df_n.columns:
             st.info("Kolom voor voertuigtype niet gevonden.")
         else:
-            counts = df_filtered["BusTram_disp"].value_counts(dropna=False)
+            counts = voertuig_telling(kubus, **snede)
             if counts.empty:
                 st.info("Geen schadegevallen binnen de huidige filters.")
             else:
                 c1, c2 = st.columns(2)
                 c1.metric("Unieke voertuigtypes", int(counts.shape[0]))
-                c2.metric("Totaal schadegevallen", int(len(df_filtered)))
+                c2.metric("Totaal schadegevallen", int(len(rijen)))
 
                 st.markdown("### 📊 Samenvatting per voertuigtype")
                 sum_df = counts.rename_axis("Voertuigtype").reset_index(name="Schades")
@@ -744,36 +567,21 @@ def run_dashboard():
             # --- 📈 Grafiek: schades per maand per voertuigtype (jaaroverschrijdend) ---
         st.markdown("### 📈 Schades per maand per voertuigtype")
         
-        if {"Datum", "BusTram_disp"}.issubset(df_filtered.columns):
-            work = df_filtered.copy()
-            if work.empty:
+        if {"Datum", "BusTram_disp"}.issubset(df_n.columns):
+            # Tellen per maand × voertuigtype (uit de kubus), wide-vorm: kolommen = voertuigtypes
+            pivot = kubus.tel(("maand", "voertuig"), **snede).unstack("voertuig", fill_value=0)
+            if pivot.empty:
                 st.caption("Geen data binnen de huidige filters.")
             else:
-                # Maand als tijd-as (eerste dag van de maand)
-                work["Maand"] = work["Datum"].dt.to_period("M").dt.to_timestamp()
-        
-                # Tellen per maand × voertuigtype
-                monthly = (
-                    work.groupby(["Maand", "BusTram_disp"])
-                        .size()
-                        .rename("Schades")
-                        .reset_index()
-                )
-        
-                # Wide-vorm: kolommen = voertuigtypes
+                # Volledige maandrange zodat ontbrekende maanden als 0 verschijnen,
+                # maand als tijd-as (eerste dag van de maand)
+                full_idx = pd.period_range(pivot.index.min(), pivot.index.max(), freq="M")
                 pivot = (
-                    monthly.pivot(index="Maand", columns="BusTram_disp", values="Schades")
-                           .sort_index()
+                    pivot.reindex(full_idx, fill_value=0).astype(int)
+                         .set_axis(full_idx.to_timestamp(), axis=0)
+                         .rename_axis(columns="BusTram_disp")
                 )
         
-                # Volledige maandrange zodat ontbrekende maanden als 0 verschijnen
-                full_idx = pd.period_range(
-                    work["Datum"].min().to_period("M"),
-                    work["Datum"].max().to_period("M"),
-                    freq="M"
-                ).to_timestamp()
-                pivot = pivot.reindex(full_idx).fillna(0).astype(int)
-        
                 # Lijngrafiek
                 st.line_chart(pivot, use_container_width=True)
         else:
@@ -785,10 +593,10 @@ def run_dashboard():
     with locatie_tab:
         st.subheader("📍 Schadegevallen per locatie")
 
-        if "Locatie_disp" not in df_filtered.columns:
+        if "Locatie_disp" not in df_n.columns:
             st.warning("⚠️ Kolom 'Locatie' niet gevonden in de huidige selectie.")
         else:
-            loc_options = sorted([x for x in df_filtered["Locatie_disp"].dropna().unique().tolist() if str(x).strip()])
+            loc_options = sorted([x for x in kubus.tel("locatie", **snede).index.dropna().tolist() if str(x).strip()])
             gekozen_locs = st.multiselect(
                 "Zoek locatie(s)",
                 options=loc_options,
@@ -797,12 +605,10 @@ def run_dashboard():
                 key="loc_ms"
             )
 
-            work = df_filtered.copy()
-            work["dienstnummer_s"] = work["dienstnummer"].astype(str)
-            if gekozen_locs:
-                work = work[work["Locatie_disp"].isin(gekozen_locs)]
+            loc_snede = {**snede, "locatie": gekozen_locs} if gekozen_locs else snede
+            totaal_loc = kubus.totaal(**loc_snede)
 
-            if work.empty:
+            if not totaal_loc:
                 st.info("Geen resultaten binnen de huidige filters/keuze.")
             else:
                 col_top1, col_top2 = st.columns(2)
@@ -811,17 +617,8 @@ def run_dashboard():
 
 
 
-                agg = (
-                    work.groupby("Locatie_disp")
-                        .agg(Schades=("dienstnummer_s","size"),
-                             Unieke_chauffeurs=("dienstnummer_s","nunique"))
-                        .reset_index().rename(columns={"Locatie_disp":"Locatie"})
-                )
-
-                dmin = work.groupby("Locatie_disp")["Datum"].min().rename("Eerste")
-                dmax = work.groupby("Locatie_disp")["Datum"].max().rename("Laatste")
-                agg = agg.merge(dmin, left_on="Locatie", right_index=True, how="left")
-                agg = agg.merge(dmax, left_on="Locatie", right_index=True, how="left")
+                # aantal, eerste/laatste datum en unieke chauffeurs per locatie, uit de kubus
+                agg = locatie_samenvatting(kubus, **loc_snede)
 
                 agg = agg[agg["Schades"] >= int(min_schades)]
                 if agg.empty:
@@ -829,16 +626,11 @@ def run_dashboard():
                 else:
                     c1, c2 = st.columns(2)
                     c1.metric("Unieke locaties", int(agg.shape[0]))
-                    c2.metric("Totaal schadegevallen", int(len(work)))
+                    c2.metric("Totaal schadegevallen", totaal_loc)
 
                     st.markdown("---")
                     st.subheader("📊 Samenvatting per locatie")
-                    agg_view = agg.copy()
-                    agg_view["Periode"] = agg_view.apply(
-                        lambda r: f"{r['Eerste']:%d-%m-%Y} – {r['Laatste']:%d-%m-%Y}"
-                        if pd.notna(r["Eerste"]) and pd.notna(r["Laatste"]) else "—",
-                        axis=1
-                    )
+                    agg_view = agg.assign(Periode=periode(agg["Eerste"], agg["Laatste"]))
                     cols_show = ["Locatie","Schades","Unieke_chauffeurs","Periode"]
 
 
@@ -846,12 +638,12 @@ def run_dashboard():
                         agg_view[cols_show].sort_values("Schades", ascending=False).reset_index(drop=True),
                         use_container_width=True
                     )
-                    st.download_button(
-                        "⬇️ Download samenvatting (CSV)",
-                        agg_view[cols_show].to_csv(index=False).encode("utf-8"),
-                        file_name="locaties_samenvatting.csv",
-                        mime="text/csv",
-                        key="dl_loc_summary"
+                    exportknoppen(
+                        "Download samenvatting",
+                        {"Locaties": agg_view[cols_show]},
+                        "locaties_samenvatting",
+                        key="dl_loc_summary",
+                        formaten=("csv", "xlsx"),
                     )
 
 
@@ -867,9 +659,10 @@ def run_dashboard():
         if not pnr:
             st.info("Geef een personeelsnummer in om resultaten te zien.")
         else:
-            res = df_filtered[df_filtered["dienstnummer"].astype(str).str.strip() == pnr].copy()
-            res_all = df[df["dienstnummer"].astype(str).str.strip() == pnr].copy()
-            ex_info = st.session_state.get("excel_info", {})
+            # enkel de rijen van dit dienstnummer (index), daarna beperken tot de filters
+            pos = pnr_index["bron"].rijen(pnr)
+            res_all = df.iloc[pos]
+            res = df_n.iloc[weergave.beperk(pos)]
 
             if not res.empty:
                 naam_disp = res["volledige naam_disp"].iloc[0]
@@ -880,9 +673,10 @@ def run_dashboard():
                 teamcoach_disp = res_all["teamcoach_disp"].iloc[0] if "teamcoach_disp" in res_all.columns else "onbekend"
                 naam_raw = res_all["volledige naam"].iloc[0] if "volledige naam" in res_all.columns else naam_disp
             else:
-                ex_info = st.session_state.get("excel_info", {})
-                naam_disp = (ex_info.get(pnr, {}) or {}).get("naam") or ""
-                teamcoach_disp = (ex_info.get(pnr, {}) or {}).get("teamcoach") or "onbekend"
+                naam_disp = chauffeurs["naam"].get(pnr)
+                naam_disp = "" if pd.isna(naam_disp) else naam_disp
+                teamcoach_disp = chauffeurs["teamcoach"].get(pnr)
+                teamcoach_disp = "onbekend" if pd.isna(teamcoach_disp) else teamcoach_disp
                 naam_raw = naam_disp
                 st.error("❌ Helaas, die chauffeur bestaat nog niet. Probeer opnieuw.")
 
@@ -902,7 +696,8 @@ def run_dashboard():
             set_voltooid = set(map(str, st.session_state.get("gecoachte_ids", set())))  # juiste set
             
             if pnr in set_voltooid:   # Voltooid krijgt voorrang
-                beo_raw = (st.session_state.get("excel_info", {}).get(pnr, {}) or {}).get("beoordeling", "")
+                beo_raw = chauffeurs["beoordeling"].get(pnr)
+                beo_raw = "" if pd.isna(beo_raw) else beo_raw
                 b = str(beo_raw or "").strip().lower()
                 if b in {"zeer goed", "goed"}:
                     status_lbl, status_emoji = "Goed", "🟢"
@@ -929,41 +724,22 @@ def run_dashboard():
 
             # ▼▼ Datum coaching onder Teamcoach (met per-datum kleur) ▼▼
             coaching_rows = []  # lijst van tuples (dd-mm-YYYY, emoji)
-            
-            # 1) Primaire bron: per-rij DF met datum + beoordeling
-            coach_df = st.session_state.get("coachings_df")
-            if (isinstance(coach_df, pd.DataFrame) and not coach_df.empty
-                    and {"dienstnummer", "Datum coaching"}.issubset(set(coach_df.columns))):
-                mask = coach_df["dienstnummer"].astype(str).str.strip() == str(pnr).strip()
-                rows = coach_df.loc[mask, ["Datum coaching", "Beoordeling"]].copy()
-                if not rows.empty:
-                    rows["Datum coaching"] = pd.to_datetime(rows["Datum coaching"], errors="coerce", dayfirst=True)
-                    rows = rows.dropna(subset=["Datum coaching"])
-                    for _, r in rows.iterrows():
-                        dstr = r["Datum coaching"].strftime("%d-%m-%Y")
-                        rate = str(r.get("Beoordeling", "") or "").strip().lower()
-                        dot = _beoordeling_emoji(rate).strip() or ""   # 🟢 🟠 🔴 (leeg = geen beoordeling)
-                        coaching_rows.append((dstr, dot))
-            
-            # 2) Fallback: uit excel_info (oude lijst), met globale status-kleur
-            if not coaching_rows:
-                coaching_dates = []
-                ex_info = st.session_state.get("excel_info", {})
-                if pnr in ex_info:
-                    raw = (
-                        (ex_info[pnr] or {}).get("coaching_datums")
-                        or (ex_info[pnr] or {}).get("Datum coaching")
-                        or (ex_info[pnr] or {}).get("datum_coaching")
-                    )
-                    if isinstance(raw, (list, tuple, set)):
-                        coaching_dates = [str(x).strip() for x in raw if str(x).strip()]
-                    elif isinstance(raw, str) and raw.strip():
-                        coaching_dates = re.split(r"[;,]\s*", raw.strip())
-            
-                if coaching_dates:
-                    dot = status_emoji if status_emoji in {"🟢","🟠","🔴","🟡","⚫"} else ""
-                    coaching_rows = [(d, dot) for d in coaching_dates]
-            
+            ev = ds.coachings.iloc[pnr_index["coaching"].rijen(pnr)].dropna(subset=["datum"])
+            ev_datum = ev["datum"].dt.strftime("%d-%m-%Y")
+
+            # 1) Primair: voltooide coachings, elk met de kleur van hun eigen beoordeling
+            voltooid = ev["status"].eq("Voltooid")
+            if voltooid.any():
+                coaching_rows = [
+                    (d, beoordeling_emoji(rate).strip())   # 🟢 🟠 🔴 (leeg = geen beoordeling)
+                    for d, rate in zip(ev_datum[voltooid], ev.loc[voltooid, "beoordeling"])
+                ]
+
+            # 2) Fallback: alle datums (ook lopend), met globale status-kleur
+            elif not ev.empty:
+                dot = status_emoji if status_emoji in {"🟢","🟠","🔴","🟡","⚫"} else ""
+                coaching_rows = [(d, dot) for d in ev_datum.drop_duplicates()]
+
             # 3) Tonen
             if coaching_rows:
                 st.markdown("**📅 Datum coaching:**")
@@ -984,12 +760,17 @@ def run_dashboard():
             if res.empty:
                 st.caption("Geen schadegevallen binnen de huidige filters.")
             else:
-                res = res.sort_values("Datum", ascending=False).copy()
+                # nieuwste eerst; de tabel bouwt enkel de zichtbare pagina op
+                volgorde = res["Datum"].sort_values(ascending=False).index.to_numpy()   # = rijposities (RangeIndex)
                 heeft_link = "Link" in res.columns
-                if heeft_link:
-                    res["URL"] = res["Link"].apply(extract_url)
-
                 kol = ["Datum", "Locatie_disp"] + (["URL"] if heeft_link else [])
+
+                def opzoek_rijen(deel: np.ndarray) -> pd.DataFrame:
+                    r = df_n.iloc[deel]
+                    if heeft_link:
+                        r = r.assign(URL=r["Link"].apply(extract_url))
+                    return r[kol]
+
                 column_config = {
                     "Datum": st.column_config.DateColumn("Datum", format="DD-MM-YYYY"),
                     "Locatie_disp": st.column_config.TextColumn("Locatie"),
@@ -997,7 +778,10 @@ def run_dashboard():
                 if heeft_link:
                     column_config["URL"] = st.column_config.LinkColumn("Link", display_text="openen")
 
-                st.dataframe(res[kol], column_config=column_config, use_container_width=True)
+                gepagineerde_tabel(
+                    "opzoeken", volgorde, opzoek_rijen, sleutel=pnr,
+                    column_config=column_config, use_container_width=True,
+                )
 
     # ===== Tab 5: Coaching =====
     with coaching_tab:
@@ -1005,13 +789,15 @@ def run_dashboard():
             st.subheader("🎯 Coaching – vergelijkingen")
 
             set_lopend_all   = set(map(str, st.session_state.get("coaching_ids", set())))
-            set_voltooid_all = set(st.session_state.get("excel_info", {}).keys())
+            set_voltooid_all = set(ds.coachings["pnr"])   # alle P-nrs op de coachingslijst
 
             r1, r2 = st.columns(2)
             r1.metric("🧾 Lopend – ruwe rijen (coachingslijst)",   total_blauw)
             r2.metric("🧾 Voltooid – ruwe rijen (coachingslijst)", total_geel)
 
-            pnrs_schade_sel = set(df_filtered["dienstnummer"].dropna().astype(str))
+            pnrs_schade_sel = weergave.aggregaat(
+                "pnrs", lambda: frozenset(weergave.pas_toe(df["dienstnummer"]).dropna().astype(str))
+            )
             s1, s2 = st.columns(2)
             s1.metric("🔵 Lopend (in schadelijst)",   len(pnrs_schade_sel & set_lopend_all))
             s2.metric("🟡 Voltooid (in schadelijst)", len(pnrs_schade_sel & set_voltooid_all))
@@ -1036,54 +822,44 @@ def run_dashboard():
             coach_niet_in_schade = set_coach_sel - pnrs_schade_sel
             schade_niet_in_coach = pnrs_schade_sel - set_coach_sel
 
-            def _naam(p):
-                ex_info = st.session_state.get("excel_info", {})
-                nm = (ex_info.get(p, {}) or {}).get("naam")
-                if nm and str(nm).strip().lower() not in {"nan","none",""}:
-                    return str(nm)
-                r = df.loc[df["dienstnummer"].astype(str) == str(p), "volledige naam_disp"]
-                return r.iloc[0] if not r.empty else str(p)
-
-            def _status_volledig(p):
-                in_l = p in set_lopend_all
-                in_v = p in set_voltooid_all
-                if in_l and in_v: return "Beide"
-                if in_l: return "Lopend"
-                if in_v: return "Voltooid"
-                return "Niet aangevraagd"
+            def _naam_badge(pnrs: list[str]) -> list[str]:
+                return naam_badge(chauffeurs, pnrs)
+
+            def _status_volledig(pnrs: list[str]) -> list[str]:
+                return coachingstatus(pnrs, set_lopend_all, set_voltooid_all)
 
             def _make_table(pnrs_set):
                 if not pnrs_set:
                     return pd.DataFrame(columns=["Dienstnr","Naam","Status (coachinglijst)"])
-                rows = [{
-                    "Dienstnr": p,
-                    "Naam": f"{badge_van_chauffeur(f'{p} - {_naam(p)}')}{_naam(p)}",
-                    "Status (coachinglijst)": _status_volledig(p)
-                } for p in sorted(map(str, pnrs_set))]
-                return pd.DataFrame(rows).sort_values(["Naam"]).reset_index(drop=True)
+                pnrs = sorted(map(str, pnrs_set))
+                return pd.DataFrame({
+                    "Dienstnr": pnrs,
+                    "Naam": _naam_badge(pnrs),
+                    "Status (coachinglijst)": _status_volledig(pnrs),
+                }).sort_values(["Naam"]).reset_index(drop=True)
 
             with st.expander(f"🟦 In Coachinglijst maar niet in schadelijst ({len(coach_niet_in_schade)})", expanded=False):
                 df_a = _make_table(coach_niet_in_schade)
                 st.dataframe(df_a, use_container_width=True) if not df_a.empty else st.caption("Geen resultaten.")
                 if not df_a.empty:
-                    st.download_button(
-                        "⬇️ Download CSV (coaching ∧ ¬schade)",
-                        df_a.to_csv(index=False).encode("utf-8"),
-                        file_name="coaching_zonder_schade.csv",
-                        mime="text/csv",
-                        key="dl_coach_not_schade"
+                    exportknoppen(
+                        "Download (coaching ∧ ¬schade)",
+                        {"Coaching zonder schade": df_a},
+                        "coaching_zonder_schade",
+                        key="dl_coach_not_schade",
+                        formaten=("csv",),
                     )
 
             with st.expander(f"🟥 In schadelijst maar niet in Coachinglijst ({len(schade_niet_in_coach)})", expanded=False):
                 df_b = _make_table(schade_niet_in_coach)
                 st.dataframe(df_b, use_container_width=True) if not df_b.empty else st.caption("Geen resultaten.")
                 if not df_b.empty:
-                    st.download_button(
-                        "⬇️ Download CSV (schade ∧ ¬coaching)",
-                        df_b.to_csv(index=False).encode("utf-8"),
-                        file_name="schade_zonder_coaching.csv",
-                        mime="text/csv",
-                        key="dl_schade_not_coach"
+                    exportknoppen(
+                        "Download (schade ∧ ¬coaching)",
+                        {"Schade zonder coaching": df_b},
+                        "schade_zonder_coaching",
+                        key="dl_schade_not_coach",
+                        formaten=("csv",),
                     )
 
             st.markdown("---")
@@ -1093,22 +869,26 @@ def run_dashboard():
                 value=False,
                 key="more_schades_use_filters"
             )
-            df_basis_s = df_filtered if gebruik_filters_s else df
+            # zonder filters: de weergave "alle rijen" van dezelfde LRU
+            weergave_s = weergave if gebruik_filters_s else filter_cache().weergave(ds.versie, "historie", {}, lambda: None)
             thr = st.number_input(
                 "Toon bestuurders met méér dan ... schades",
                 min_value=1, value=2, step=1, key="more_schades_threshold"
             )
-            pnr_counts = df_basis_s["dienstnummer"].dropna().astype(str).value_counts()
+            pnr_counts = weergave_s.aggregaat(
+                "pnr_counts", lambda: weergave_s.pas_toe(df["dienstnummer"]).dropna().astype(str).value_counts()
+            )
             pnrs_meer_dan = set(pnr_counts[pnr_counts > thr].index)
             set_coaching_all = set_lopend_all | set_voltooid_all
             result_set = pnrs_meer_dan - set_coaching_all
 
-            rows = [{
-                "Dienstnr": p,
-                "Naam": f"{badge_van_chauffeur(f'{p} - {_naam(p)}')}{_naam(p)}",
-                "Schades": int(pnr_counts.get(p, 0)),
+            pnrs_rs = sorted(result_set, key=lambda x: (-pnr_counts.get(x, 0), x))
+            rows = pnrs_rs and {
+                "Dienstnr": pnrs_rs,
+                "Naam": _naam_badge(pnrs_rs),
+                "Schades": [int(pnr_counts.get(p, 0)) for p in pnrs_rs],
                 "Status (coachinglijst)": "Niet aangevraagd",
-            } for p in sorted(result_set, key=lambda x: (-pnr_counts.get(x, 0), x))]
+            }
 
             df_no_coach = (
                 pd.DataFrame(rows)
@@ -1125,14 +905,27 @@ def run_dashboard():
                     st.caption(f"Uitgesloten door coaching/voltooid: {len(pnrs_meer_dan & set_coaching_all)}")
                 else:
                     st.dataframe(df_no_coach, use_container_width=True)
-                    st.download_button(
-                        "⬇️ Download CSV",
-                        df_no_coach.to_csv(index=False).encode("utf-8"),
-                        file_name=f"meerdan_{thr}_schades_niet_in_coaching_voltooid.csv",
-                        mime="text/csv",
-                        key="dl_more_schades_no_coaching"
+                    exportknoppen(
+                        "Download",
+                        {f"Meer dan {thr} schades": df_no_coach},
+                        f"meerdan_{thr}_schades_niet_in_coaching_voltooid",
+                        key="dl_more_schades_no_coaching",
+                        formaten=("csv",),
                     )
 
+            # de drie vergelijkingen samen, elk op een eigen tabblad
+            exportknoppen(
+                "Download vergelijkingen",
+                {
+                    "Coaching zonder schade": df_a,
+                    "Schade zonder coaching": df_b,
+                    f"Meer dan {thr} schades": df_no_coach,
+                },
+                "coaching_vergelijkingen",
+                key="dl_coaching_alles",
+                formaten=("xlsx",),
+            )
+
         except Exception as e:
             st.error("Er ging iets mis in het Coaching-tab.")
             st.exception(e)
@@ -1142,6 +935,7 @@ def run_dashboard():
 # =========================
 def main():
     st.set_page_config(page_title="Schade Dashboard", page_icon="📊", layout="wide")
+    registreer("historie", opwarmen)
     if not st.session_state.get("authenticated"):
         login_gate()
         return
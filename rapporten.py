@@ -0,0 +1,165 @@
+# rapporten.py
+# ============================================================
+# Rapporten per teamcoach, in batch (geen Streamlit nodig, ook vanuit cron).
+#
+#   python rapporten.py [--uit rapporten] [--formaat xlsx html csv]
+#                       [--teamcoach NAAM ...] [--kwartaal 2025Q1 ...]
+#                       [--processen N]
+#
+# Per teamcoach hetzelfde overzicht als historie.py met enkel die
+# teamcoach gekozen (schade_overzicht.teamcoach_rapport): chauffeurs met
+# hun schades en coachingstatus, locaties, voertuigtypes en de
+# schadegevallen zelf. XLSX: één werkboek met een tabblad per tabel;
+# HTML: één pagina; CSV/Parquet: één bestand per tabel.
+#
+# De teamcoaches worden verdeeld over een pool van processen (standaard
+# één per CPU-kern). Dataset, kubus en bitmaps worden één keer in het
+# hoofdproces gebouwd; op Linux (fork) erven de werkers ze zonder ze
+# opnieuw te lezen, elders bouwt elke werker ze één keer bij de start.
+# Bestanden verschijnen pas als ze volledig geschreven zijn.
+# Exitcode 1 als minstens één rapport mislukte.
+# ============================================================
+
+from __future__ import annotations
+
+import argparse
+import html
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from schade_data import laad_dataset
+from schade_export import EXPORT_FORMATEN, schrijf_export
+from schade_overzicht import historie_bitmaps, historie_kubus, teamcoach_rapport
+
+RAPPORT_FORMATEN = ("xlsx", "html", "csv", "parquet")
+
+# per proces: (dataset, kubus, bitmaps), zie _init
+_werk = None
+
+
+def _init() -> None:
+    global _werk
+    if _werk is None:
+        ds = laad_dataset()
+        _werk = (ds, historie_kubus(ds.bron), historie_bitmaps(ds.bron))
+
+
+def bestandsnaam(teamcoach: str) -> str:
+    return "teamcoach_" + (re.sub(r"[^\w-]+", "_", teamcoach, flags=re.UNICODE).strip("_") or "onbekend")
+
+
+def _klaarzetten(doel: Path, schrijf) -> Path:
+    # eerst naar een tijdelijk bestand, dan hernoemen: een lezer ziet nooit een half bestand
+    tmp = doel.with_name(f".{doel.name}.tmp")
+    try:
+        schrijf(tmp)
+        os.replace(tmp, doel)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return doel
+
+
+def schrijf_html(tabellen: dict[str, pd.DataFrame], titel: str, doel: Path) -> None:
+    delen = [
+        "<!DOCTYPE html>",
+        '<html lang="nl"><head><meta charset="utf-8">',
+        f"<title>{html.escape(titel)}</title>",
+        "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin-bottom:2em}"
+        "th,td{border:1px solid #ccc;padding:4px 8px;text-align:left}th{background:#f0f0f0}</style>",
+        f"</head><body><h1>{html.escape(titel)}</h1>",
+    ]
+    for naam, df in tabellen.items():
+        delen.append(f"<h2>{html.escape(naam)} ({len(df)})</h2>")
+        delen.append(df.to_html(index=False, na_rep="", render_links=True, border=0))
+    delen.append("</body></html>")
+    doel.write_text("\n".join(delen), encoding="utf-8")
+
+
+def maak_rapport(teamcoach: str, uit: Path, formaten: tuple[str, ...],
+                 kwartalen: list[str] | None = None) -> list[Path]:
+    """Schrijf het rapport van `teamcoach` in elk formaat naar `uit`; de geschreven bestanden."""
+    _init()
+    ds, kubus, bitmaps = _werk
+    tabellen = teamcoach_rapport(ds, kubus, bitmaps, teamcoach, kwartalen)
+    stam = f"{bestandsnaam(teamcoach)}_{datetime.today():%Y%m%d}"
+    paden = []
+    for formaat in formaten:
+        if formaat == "html":
+            paden.append(_klaarzetten(uit / f"{stam}.html", lambda p: schrijf_html(
+                tabellen, f"Schadegevallen – teamcoach {teamcoach}", p)))
+        elif formaat == "xlsx":
+            paden.append(_klaarzetten(uit / f"{stam}.xlsx", lambda p: schrijf_export(tabellen, "xlsx", p)))
+        else:
+            ext = EXPORT_FORMATEN[formaat][2]
+            for naam, df in tabellen.items():
+                paden.append(_klaarzetten(
+                    uit / f"{stam}_{naam.lower()}{ext}",
+                    lambda p, naam=naam, df=df: schrijf_export({naam: df}, formaat, p),
+                ))
+    return paden
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Schaderapporten per teamcoach (batch).")
+    parser.add_argument("--uit", type=Path, default=Path("rapporten"), help="uitvoermap (wordt aangemaakt)")
+    parser.add_argument("--formaat", nargs="+", choices=RAPPORT_FORMATEN, default=["xlsx", "html"])
+    parser.add_argument("--teamcoach", nargs="+", help="enkel deze teamcoaches (standaard: allemaal)")
+    parser.add_argument("--kwartaal", nargs="+", help="enkel deze kwartalen, bv. 2025Q1 (standaard: alle)")
+    parser.add_argument("--processen", type=int, default=os.cpu_count() or 1,
+                        help="aantal werkprocessen (1 = alles in dit proces)")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    _init()
+    ds = _werk[0]
+    coaches = ds.opties["teamcoach"]
+    if args.teamcoach:
+        onbekend = sorted(set(args.teamcoach) - set(coaches))
+        if onbekend:
+            parser.error(f"onbekende teamcoach(es): {', '.join(onbekend)}")
+        coaches = [c for c in coaches if c in set(args.teamcoach)]
+    if args.kwartaal:
+        onbekend = sorted(set(args.kwartaal) - set(ds.opties["kwartaal"]))
+        if onbekend:
+            parser.error(f"onbekend(e) kwartaal/kwartalen: {', '.join(onbekend)}")
+    args.uit.mkdir(parents=True, exist_ok=True)
+    formaten = tuple(dict.fromkeys(args.formaat))
+    processen = max(1, min(args.processen, len(coaches)))
+    print(f"{len(coaches)} teamcoaches, {', '.join(formaten)} → {args.uit} ({processen} processen)")
+
+    fouten = 0
+
+    def klaar(coach: str, paden: list[Path] | None, fout: BaseException | None) -> None:
+        nonlocal fouten
+        if fout is not None:
+            fouten += 1
+            print(f"  FOUT  {coach}: {fout!r}", file=sys.stderr)
+        else:
+            print(f"  ok    {coach}: {len(paden)} bestand(en)")
+
+    if processen == 1:
+        for coach in coaches:
+            try:
+                klaar(coach, maak_rapport(coach, args.uit, formaten, args.kwartaal), None)
+            except Exception as e:
+                klaar(coach, None, e)
+    else:
+        with ProcessPoolExecutor(max_workers=processen, initializer=_init) as pool:
+            taken = {pool.submit(maak_rapport, c, args.uit, formaten, args.kwartaal): c for c in coaches}
+            for taak in as_completed(taken):
+                fout = taak.exception()
+                klaar(taken[taak], None if fout else taak.result(), fout)
+
+    print(f"klaar in {time.perf_counter() - t0:.1f} s, {fouten} fout(en)")
+    return 1 if fouten else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
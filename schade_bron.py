@@ -0,0 +1,441 @@
+# schade_bron.py
+# ============================================================
+# Inlezen van "schade met macro.xlsm" (en de andere werkboeken)
+# met kolomsnapshot op schijf.
+#
+# Na de eerste parse worden de bladen (BRON, data hastus, contact, ...)
+# als gecomprimeerde Parquet-bestanden weggeschreven, gesleuteld op
+# de vingerafdruk van het werkboek (mtime + grootte + sha256).
+# Volgende loads lezen de snapshot; Excel wordt enkel opnieuw
+# geparsed als het werkboek effectief gewijzigd is.
+#
+# Geen Streamlit-afhankelijkheid: ook bruikbaar vanuit scripts/cron.
+# ============================================================
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except Exception:  # pyarrow is optioneel: zonder pyarrow geen snapshots
+    pa = None
+    pq = None
+
+
+BASE_DIR = Path(__file__).parent
+MACRO_PATH = BASE_DIR / "schade met macro.xlsm"
+
+SHEET_BRON = "BRON"
+SHEET_HASTUS = "data hastus"
+SHEET_CONTACT = "contact"
+MACRO_BLADEN = (SHEET_BRON, SHEET_HASTUS, SHEET_CONTACT)
+
+SNAPSHOT_DIR = Path(os.getenv("SCHADE_CACHE_DIR", str(BASE_DIR / ".schade_cache")))
+SNAPSHOT_VERSIE = 3
+SNAPSHOT_COMPRESSIE = "zstd"
+
+
+# ============================================================
+# VINGERAFDRUK
+# ============================================================
+_hash_memo: dict[tuple[str, int, int], str] = {}
+_hash_lock = threading.Lock()
+
+
+def _sha256_bestand(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for blok in iter(lambda: f.read(1 << 20), b""):
+            h.update(blok)
+    return h.hexdigest()
+
+
+def vingerafdruk(path: Path | str) -> dict:
+    """
+    mtime/grootte/sha256 van een bestand.
+    De hash wordt per (mtime, grootte) onthouden, zodat een ongewijzigd
+    bestand maar één keer volledig gelezen wordt per proces.
+    """
+    path = Path(path)
+    st_ = path.stat()
+    key = (str(path.resolve()), st_.st_mtime_ns, st_.st_size)
+    with _hash_lock:
+        digest = _hash_memo.get(key)
+    if digest is None:
+        digest = _sha256_bestand(path)
+        with _hash_lock:
+            _hash_memo[key] = digest
+    return {"mtime_ns": st_.st_mtime_ns, "size": st_.st_size, "sha256": digest}
+
+
+# ============================================================
+# KOLOMCODERING (gemengde Excel-kolommen)
+# ============================================================
+# Excel-kolommen bevatten vaak een mix van tekst, getallen en datums.
+# Parquet kent geen gemengde kolommen: zo'n kolom wordt bewaard als
+# tekstkolom + een tag-kolom met het oorspronkelijke type per cel.
+_TAG_NULL, _TAG_STR, _TAG_INT, _TAG_FLOAT, _TAG_BOOL, _TAG_DATETIME, _TAG_DATE, _TAG_TIME = range(8)
+_TAG_PREFIX = "__tag__"
+
+
+def _tag_van(v) -> int:
+    if v is None or v is pd.NaT:
+        return _TAG_NULL
+    if isinstance(v, float) and np.isnan(v):
+        return _TAG_NULL
+    if isinstance(v, (bool, np.bool_)):
+        return _TAG_BOOL
+    if isinstance(v, (int, np.integer)):
+        return _TAG_INT
+    if isinstance(v, (float, np.floating)):
+        return _TAG_FLOAT
+    if isinstance(v, dt.datetime):
+        return _TAG_DATETIME
+    if isinstance(v, dt.date):
+        return _TAG_DATE
+    if isinstance(v, dt.time):
+        return _TAG_TIME
+    return _TAG_STR
+
+
+def _codeer_gemengd(s: pd.Series) -> tuple[pd.Series, pd.Series]:
+    tags = s.map(_tag_van).astype("int8")
+    waarden = pd.Series([None] * len(s), index=s.index, dtype=object)
+    for tag in (_TAG_STR, _TAG_INT, _TAG_FLOAT, _TAG_BOOL):
+        m = tags == tag
+        if m.any():
+            waarden[m] = s[m].map(lambda v: str(int(v)) if tag == _TAG_BOOL else (v if tag == _TAG_STR else repr(v)))
+    for tag in (_TAG_DATETIME, _TAG_DATE, _TAG_TIME):
+        m = tags == tag
+        if m.any():
+            waarden[m] = s[m].map(lambda v: v.isoformat())
+    return waarden, tags
+
+
+def _decodeer_gemengd(waarden: pd.Series, tags: pd.Series) -> pd.Series:
+    out = np.full(len(waarden), np.nan, dtype=object)
+    vals = waarden.to_numpy(dtype=object)
+    t = tags.to_numpy()
+    conv = {
+        _TAG_STR: str,
+        _TAG_INT: int,
+        _TAG_FLOAT: float,
+        _TAG_BOOL: lambda v: v == "1",
+        _TAG_DATETIME: pd.Timestamp,
+        _TAG_DATE: dt.date.fromisoformat,
+        _TAG_TIME: dt.time.fromisoformat,
+    }
+    for tag, fn in conv.items():
+        idx = np.flatnonzero(t == tag)
+        if len(idx):
+            out[idx] = [fn(v) for v in vals[idx]]
+    return pd.Series(out, index=waarden.index, dtype=object)
+
+
+def _naar_arrow(df: pd.DataFrame):
+    kolommen, namen, gemengd = [], [], []
+    for c in df.columns:
+        s = df[c]
+        naam = str(c)
+        if s.dtype == object:
+            try:
+                kolommen.append(pa.array(s, from_pandas=True))
+                namen.append(naam)
+                continue
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError, OverflowError):
+                waarden, tags = _codeer_gemengd(s)
+                kolommen += [pa.array(waarden, type=pa.string(), from_pandas=True), pa.array(tags)]
+                namen += [naam, _TAG_PREFIX + naam]
+                gemengd.append(naam)
+                continue
+        kolommen.append(pa.array(s, from_pandas=True))
+        namen.append(naam)
+    return pa.Table.from_arrays(kolommen, names=namen), gemengd
+
+
+def _van_arrow(table, gemengd: list[str]) -> pd.DataFrame:
+    df = table.to_pandas()
+    for naam in gemengd:
+        df[naam] = _decodeer_gemengd(df[naam], df[_TAG_PREFIX + naam])
+        df = df.drop(columns=[_TAG_PREFIX + naam])
+    return df
+
+
+# ============================================================
+# SNAPSHOTS
+# ============================================================
+def snapshots_beschikbaar() -> bool:
+    return pq is not None
+
+
+def _slug(s: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", str(s).strip().lower()).strip("_") or "blad"
+
+
+def _kolom_spec(kolommen) -> list | None:
+    return None if kolommen is None else [k if isinstance(k, int) else str(k) for k in kolommen]
+
+
+def _snapshot_pad(werkboek: Path, blad) -> Path:
+    return SNAPSHOT_DIR / _slug(werkboek.stem) / f"{_slug(blad)}.parquet"
+
+
+def snapshot_info(werkboek: Path | str, blad, kolommen=None) -> dict | None:
+    """
+    Metadata van de snapshot van één blad (ook als die verouderd is):
+    vinger, rijen, checksum, ... of None als er geen bruikbare snapshot is.
+    """
+    if not snapshots_beschikbaar():
+        return None
+    pad = _snapshot_pad(Path(werkboek), blad)
+    if not pad.exists():
+        return None
+    try:
+        meta = pq.read_schema(pad).metadata or {}
+        info = json.loads(meta.get(b"schade_snapshot", b"{}"))
+    except Exception:
+        return None
+    if info.get("versie") != SNAPSHOT_VERSIE or info.get("kolommen") != _kolom_spec(kolommen):
+        return None
+    return info
+
+
+def lees_snapshot(werkboek: Path | str, blad, vinger: dict, kolommen=None) -> pd.DataFrame | None:
+    """Snapshot van één blad, of None als die ontbreekt, verouderd is of andere kolommen bevat."""
+    info = snapshot_info(werkboek, blad, kolommen)
+    if info is None or info.get("vinger") != vinger:
+        return None
+    try:
+        return _van_arrow(pq.read_table(_snapshot_pad(Path(werkboek), blad)), info.get("gemengd", []))
+    except Exception:
+        return None
+
+
+def schrijf_snapshot(werkboek: Path | str, blad, df: pd.DataFrame, vinger: dict, kolommen=None,
+                     rijen_info: dict | None = None) -> bool:
+    """
+    Schrijft één blad weg als Parquet (atomisch). False als dat niet lukt.
+    `rijen_info` ({"rijen", "checksum"}) wordt mee bewaard voor incrementeel inlezen.
+    """
+    if not snapshots_beschikbaar():
+        return False
+    pad = _snapshot_pad(Path(werkboek), blad)
+    try:
+        pad.parent.mkdir(parents=True, exist_ok=True)
+        table, gemengd = _naar_arrow(df)
+        info = {
+            "versie": SNAPSHOT_VERSIE, "vinger": vinger, "blad": blad,
+            "kolommen": _kolom_spec(kolommen), "gemengd": gemengd,
+            "rijen": (rijen_info or {}).get("rijen"), "checksum": (rijen_info or {}).get("checksum"),
+        }
+        meta = dict(table.schema.metadata or {})
+        meta[b"schade_snapshot"] = json.dumps(info).encode("utf-8")
+        table = table.replace_schema_metadata(meta)
+        tmp = pad.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        pq.write_table(table, tmp, compression=SNAPSHOT_COMPRESSIE)
+        os.replace(tmp, pad)
+        return True
+    except Exception:
+        return False
+
+
+# ============================================================
+# WERKBOEK INLEZEN (streaming, read-only)
+# ============================================================
+def open_werkboek(path: Path | str):
+    """
+    Read-only openpyxl-werkboek: rijen worden uit de XML gestreamd in plaats
+    van een volledige celboom op te bouwen; VBA en externe links worden
+    overgeslagen.
+    """
+    import openpyxl
+
+    return openpyxl.load_workbook(path, read_only=True, data_only=True, keep_vba=False, keep_links=False)
+
+
+def _vind_blad(sheet_names: list, blad) -> str | None:
+    if isinstance(blad, int):
+        return sheet_names[blad] if 0 <= blad < len(sheet_names) else None
+    doel = str(blad).strip().lower()
+    return next((s for s in sheet_names if str(s).strip().lower() == doel), None)
+
+
+def _kolomnamen(header) -> list[str]:
+    # zoals read_excel: lege kop → "Unnamed: i", dubbele kop → "naam.1", "naam.2", ...
+    namen, gezien = [], {}
+    for i, h in enumerate(header):
+        naam = f"Unnamed: {i}" if h is None or str(h) == "" else str(h)
+        if naam in gezien:
+            gezien[naam] += 1
+            naam = f"{naam}.{gezien[naam]}"
+        else:
+            gezien[naam] = 0
+        namen.append(naam)
+    return namen
+
+
+# tekstwaarden die read_excel standaard als leeg beschouwt (o.a. Excel-fout #N/A)
+_NA_TEKST = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+})
+
+
+def _kolom_naar_series(waarden: list) -> pd.Series:
+    s = pd.Series(waarden, dtype=object)
+    s = s.mask(s.isna() | s.isin(_NA_TEKST))  # None → NaN, zoals read_excel
+    if s.isna().all():
+        return pd.Series(np.nan, index=s.index, dtype="float64")
+    return s.infer_objects()
+
+
+def _selecteer_kolommen(namen: list[str], kolommen) -> list[int]:
+    """
+    Posities (in bladvolgorde) van de gevraagde kolommen.
+    Een int is een positie (0 = kolom A), een str een kopnaam
+    (hoofdletter-/spatieongevoelig). Onbekende namen worden genegeerd.
+    """
+    if kolommen is None:
+        return list(range(len(namen)))
+    per_naam: dict[str, list[int]] = {}
+    for i, n in enumerate(namen):
+        per_naam.setdefault(n.strip().lower(), []).append(i)
+    keep: set[int] = set()
+    for k in kolommen:
+        if isinstance(k, int):
+            if 0 <= k < len(namen):
+                keep.add(k)
+        else:
+            keep.update(per_naam.get(str(k).strip().lower(), []))
+    return sorted(keep)
+
+
+def _stream_blad(ws, kolommen=None, vorige_rijen: int = 0) -> tuple[pd.DataFrame, dict]:
+    """
+    Leest een werkbladrij per rij (kopregel = rij 1) rechtstreeks in
+    kolomlijsten, zonder tussentijdse dict per rij.
+    Houdt tegelijk een lopende checksum over de rijen bij; de tussenstand
+    na rij `vorige_rijen` dient om te zien of enkel rijen toegevoegd zijn.
+    """
+    rijen = ws.iter_rows(values_only=True)
+    header = next(rijen, None)
+    if header is None:
+        return pd.DataFrame(), {"rijen": 0, "checksum": None, "checksum_vorige": None}
+    namen = _kolomnamen(header)
+    posities = _selecteer_kolommen(namen, kolommen)
+    kolomlijsten: list[list] = [[] for _ in posities]
+    appends = [k.append for k in kolomlijsten]
+
+    h = hashlib.blake2b(repr(namen).encode("utf-8"), digest_size=16)
+    checksum_vorige = None
+    n = laatste = 0
+    for r in rijen:
+        n += 1
+        breedte = len(r)
+        vals = [r[j] if j < breedte else None for j in posities]
+        for append, v in zip(appends, vals):
+            append(v)
+        if any(v is not None for v in vals):
+            # lege rijen tellen pas mee als er nog een gevulde rij op volgt
+            h.update(b"\n" * (n - laatste - 1) + repr(vals).encode("utf-8") + b"\n")
+            laatste = n
+            if n == vorige_rijen:
+                checksum_vorige = h.hexdigest()
+
+    df = pd.DataFrame({namen[j]: _kolom_naar_series(k[:laatste]) for j, k in zip(posities, kolomlijsten)})
+    return df, {"rijen": laatste, "checksum": h.hexdigest(), "checksum_vorige": checksum_vorige}
+
+
+def lees_blad_kolommen(ws, kolommen=None) -> pd.DataFrame:
+    """
+    Werkblad als DataFrame, rechtstreeks uit de rijstroom.
+    `kolommen` beperkt het resultaat tot de kolommen die de consumenten
+    nodig hebben (zie _selecteer_kolommen); None = alle kolommen.
+    Lege rijen onderaan worden weggelaten.
+    """
+    return _stream_blad(ws, kolommen)[0]
+
+
+def lees_bladen_met_info(path: Path | str, bladen, vorige: dict | None = None) -> tuple[dict, dict]:
+    """
+    Zoals lees_bladen, plus per blad {"rijen", "checksum", "aangevuld_vanaf"}.
+
+    `vorige` = {blad: {"rijen", "checksum"}} van de vorige inlezing (anders
+    uit de verouderde snapshot). Als de eerste `rijen` rijen nog exact
+    dezelfde checksum geven, zijn er enkel rijen onderaan bijgekomen:
+    "aangevuld_vanaf" is dan het oude aantal rijen, zodat de aanroeper
+    enkel de nieuwe staart hoeft voor te bereiden. Anders is het None
+    (volledig opnieuw opbouwen).
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Bestand niet gevonden: {path.name}")
+    if not isinstance(bladen, dict):
+        bladen = {blad: None for blad in bladen}
+    vorige = vorige or {}
+
+    vinger = vingerafdruk(path)
+    out: dict = {}
+    info: dict = {}
+    te_lezen = []
+    for blad, kolommen in bladen.items():
+        snap = snapshot_info(path, blad, kolommen)
+        df = lees_snapshot(path, blad, vinger, kolommen) if snap else None
+        if df is None:
+            te_lezen.append((blad, vorige.get(blad) or snap or {}))
+        else:
+            out[blad] = df
+            info[blad] = {"rijen": snap.get("rijen"), "checksum": snap.get("checksum"), "aangevuld_vanaf": None}
+
+    if te_lezen:
+        wb = open_werkboek(path)
+        try:
+            for blad, oud in te_lezen:
+                echt = _vind_blad(wb.sheetnames, blad)
+                if echt is None:
+                    continue
+                oud_rijen = int(oud.get("rijen") or 0)
+                df, meta = _stream_blad(wb[echt], bladen[blad], oud_rijen)
+                aangevuld = (
+                    oud_rijen
+                    if oud_rijen and oud.get("checksum") and meta["checksum_vorige"] == oud.get("checksum")
+                    else None
+                )
+                schrijf_snapshot(path, blad, df, vinger, bladen[blad], meta)
+                out[blad] = df
+                info[blad] = {"rijen": meta["rijen"], "checksum": meta["checksum"], "aangevuld_vanaf": aangevuld}
+        finally:
+            wb.close()
+
+    return out, info
+
+
+def lees_bladen(path: Path | str, bladen) -> dict:
+    """
+    Geeft {blad: DataFrame} voor de gevraagde bladen (ruwe read_excel-vorm).
+    `bladen` is een lijst bladen of een dict {blad: kolommen} om per blad
+    enkel de nodige kolommen te lezen (zie lees_blad_kolommen).
+    Een blad mag een naam (hoofdletterongevoelig) of een positie (int) zijn;
+    de sleutel in het resultaat is wat gevraagd werd.
+    Eerst uit de snapshot; alle ontbrekende/verouderde bladen worden samen in
+    één doorgang uit Excel gestreamd (één keer openen, read-only) en daarna
+    opnieuw weggeschreven. Bladen die niet in het werkboek staan, ontbreken
+    in het resultaat.
+    """
+    return lees_bladen_met_info(path, bladen)[0]
+
+
+def lees_macro_bladen(path: Path | str = MACRO_PATH, bladen=MACRO_BLADEN) -> dict[str, pd.DataFrame]:
+    """Bladen uit "schade met macro.xlsm" (zie lees_bladen)."""
+    return lees_bladen(path, bladen)
@@ -0,0 +1,134 @@
+# schade_cache.py
+# ============================================================
+# LRU-cache van gefilterde weergaven (geen Streamlit nodig).
+#
+# Gebruikers springen heen en weer tussen dezelfde selecties (jaar,
+# teamcoach, kwartaal, ...). Per (dataset-versie, app, genormaliseerde
+# filters) bewaren we de gefilterde rijposities en de afgeleide
+# aggregaten die de tabs er al uit berekend hebben. In de apps is er één
+# cache per proces (st.cache_resource), dus gedeeld over alle sessies.
+#
+# Begrensd: bij meer dan `grootte` weergaven valt de langst niet
+# gebruikte weg. Treffers/missers worden geteld (zichtbaar voor admins).
+# ============================================================
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from schade_index import binnen
+
+LRU_GROOTTE = int(os.getenv("SCHADE_LRU_GROOTTE", "64"))
+
+
+def filter_sleutel(**filters) -> tuple:
+    """
+    Genormaliseerde, hashbare vorm van een filterselectie: per dimensie
+    (gesorteerd op naam) de gekozen waarden als gesorteerde tuple van
+    strings, of None (= geen filter). Volgorde en dubbels in een
+    multiselect maken dus niet uit.
+    """
+    out = []
+    for naam in sorted(filters):
+        waarde = filters[naam]
+        if waarde is None:
+            out.append((naam, None))
+        elif isinstance(waarde, (list, tuple, set, frozenset, pd.Index, pd.Series, np.ndarray)):
+            out.append((naam, tuple(sorted({str(w) for w in waarde}))))
+        else:
+            out.append((naam, (str(waarde),)))
+    return tuple(out)
+
+
+@dataclass
+class Weergave:
+    """Gefilterde rijposities (None = alle rijen) + aggregaten op naam."""
+    rijen: np.ndarray | None
+    aggregaten: dict[str, Any] = field(default_factory=dict)
+    _cache: "WeergaveCache | None" = field(default=None, repr=False)
+
+    def pas_toe(self, df: pd.DataFrame | pd.Series) -> pd.DataFrame | pd.Series:
+        """
+        De rijen van deze weergave uit `df` (frame of kolom). Neem eerst de
+        kolommen die je nodig hebt: enkel die worden gekopieerd.
+        """
+        return df if self.rijen is None else df.iloc[self.rijen]
+
+    def aantal(self, df: pd.DataFrame | pd.Series) -> int:
+        return len(df) if self.rijen is None else len(self.rijen)
+
+    def beperk(self, posities: np.ndarray) -> np.ndarray:
+        """De (oplopende) rijposities die ook in deze weergave zitten."""
+        return posities if self.rijen is None else self.rijen[binnen(posities, self.rijen)]
+
+    def aggregaat(self, naam: str, bouw: Callable[[], Any]) -> Any:
+        """Aggregaat `naam` van deze weergave; enkel de eerste keer via bouw()."""
+        if naam in self.aggregaten:
+            if self._cache is not None:
+                self._cache._tel("aggregaat_treffers")
+            return self.aggregaten[naam]
+        if self._cache is not None:
+            self._cache._tel("aggregaat_missers")
+        return self.aggregaten.setdefault(naam, bouw())
+
+
+class WeergaveCache:
+    """
+    Thread-safe LRU van Weergave-objecten. De sleutel bevat de
+    dataset-versie, dus na een nieuwe versie worden oude weergaven nooit
+    meer geraakt en verdwijnen ze vanzelf achteraan de lijst.
+    """
+
+    def __init__(self, grootte: int = LRU_GROOTTE):
+        self.grootte = max(1, int(grootte))
+        self._items: OrderedDict[tuple, Weergave] = OrderedDict()
+        self._lock = threading.Lock()
+        self._tellers = dict.fromkeys(
+            ("treffers", "missers", "verwijderd", "aggregaat_treffers", "aggregaat_missers"), 0
+        )
+
+    def _tel(self, naam: str) -> None:
+        with self._lock:
+            self._tellers[naam] += 1
+
+    def weergave(self, versie: str, app: str, filters: dict,
+                 rijen: Callable[[], np.ndarray | None]) -> Weergave:
+        """Weergave voor (versie, app, filters); bij een misser via rijen() opgebouwd."""
+        sleutel = (versie, app, filter_sleutel(**filters))
+        with self._lock:
+            w = self._items.get(sleutel)
+            if w is not None:
+                self._items.move_to_end(sleutel)
+                self._tellers["treffers"] += 1
+                return w
+            self._tellers["missers"] += 1
+
+        # buiten de lock opbouwen: andere sessies wachten niet op deze selectie
+        nieuw = Weergave(rijen(), _cache=self)
+        with self._lock:
+            w = self._items.setdefault(sleutel, nieuw)
+            self._items.move_to_end(sleutel)
+            while len(self._items) > self.grootte:
+                self._items.popitem(last=False)
+                self._tellers["verwijderd"] += 1
+        return w
+
+    def leeg(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            t = dict(self._tellers)
+            t["weergaven"] = len(self._items)
+            t["grootte"] = self.grootte
+        opvragingen = t["treffers"] + t["missers"]
+        t["trefkans"] = round(t["treffers"] / opvragingen, 3) if opvragingen else 0.0
+        return t
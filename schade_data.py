@@ -0,0 +1,662 @@
+# schade_data.py
+# ============================================================
+# Gedeelde dataset voor app.py, dashboard_schade.py en historie.py.
+#
+# Eén voorbereide bundel (BRON + data hastus + contact + coachings +
+# gesprekken) per proces, gedeeld door alle sessies. De bundel wordt
+# enkel opnieuw opgebouwd als één van de bronbestanden wijzigt.
+#
+# De DataFrames in de bundel zijn gedeeld en dus read-only:
+# nooit in-place wijzigen of kolommen toevoegen, maar werken op een
+# afgeleide (df.assign / df[mask]); copy-on-write maakt dat goedkoop.
+# ============================================================
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from schade_bron import (
+    BASE_DIR,
+    MACRO_PATH,
+    SHEET_BRON,
+    SHEET_CONTACT,
+    SHEET_HASTUS,
+    lees_bladen,
+    lees_bladen_met_info,
+    vingerafdruk,
+)
+
+if int(pd.__version__.split(".")[0]) < 3:
+    # pandas 3 heeft altijd copy-on-write; in 2.x expliciet aanzetten
+    pd.set_option("mode.copy_on_write", True)
+
+
+FILE_SCHADE = MACRO_PATH
+FILE_COACHING = BASE_DIR / "Coachingslijst.xlsx"
+FILE_GESPREKKEN = BASE_DIR / "Overzicht gesprekken (aangepast).xlsx"
+
+SHEET_COACH_DONE = "Voltooide coachings"
+SHEET_COACH_PENDING = "Coaching"
+
+HASTUS_KOLOMMEN = ["p-nr", "pnr", "personeelsnr", "personeelsnummer", "p nr"]
+PNR_NAMEN = ["personeelsnr", "personeelsnummer", "personeels nr", "p-nr", "p nr"]
+COACHING_PNR_NAMEN = ["p-nr", "p_nr", "pnr", "pnummer", "personeelsnr", "personeelsnummer", "dienstnummer", "p nr"]
+GESPREK_PNR_NAMEN = ["nummer", "personeelsnr", "personeelsnummer", "p-nr", "p nr"]
+CONTACT_KOLOMMEN = [0, 1, 2]  # A = personeelsnr, B = naam, C = e-mail
+# Kolommen per blad van het macro-werkboek. BRON volledig: de export
+# "gefilterde data" in historie.py bevat alle kolommen van het blad.
+MACRO_KOLOMMEN = {
+    SHEET_BRON: None,
+    SHEET_HASTUS: HASTUS_KOLOMMEN,
+    SHEET_CONTACT: CONTACT_KOLOMMEN,
+}
+
+# Kolommen van de coachingslijst (zoals historie.py ze zoekt)
+COACH_VOORNAAM_NAMEN = ["voornaam", "firstname", "first name", "given name"]
+COACH_ACHTERNAAM_NAMEN = ["achternaam", "familienaam", "lastname", "last name", "surname", "naam"]
+COACH_VOLLEDIG_NAMEN = ["volledige naam", "chauffeur", "bestuurder", "name"]
+COACH_TEAMCOACH_NAMEN = ["teamcoach", "coach", "team coach"]
+COACH_BEOORDELING_NAMEN = ["beoordeling coaching", "beoordeling", "rating", "evaluatie"]
+COACH_DATUM_NAMEN = ["datum coaching", "datumcoaching", "coaching datum", "datum"]
+COACHING_KOLOMMEN = ["pnr", "datum", "beoordeling", "status", "blad", "naam", "teamcoach"]
+
+BEOORDELING_NORM = {
+    "zeer goed": "zeer goed",
+    "goed": "goed",
+    "voldoende": "voldoende",
+    "onvoldoende": "onvoldoende",
+    "slecht": "slecht",
+    "zeer slecht": "zeer slecht",
+    "zeergoed": "zeer goed",
+    "zeerslecht": "zeer slecht",
+}
+BEOORDELING_EMOJI = {
+    "zeer goed": "🟢 ", "goed": "🟢 ",
+    "voldoende": "🟠 ",
+    "slecht": "🔴 ", "onvoldoende": "🔴 ", "zeer slecht": "🔴 ",
+}
+LOPEND_EMOJI = "⚫ "
+
+# Canonieke P-nr-sleutel ("41092", "string"-dtype, leeg = <NA>), bij het
+# laden één keer berekend voor elke tabel in de dataset. Joins en filters
+# vergelijken deze kolom in plaats van telkens pnr_to_clean_string te doen.
+PNR_KOLOM = "_pnr"
+
+# Compacte opslag (SCHADE_COMPACT=0 schakelt uit): dimensiekolommen met
+# weinig verschillende waarden als category, vrije tekst als Arrow-string.
+COMPACT = os.getenv("SCHADE_COMPACT", "1").strip().lower() not in {"0", "false", "no"}
+# per-versie caches in de apps (st.cache_resource(versie, _ds)): hoogstens de huidige
+# en de vorige versie, zodat elke nieuwe versie van een bronbestand de vorige verdringt
+CACHE_VERSIES = 2
+BRON_DIMENSIES = ("teamcoach", "Locatie", "Bus/ Tram", "Kwartaal", "teamcoach_disp", "Locatie_disp", "BusTram_disp")
+CATEGORIE_MAX_AANDEEL = 0.5   # andere tabellen: category als hoogstens de helft van de waarden verschilt
+GESPREK_TEKST_KOLOMMEN = ("Info",)   # vrije tekst, soms met een datum of getal in een cel
+try:
+    import pyarrow  # noqa: F401
+    ARROW_STRING = "string[pyarrow]"
+except ImportError:  # pragma: no cover
+    ARROW_STRING = "string"
+
+# BRON-kolommen met tekst die gestript worden
+BRON_TEKST_KOLOMMEN = ("volledige naam", "teamcoach", "Locatie", "Bus/ Tram", "Link")
+
+
+# ============================================================
+# HELPERS (gedeeld door de apps)
+# ============================================================
+def norm(x) -> str:
+    return str(x).strip().lower() if x is not None else ""
+
+
+def find_col(df: pd.DataFrame, possible_names: list[str]) -> str | None:
+    cols_norm = {norm(c): c for c in df.columns}
+    for name in possible_names:
+        key = norm(name)
+        if key in cols_norm:
+            return cols_norm[key]
+    return None
+
+
+EXCEL_EPOCH = pd.Timestamp("1899-12-30", tz="UTC")
+
+
+def _datum_soort(v) -> int:
+    # 0 = datetime/Timestamp, 1 = Excel-serieel getal, 2 = tekst (en al de rest)
+    if isinstance(v, datetime):
+        return 0
+    if isinstance(v, (int, float)):
+        return 1
+    return 2
+
+
+def _excel_serieel(x) -> pd.Series:
+    dagen = pd.to_numeric(pd.Series(x, dtype="float64"), errors="coerce")
+    dagen = dagen.where(np.isfinite(dagen))
+    return EXCEL_EPOCH + pd.to_timedelta(dagen, unit="D")
+
+
+def _tekst_datums(x) -> pd.Series:
+    # elke unieke tekst één keer parsen (datums herhalen zich sterk)
+    tekst = pd.Series(x, dtype=object).astype(str)
+    uniek = pd.Index(tekst.unique())
+    geparsed = pd.to_datetime(uniek, utc=True, errors="coerce", dayfirst=True, format="mixed")
+    return pd.Series(geparsed.take(uniek.get_indexer(tekst)))
+
+
+def to_datetime_utc_series(s: pd.Series) -> pd.Series:
+    """
+    Excel-datumkolom → datetime64 (UTC), gevectoriseerd.
+    Ondersteunt door elkaar: datetime/Timestamp (naïef = UTC),
+    Excel-seriële getallen (dagen sinds 1899-12-30) en tekst (dayfirst).
+    Leeg of onleesbaar → NaT.
+    De waarden worden per soort gegroepeerd en per groep in bulk omgezet.
+    """
+    s = pd.Series(s)
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        return pd.to_datetime(s, utc=True)
+    if pd.api.types.is_bool_dtype(s.dtype) or pd.api.types.is_numeric_dtype(s.dtype):
+        return pd.Series(_excel_serieel(s.to_numpy()).to_numpy(), index=s.index)
+
+    out = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns, UTC]")
+    gevuld = s.notna().to_numpy()
+    if not gevuld.any():
+        return out
+    waarden = s.to_numpy(dtype=object)[gevuld]
+    soort = np.fromiter((_datum_soort(v) for v in waarden), dtype=np.int8, count=len(waarden))
+    pos = np.flatnonzero(gevuld)
+
+    res = np.full(len(waarden), np.datetime64("NaT"), dtype="datetime64[ns]")
+    for k, omzetten in ((0, lambda x: pd.to_datetime(pd.Series(x), utc=True, errors="coerce")),
+                        (1, _excel_serieel),
+                        (2, _tekst_datums)):
+        m = soort == k
+        if m.any():
+            res[m] = omzetten(waarden[m]).dt.tz_convert(None).dt.as_unit("ns").to_numpy()
+    out.iloc[pos] = pd.DatetimeIndex(res).tz_localize("UTC")
+    return out
+
+
+def pnr_to_clean_string(v) -> str:
+    """Fix Excel floats zoals 41520.0 -> 41520"""
+    if v is None:
+        return ""
+    try:
+        if pd.isna(v):
+            return ""
+    except (TypeError, ValueError):
+        pass
+    try:
+        f = float(v)
+        if f.is_integer():
+            return str(int(f))
+    except Exception:
+        pass
+    s = str(v).strip()
+    if re.fullmatch(r"\d+\.0", s):
+        return s.split(".")[0]
+    return s
+
+
+def pnr_sleutel(s: pd.Series) -> pd.Series:
+    """
+    Gevectoriseerde pnr_to_clean_string voor een hele kolom:
+    gehele getallen (41520, 41520.0, "41520.0") → "41520", de rest gestript.
+    Resultaat is "string"; leeg/ontbrekend → <NA> (i.p.v. "").
+    """
+    s = pd.Series(s)
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        return s.astype(object).map(pnr_to_clean_string).astype("string").replace("", pd.NA)
+    if pd.api.types.is_bool_dtype(s.dtype):
+        s = s.astype("Int64")
+    tekst = s.astype("string").str.strip()
+    num = pd.to_numeric(s if pd.api.types.is_numeric_dtype(s.dtype) else tekst, errors="coerce").astype("Float64")
+    heel = (num.notna() & (num % 1 == 0) & (num.abs() < 2**63)).fillna(False)
+    if heel.any():
+        tekst = tekst.mask(heel, num.where(heel).astype("Int64").astype("string"))
+    return tekst.mask(tekst.eq("").fillna(False))
+
+
+def _met_pnr_sleutel(df: pd.DataFrame, namen: list, positie: int | None = None) -> pd.DataFrame:
+    """Voegt de canonieke P-nr-sleutel (PNR_KOLOM) toe; <NA> als er geen P-nr-kolom is."""
+    col = find_col(df, namen)
+    if col is None and positie is not None and df.shape[1] > positie:
+        col = df.columns[positie]
+    sleutel = pnr_sleutel(df[col]) if col is not None else pd.Series(pd.NA, index=df.index, dtype="string")
+    return df.assign(**{PNR_KOLOM: sleutel})
+
+
+def _strip_kolomnamen(df: pd.DataFrame) -> pd.DataFrame:
+    return df.rename(columns=lambda c: str(c).strip())
+
+
+def _clean_display_series(s: pd.Series) -> pd.Series:
+    s = s.astype("string").str.strip()
+    bad = s.isna() | s.eq("") | s.str.lower().isin({"nan", "none", "<na>"})
+    return s.mask(bad, "onbekend")
+
+
+def _als_int_kolom(s: pd.Series) -> pd.Series:
+    """Numerieke kolom met enkel gehele waarden (41092.0) → Int64."""
+    num = pd.to_numeric(s, errors="coerce")
+    if s.notna().sum() != num.notna().sum():
+        return s
+    if not (num.dropna() % 1 == 0).all():
+        return s
+    return num.astype("Int64")
+
+
+def _is_tekst(s: pd.Series) -> bool:
+    if isinstance(s.dtype, pd.StringDtype):
+        return True
+    if s.dtype != object:
+        return False
+    waarden = s.dropna()
+    return len(waarden) > 0 and bool(waarden.map(type).eq(str).all())
+
+
+def compacteer(df: pd.DataFrame, categorie: tuple[str, ...] | None = None,
+               tekst: tuple[str, ...] = ()) -> pd.DataFrame:
+    """
+    Tekstkolommen compact opslaan: category voor de kolommen in `categorie`
+    (None = elke tekstkolom met hoogstens CATEGORIE_MAX_AANDEEL verschillende
+    waarden), de rest als Arrow-string. De P-nr-sleutel blijft ongemoeid;
+    kolommen met gemengde types (tekst + getallen/datums) ook, behalve de
+    vrije-tekstkolommen in `tekst` (enkel voor weergave): die worden tekst.
+    """
+    kol = {}
+    for col in df.columns:
+        s = df[col]
+        if col in tekst and s.dtype == object:
+            kol[col] = s.astype(ARROW_STRING)
+            continue
+        if col == PNR_KOLOM or not _is_tekst(s):
+            continue
+        if categorie is not None:
+            als_categorie = col in categorie
+        else:
+            als_categorie = s.nunique() <= CATEGORIE_MAX_AANDEEL * s.notna().sum()
+        if als_categorie:
+            kol[col] = s.astype("category")
+        elif getattr(s.dtype, "storage", None) != "pyarrow":
+            kol[col] = s.astype(ARROW_STRING)
+    return df.assign(**kol) if kol else df
+
+
+def geheugen_per_kolom(df: pd.DataFrame) -> pd.DataFrame:
+    """Per kolom: dtype, verschillende waarden en bytes (deep), grootste eerst."""
+    return pd.DataFrame({
+        "kolom": [str(c) for c in df.columns],
+        "dtype": [str(t) for t in df.dtypes],
+        "uniek": [int(df[c].nunique()) for c in df.columns],
+        "bytes": df.memory_usage(deep=True, index=False).to_numpy(),
+    }).sort_values("bytes", ascending=False, kind="stable").reset_index(drop=True)
+
+
+# ============================================================
+# BRON VOORBEREIDEN
+# ============================================================
+def _bereid_rijen(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """Rij per rij voorbereiden (alles behalve de opties); werkt ook op een staart van BRON."""
+    df = _strip_kolomnamen(df_raw)
+    col_datum = find_col(df, ["datum"])
+    if col_datum is None:
+        raise ValueError(f"Kolom 'Datum' niet gevonden in tab {SHEET_BRON}.")
+    if col_datum != "Datum":
+        df = df.rename(columns={col_datum: "Datum"})
+
+    datum = to_datetime_utc_series(df["Datum"]).dt.tz_convert(None)
+    df = df.assign(Datum=datum)[datum.notna()].reset_index(drop=True)
+
+    for col in BRON_TEKST_KOLOMMEN:
+        if col in df.columns:
+            df[col] = df[col].astype("string").str.strip()
+    col_pnr = find_col(df, PNR_NAMEN)
+    if col_pnr:
+        df[col_pnr] = _als_int_kolom(df[col_pnr])
+        df[PNR_KOLOM] = pnr_sleutel(df[col_pnr])
+    else:
+        df[PNR_KOLOM] = pd.Series(pd.NA, index=df.index, dtype="string")
+
+    df["_jaar"] = df["Datum"].dt.year.astype("Int64")
+    df["dienstnummer"] = (
+        df["volledige naam"].astype(str).str.extract(r"^(\d+)", expand=False).astype("string").str.strip()
+    )
+    df["KwartaalP"] = df["Datum"].dt.to_period("Q")
+    df["Kwartaal"] = df["KwartaalP"].astype(str)
+
+    df["volledige naam_disp"] = _clean_display_series(df["volledige naam"])
+    df["teamcoach_disp"] = _clean_display_series(df["teamcoach"])
+    df["Locatie_disp"] = _clean_display_series(df["Locatie"])
+    df["BusTram_disp"] = _clean_display_series(df["Bus/ Tram"])
+
+    # zoekveld (personeelsnr + naam + voertuig, lowercase)
+    col_voertuig = find_col(df, ["voertuig"])
+    df["_search"] = (
+        (df[col_pnr].astype("string").fillna("") if col_pnr else "") + " " +
+        df["volledige naam"].fillna("") + " " +
+        (df[col_voertuig].astype("string").fillna("") if col_voertuig else "")
+    ).str.lower()
+    return df
+
+
+def _bron_opties(df: pd.DataFrame) -> dict:
+    return {
+        "teamcoach": sorted(df["teamcoach_disp"].dropna().unique().tolist()),
+        "locatie":   sorted(df["Locatie_disp"].dropna().unique().tolist()),
+        "voertuig":  sorted(df["BusTram_disp"].dropna().unique().tolist()),
+        "kwartaal":  sorted(df["KwartaalP"].dropna().astype(str).unique().tolist()),
+        "jaren":     sorted(int(y) for y in df["_jaar"].dropna().unique()),
+        "min_datum": df["Datum"].min().normalize() if len(df) else pd.NaT,
+        "max_datum": df["Datum"].max().normalize() if len(df) else pd.NaT,
+    }
+
+
+def _voeg_opties_samen(oud: dict, nieuw: dict) -> dict:
+    out = {k: sorted(set(oud[k]) | set(nieuw[k])) for k in ("teamcoach", "locatie", "voertuig", "kwartaal", "jaren")}
+    out["min_datum"] = min((d for d in (oud["min_datum"], nieuw["min_datum"]) if pd.notna(d)), default=pd.NaT)
+    out["max_datum"] = max((d for d in (oud["max_datum"], nieuw["max_datum"]) if pd.notna(d)), default=pd.NaT)
+    return out
+
+
+def bereid_bron_voor(df_raw: pd.DataFrame) -> tuple[pd.DataFrame, dict]:
+    """
+    Eén voorbereiding voor alle apps.
+    Rijen zonder geldige datum vallen weg (lege rijen onderaan BRON).
+    Afgeleide kolommen: Datum (datetime), _jaar, KwartaalP/Kwartaal,
+    dienstnummer, *_disp en _search.
+    """
+    df = _bereid_rijen(df_raw)
+    if COMPACT:
+        df = compacteer(df, BRON_DIMENSIES)
+    return df, _bron_opties(df)
+
+
+def vul_bron_aan(bron: pd.DataFrame, opties: dict, staart_raw: pd.DataFrame) -> tuple[pd.DataFrame, dict] | None:
+    """
+    Voegt enkel de nieuwe (onderaan toegevoegde) BRON-rijen toe aan een
+    reeds voorbereide BRON. None als de staart niet naadloos aansluit
+    (andere kolommen of kolomtypes) → dan volledig opnieuw voorbereiden.
+    """
+    staart = _bereid_rijen(staart_raw)
+    if list(staart.columns) != list(bron.columns):
+        return None
+    if len(staart) == 0:
+        return bron, opties
+    df = pd.concat([bron, staart], ignore_index=True)
+    if COMPACT:
+        df = compacteer(df, BRON_DIMENSIES)   # categorieën van staart en BRON samen
+    if not df.dtypes.astype(str).equals(bron.dtypes.astype(str)):
+        return None
+    return df, _voeg_opties_samen(opties, _bron_opties(staart))
+
+
+# ============================================================
+# COACHINGS (events) + CHAUFFEURS (dimensie per dienstnummer)
+# ============================================================
+def beoordeling_emoji(rate) -> str:
+    r = str(rate or "").strip().lower() if not pd.isna(rate) else ""
+    return BEOORDELING_EMOJI.get(r, "")
+
+
+def _tekst_kolom(df: pd.DataFrame, col: str | None) -> pd.Series:
+    """Gestripte tekst; leeg/"nan"/"none" → <NA>."""
+    if col is None:
+        return pd.Series(pd.NA, index=df.index, dtype="string")
+    s = df[col].astype("string").str.strip()
+    return s.mask(s.str.lower().isin({"", "nan", "none"}).fillna(False))
+
+
+def _coaching_datum_kolom(df: pd.DataFrame) -> str | None:
+    col = find_col(df, COACH_DATUM_NAMEN)
+    if col is None:
+        # fallback: kolom die zowel 'datum' als 'coach' bevat
+        col = next((c for c in df.columns if "datum" in norm(c) and "coach" in norm(c)), None)
+    return col
+
+
+def _coaching_rijen(df: pd.DataFrame, status: str, blad: str) -> pd.DataFrame:
+    """Eén rij per coachingregel met een P-nr (zie COACHING_KOLOMMEN)."""
+    if df.shape[1] == 0 or PNR_KOLOM not in df.columns:
+        return pd.DataFrame(columns=COACHING_KOLOMMEN)
+    df = df[df[PNR_KOLOM].notna()]
+    kol_datum = _coaching_datum_kolom(df)
+    vn = _tekst_kolom(df, find_col(df, COACH_VOORNAAM_NAMEN))
+    an = _tekst_kolom(df, find_col(df, COACH_ACHTERNAAM_NAMEN))
+    naam = (vn.fillna("") + " " + an.fillna("")).str.strip()
+    naam = naam.mask(naam.eq("")).fillna(_tekst_kolom(df, find_col(df, COACH_VOLLEDIG_NAMEN)))
+    beoordeling = pd.Series(pd.NA, index=df.index, dtype="string")
+    if status == "Voltooid":
+        b = _tekst_kolom(df, find_col(df, COACH_BEOORDELING_NAMEN)).str.lower()
+        beoordeling = b.map(lambda x: BEOORDELING_NORM.get(x, x), na_action="ignore").astype("string")
+    return pd.DataFrame({
+        "pnr": df[PNR_KOLOM],
+        "datum": to_datetime_utc_series(df[kol_datum]) if kol_datum else pd.Series(pd.NaT, index=df.index),
+        "beoordeling": beoordeling,
+        "status": status,
+        "blad": blad,
+        "naam": naam,
+        "teamcoach": _tekst_kolom(df, find_col(df, COACH_TEAMCOACH_NAMEN)),
+    })
+
+
+def bouw_coachings(coaching_voltooid: pd.DataFrame, coaching_lopend: pd.DataFrame) -> pd.DataFrame:
+    """
+    Genormaliseerde coaching-events: één rij per regel van de coachingslijst
+    (eerst Voltooide coachings, dan Coaching), met pnr, datum (UTC, NaT als
+    leeg/ongeldig), beoordeling (genormaliseerd, enkel bij Voltooid), status
+    ("Voltooid"/"Coaching"), blad, naam en teamcoach.
+    """
+    ev = pd.concat(
+        [_coaching_rijen(coaching_voltooid, "Voltooid", SHEET_COACH_DONE),
+         _coaching_rijen(coaching_lopend, "Coaching", SHEET_COACH_PENDING)],
+        ignore_index=True,
+    )
+    ev["pnr"] = ev["pnr"].astype("string")
+    ev["datum"] = pd.to_datetime(ev["datum"], utc=True)
+    return ev
+
+
+def bouw_chauffeurs(bron: pd.DataFrame, hastus: pd.DataFrame, contact: pd.DataFrame,
+                    coachings: pd.DataFrame) -> pd.DataFrame:
+    """
+    Chauffeursdimensie, één rij per dienstnummer (index), uit alle bronnen:
+    naam, teamcoach, status ("Coaching"/"Voltooid"/<NA>), lopend, voltooid,
+    beoordeling (laatste), badge (emoji), schades, email, in_hastus.
+
+    Coachingslijst (events, zie bouw_coachings): per P-nr de laatste niet-lege
+    waarde; wie op het blad Coaching staat, is lopend.
+    Naam: coachingslijst → BRON → contact → het nummer zelf.
+    Teamcoach: coachingslijst → BRON.
+    """
+    coach = coachings.groupby("pnr", sort=False)[["naam", "teamcoach", "beoordeling", "status"]].last()
+    per_blad = coachings.groupby(["pnr", "status"]).size().unstack(fill_value=0)
+
+    bron_agg = bron[bron["dienstnummer"].notna()].groupby("dienstnummer", sort=False).agg(
+        naam=("volledige naam_disp", "first"),
+        teamcoach=("teamcoach_disp", "first"),
+        schades=("Datum", "size"),
+    )
+
+    contact_df = pd.DataFrame(columns=["naam", "email"])
+    if PNR_KOLOM in contact.columns and contact.shape[1] >= 3:
+        c = contact[contact[PNR_KOLOM].notna()]
+        contact_df = pd.DataFrame({
+            "naam": _tekst_kolom(c, c.columns[1]).to_numpy(),
+            "email": _tekst_kolom(c, c.columns[2]).to_numpy(),
+        }, index=c[PNR_KOLOM].to_numpy()).groupby(level=0).first()
+    hastus_pnrs = set(hastus[PNR_KOLOM].dropna()) if PNR_KOLOM in hastus.columns else set()
+
+    index = pd.Index(coach.index).union(bron_agg.index).union(contact_df.index).union(pd.Index(sorted(hastus_pnrs)))
+    index = pd.Index(index.astype("string"), name="dienstnummer")
+
+    def uit(df: pd.DataFrame, col: str) -> pd.Series:
+        return df[col].reindex(index) if col in df.columns else pd.Series(pd.NA, index=index)
+
+    dim = pd.DataFrame(index=index)
+    dim["naam"] = (
+        uit(coach, "naam").fillna(uit(bron_agg, "naam")).fillna(uit(contact_df, "naam"))
+        .fillna(pd.Series(index.to_numpy(), index=index)).astype("string")
+    )
+    dim["teamcoach"] = uit(coach, "teamcoach").fillna(uit(bron_agg, "teamcoach")).astype("string")
+    dim["status"] = uit(coach, "status").astype("string")
+    dim["lopend"] = uit(per_blad, "Coaching").fillna(0).gt(0)
+    dim["voltooid"] = uit(per_blad, "Voltooid").fillna(0).gt(0)
+    dim["beoordeling"] = uit(coach, "beoordeling").astype("string")
+    dim["badge"] = (
+        dim["beoordeling"].map(BEOORDELING_EMOJI).fillna("")
+        + dim["lopend"].map({True: LOPEND_EMOJI, False: ""})
+    ).astype("string")
+    dim["schades"] = uit(bron_agg, "schades").fillna(0).astype("int64")
+    dim["email"] = uit(contact_df, "email").astype("string")
+    dim["in_hastus"] = index.isin(hastus_pnrs)
+    return dim
+
+
+# ============================================================
+# DATASET (één per proces)
+# ============================================================
+@dataclass(frozen=True)
+class Dataset:
+    versie: str
+    bron: pd.DataFrame
+    opties: dict
+    hastus: pd.DataFrame
+    contact: pd.DataFrame
+    coaching_voltooid: pd.DataFrame
+    coaching_lopend: pd.DataFrame
+    gesprekken: pd.DataFrame
+    coachings: pd.DataFrame = field(default_factory=pd.DataFrame)   # zie bouw_coachings
+    chauffeurs: pd.DataFrame = field(default_factory=pd.DataFrame)  # zie bouw_chauffeurs
+    bron_rijen: int = 0                 # ruwe BRON-rijen (incl. rijen zonder datum)
+    bron_checksum: str | None = None    # checksum over die ruwe rijen (zie schade_bron)
+    fouten: dict = field(default_factory=dict)  # bestandsnaam → melding (optionele bronnen)
+
+
+_dataset: Dataset | None = None
+_dataset_lock = threading.Lock()
+
+
+def _vingers() -> dict:
+    out = {}
+    for p in (FILE_SCHADE, FILE_COACHING, FILE_GESPREKKEN):
+        out[p.name] = vingerafdruk(p) if p.exists() else None
+    return out
+
+
+def _versie(vingers: dict) -> str:
+    return hashlib.sha256(json.dumps(vingers, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _bouw_bron(raw: pd.DataFrame, info: dict, vorige: Dataset | None) -> tuple[pd.DataFrame, dict]:
+    """
+    BRON voorbereiden, zo veel mogelijk hergebruikend van de vorige dataset:
+    - BRON ongewijzigd (enkel een ander bestand veranderd) → vorige BRON;
+    - enkel rijen onderaan bijgekomen → enkel die staart voorbereiden;
+    - anders volledig.
+    """
+    if vorige is not None and vorige.bron_checksum:
+        if info.get("checksum") == vorige.bron_checksum and info.get("rijen") == vorige.bron_rijen:
+            return vorige.bron, vorige.opties
+        if info.get("aangevuld_vanaf") == vorige.bron_rijen:
+            aangevuld = vul_bron_aan(vorige.bron, vorige.opties, raw.iloc[vorige.bron_rijen:])
+            if aangevuld is not None:
+                return aangevuld
+    return bereid_bron_voor(raw)
+
+
+def _bouw_dataset(versie: str, vorige: Dataset | None = None) -> Dataset:
+    # één doorgang door het macro-werkboek voor alle bladen, enkel de nodige kolommen
+    oud = {SHEET_BRON: {"rijen": vorige.bron_rijen, "checksum": vorige.bron_checksum}} if vorige else None
+    macro, info = lees_bladen_met_info(FILE_SCHADE, MACRO_KOLOMMEN, vorige=oud)
+    if SHEET_BRON not in macro:
+        raise ValueError(f"Tabblad '{SHEET_BRON}' niet gevonden in {FILE_SCHADE.name}")
+    bron_info = info[SHEET_BRON]
+    bron, opties = _bouw_bron(macro[SHEET_BRON], bron_info, vorige)
+
+    fouten: dict = {}
+    leeg = pd.DataFrame()
+
+    coaching: dict = {}
+    try:
+        coaching = lees_bladen(FILE_COACHING, (SHEET_COACH_DONE, SHEET_COACH_PENDING))
+    except Exception as e:
+        fouten[FILE_COACHING.name] = str(e)
+
+    gesprekken = leeg
+    try:
+        gesprekken = lees_bladen(FILE_GESPREKKEN, (0,)).get(0, leeg)
+    except Exception as e:
+        fouten[FILE_GESPREKKEN.name] = str(e)
+
+    def tabel(df: pd.DataFrame, namen: list, positie: int | None = None) -> pd.DataFrame:
+        # leeg (blad/bestand ontbreekt) blijft leeg, anders + P-nr-sleutel
+        df = _strip_kolomnamen(df)
+        return _met_pnr_sleutel(df, namen, positie) if df.shape[1] else df
+
+    hastus = tabel(macro.get(SHEET_HASTUS, leeg), HASTUS_KOLOMMEN)
+    contact = tabel(macro.get(SHEET_CONTACT, leeg), [], positie=0)  # kolom A
+    coaching_voltooid = tabel(coaching.get(SHEET_COACH_DONE, leeg), COACHING_PNR_NAMEN)
+    coaching_lopend = tabel(coaching.get(SHEET_COACH_PENDING, leeg), COACHING_PNR_NAMEN, positie=3)  # anders kolom D
+    coachings = bouw_coachings(coaching_voltooid, coaching_lopend)
+    gesprekken = tabel(gesprekken, GESPREK_PNR_NAMEN)
+    if COMPACT:
+        gesprekken = compacteer(gesprekken, tekst=GESPREK_TEKST_KOLOMMEN)
+
+    return Dataset(
+        versie=versie,
+        bron=bron,
+        opties=opties,
+        hastus=hastus,
+        contact=contact,
+        coaching_voltooid=coaching_voltooid,
+        coaching_lopend=coaching_lopend,
+        gesprekken=gesprekken,
+        coachings=coachings,
+        chauffeurs=bouw_chauffeurs(bron, hastus, contact, coachings),
+        bron_rijen=int(bron_info.get("rijen") or 0),
+        bron_checksum=bron_info.get("checksum"),
+        fouten=fouten,
+    )
+
+
+def laad_dataset() -> Dataset:
+    """
+    De gedeelde dataset van dit proces.
+    Goedkoop om bij elke rerun aan te roepen: enkel een stat() per bronbestand;
+    bij een gewijzigd bestand wordt de bundel één keer (onder lock) herbouwd.
+    Zijn er in BRON enkel rijen onderaan bijgekomen, dan wordt alleen die
+    staart voorbereid en achter de vorige BRON geplakt.
+    """
+    global _dataset
+    if not FILE_SCHADE.exists():
+        raise FileNotFoundError(f"Bestand niet gevonden: {FILE_SCHADE.name}")
+    versie = _versie(_vingers())
+    ds = _dataset
+    if ds is not None and ds.versie == versie:
+        return ds
+    with _dataset_lock:
+        ds = _dataset
+        if ds is None or ds.versie != versie:
+            ds = _bouw_dataset(versie, ds)
+            _dataset = ds
+    return ds
+
+
+def geheugen_rapport(ds: Dataset) -> pd.DataFrame:
+    """Geheugengebruik per tabel van de dataset: rijen, kolommen en bytes (deep)."""
+    tabellen = [(f.name, getattr(ds, f.name)) for f in fields(ds) if isinstance(getattr(ds, f.name), pd.DataFrame)]
+    return pd.DataFrame({
+        "tabel": [naam for naam, _ in tabellen],
+        "rijen": [len(df) for _, df in tabellen],
+        "kolommen": [df.shape[1] for _, df in tabellen],
+        "bytes": [int(df.memory_usage(deep=True).sum()) for _, df in tabellen],
+    })
@@ -0,0 +1,192 @@
+# schade_export.py
+# ============================================================
+# Exports van (gefilterde) tabellen (geen Streamlit nodig).
+#
+# Formaten: CSV, Parquet (zstd-gecomprimeerd) en XLSX (meerdere
+# tabbladen, openpyxl write-only: rijen gaan meteen naar schijf).
+# Een tabel is een DataFrame of (DataFrame, rijposities): de rijen worden
+# per blok van CHUNK_RIJEN uit het frame genomen en weggeschreven, zonder
+# eerst de hele selectie of het hele bestand als string op te bouwen.
+#
+# In de apps gebeurt dit pas bij een klik (download_button met een
+# callable, zie schade_tabel.exportknoppen) en naar een tijdelijk bestand
+# op schijf (als_bestand), niet naar een buffer in het geheugen.
+# st.download_button leest het afgewerkte bestand daarna wel één keer
+# volledig in (bytes in zijn media-opslag): in het geheugen staat zo
+# één kopie van het bestand, niet ook nog de buffer waarin het gebouwd
+# werd. De batch-rapporten schrijven rechtstreeks naar een bestand.
+# ============================================================
+
+from __future__ import annotations
+
+import datetime as dt
+import io
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+import numpy as np
+import pandas as pd
+
+CHUNK_RIJEN = int(os.getenv("SCHADE_EXPORT_CHUNK", "20000"))
+
+# formaat → (naam, mime, extensie)
+EXPORT_FORMATEN = {
+    "csv": ("CSV", "text/csv", ".csv"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet", ".parquet"),
+    "xlsx": ("Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+}
+
+Tabel = pd.DataFrame | tuple[pd.DataFrame, np.ndarray | None]
+
+_EXCEL_TYPES = (str, int, float, bool, dt.datetime, dt.date, dt.time)
+
+
+def zonder_interne_kolommen(tabel: Tabel) -> Tabel:
+    """`tabel` zonder de interne _-kolommen (indexen, zoekstrings); onder CoW geen kopie."""
+    df, posities = tabel if isinstance(tabel, tuple) else (tabel, None)
+    kolommen = [c for c in df.columns if not str(c).startswith("_")]
+    if len(kolommen) == df.shape[1]:
+        return tabel
+    return df[kolommen] if posities is None else (df[kolommen], posities)
+
+
+def delen(tabel: Tabel, chunk: int = CHUNK_RIJEN) -> Iterator[pd.DataFrame]:
+    """De rijen van `tabel` per blok van hoogstens `chunk` rijen (minstens één blok)."""
+    df, posities = tabel if isinstance(tabel, tuple) else (tabel, None)
+    n = len(df) if posities is None else len(posities)
+    if n == 0:
+        yield df.iloc[:0]
+        return
+    for start in range(0, n, chunk):
+        if posities is None:
+            yield df.iloc[start:start + chunk]
+        else:
+            yield df.iloc[posities[start:start + chunk]]
+
+
+# ============================================================
+# CSV
+# ============================================================
+def schrijf_csv(tabel: Tabel, doel: BinaryIO, chunk: int = CHUNK_RIJEN) -> None:
+    tekst = io.TextIOWrapper(doel, encoding="utf-8", newline="", write_through=True)
+    try:
+        for i, deel in enumerate(delen(tabel, chunk)):
+            deel.to_csv(tekst, header=i == 0, index=False)
+    finally:
+        tekst.detach()   # `doel` blijft open voor de aanroeper
+
+
+# ============================================================
+# PARQUET
+# ============================================================
+def _arrow_deel(deel: pd.DataFrame):
+    import pyarrow as pa
+
+    # object-kolommen (gemengde Excel-waarden) als tekst: één vast type over alle blokken
+    tekst = {c: "string" for c, t in deel.dtypes.items() if t == object}
+    return pa.Table.from_pandas(deel.astype(tekst) if tekst else deel, preserve_index=False)
+
+
+def schrijf_parquet(tabel: Tabel, doel: BinaryIO, chunk: int = CHUNK_RIJEN) -> None:
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for deel in delen(tabel, chunk):
+            t = _arrow_deel(deel)
+            if writer is None:
+                writer = pq.ParquetWriter(doel, t.schema, compression="zstd")
+            writer.write_table(t.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+# ============================================================
+# XLSX
+# ============================================================
+def _bladnaam(naam: str, gebruikt: set[str]) -> str:
+    basis = re.sub(r"[\[\]:*?/\\]", "_", str(naam)).strip() or "Blad"
+    kandidaat, i = basis[:31], 2
+    while kandidaat.lower() in gebruikt:
+        suffix = f" ({i})"
+        kandidaat, i = basis[:31 - len(suffix)] + suffix, i + 1
+    gebruikt.add(kandidaat.lower())
+    return kandidaat
+
+
+def _excel_kolom(s: pd.Series) -> list:
+    """Waarden die openpyxl kan schrijven: None voor leeg, tekst voor de rest (Period, ...)."""
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    if isinstance(s.dtype, pd.DatetimeTZDtype):
+        s = s.dt.tz_localize(None)
+    waarden = s.astype(object).where(s.notna(), None).tolist()
+    if pd.api.types.is_numeric_dtype(s.dtype) or pd.api.types.is_datetime64_dtype(s.dtype):
+        return waarden
+    return [
+        ILLEGAL_CHARACTERS_RE.sub("", v) if isinstance(v, str)
+        else v if v is None or isinstance(v, _EXCEL_TYPES)
+        else str(v)
+        for v in waarden
+    ]
+
+
+def schrijf_xlsx(tabellen: dict[str, Tabel], doel: BinaryIO | str | Path, chunk: int = CHUNK_RIJEN) -> None:
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    gebruikt: set[str] = set()
+    for naam, tabel in tabellen.items():
+        ws = wb.create_sheet(_bladnaam(naam, gebruikt))
+        for i, deel in enumerate(delen(tabel, chunk)):
+            if i == 0:
+                ws.append([str(c) for c in deel.columns])
+            for rij in zip(*(_excel_kolom(deel[c]) for c in deel.columns)):
+                ws.append(rij)
+    if not gebruikt:
+        wb.create_sheet("Blad")
+    wb.save(doel)
+
+
+# ============================================================
+# ALGEMEEN
+# ============================================================
+def schrijf_export(tabellen: dict[str, Tabel], formaat: str, doel: BinaryIO | str | Path,
+                   chunk: int = CHUNK_RIJEN) -> None:
+    """
+    Schrijf `tabellen` (tabbladnaam → tabel) als `formaat` naar `doel`
+    (pad of binair bestand). CSV en Parquet bevatten één tabel.
+    """
+    if formaat not in EXPORT_FORMATEN:
+        raise ValueError(f"Onbekend exportformaat: {formaat!r}")
+    if formaat == "xlsx":
+        schrijf_xlsx(tabellen, doel, chunk)
+        return
+    if len(tabellen) != 1:
+        raise ValueError(f"{EXPORT_FORMATEN[formaat][0]} bevat precies één tabel, niet {len(tabellen)}.")
+    (tabel,) = tabellen.values()
+    schrijf = schrijf_csv if formaat == "csv" else schrijf_parquet
+    if isinstance(doel, (str, Path)):
+        with open(doel, "wb") as f:
+            schrijf(tabel, f, chunk)
+    else:
+        schrijf(tabel, doel, chunk)
+
+
+def als_bestand(tabellen: dict[str, Tabel], formaat: str) -> io.BufferedReader:
+    """
+    De export in een naamloos tijdelijk bestand op schijf, geopend om te
+    lezen vanaf het begin (voor st.download_button, dat het één keer
+    volledig inleest). Het bestand verdwijnt zodra het gesloten wordt.
+    """
+    with tempfile.TemporaryFile() as tmp:
+        schrijf_export(tabellen, formaat, tmp)
+        tmp.flush()
+        # st.download_button aanvaardt een BufferedReader, geen BufferedRandom
+        lezer = open(os.dup(tmp.fileno()), "rb")
+    lezer.seek(0)
+    return lezer
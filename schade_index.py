@@ -0,0 +1,409 @@
+# schade_index.py
+# ============================================================
+# Zoekindexen op de gedeelde dataset (geen Streamlit nodig).
+#
+# Eén keer opgebouwd per dataset-versie (in de apps via
+# st.cache_resource(versie, _ds)) en daarna enkel gelezen.
+# Resultaten zijn altijd rijposities (np.ndarray, oplopend) in het
+# frame waarop de index gebouwd is; df.iloc[posities] geeft de rijen.
+# ============================================================
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from schade_data import find_col
+
+LEEG = np.empty(0, dtype=np.int64)
+
+
+# ============================================================
+# HELPERS
+# ============================================================
+def _groepen(codes: np.ndarray, aantal: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Rijposities gegroepeerd per code: rijen[start[c]:start[c + 1]] zijn de
+    (oplopende) posities met code c. Codes < 0 (ontbrekend) vallen weg.
+    """
+    volgorde = np.argsort(codes, kind="stable")
+    volgorde = volgorde[codes[volgorde] >= 0]
+    start = np.zeros(aantal + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes[codes >= 0], minlength=aantal), out=start[1:])
+    return volgorde.astype(np.int64), start
+
+
+def _rijen_voor(codes: np.ndarray, rijen: np.ndarray, start: np.ndarray) -> np.ndarray:
+    if len(codes) == 0:
+        return LEEG
+    if len(codes) == 1:
+        c = codes[0]
+        return rijen[start[c]:start[c + 1]]
+    return np.sort(np.concatenate([rijen[start[c]:start[c + 1]] for c in codes]))
+
+
+def binnen(posities: np.ndarray, index: pd.Index) -> np.ndarray:
+    """
+    Posities (in `index`) van de rijposities die ook in de gefilterde,
+    oplopende `index` zitten (bv. df_filtered.index op een RangeIndex-frame).
+    O(treffers · log n) in plaats van een masker over het hele frame.
+    """
+    waarden = np.asarray(index)
+    if len(posities) == 0 or len(waarden) == 0:
+        return LEEG
+    i = np.searchsorted(waarden, posities)
+    i_ok = np.minimum(i, len(waarden) - 1)
+    return i_ok[(i < len(waarden)) & (waarden[i_ok] == posities)]
+
+
+# ============================================================
+# P-NR INDEX
+# ============================================================
+class PnrIndex:
+    """P-nr → rijposities (oplopend), uit een sleutelkolom (zoals _pnr of dienstnummer)."""
+
+    def __init__(self, sleutels: pd.Series):
+        codes, uniek = pd.factorize(pd.Series(sleutels, dtype=object), use_na_sentinel=True)
+        self._code = {str(k): i for i, k in enumerate(uniek)}
+        self._rijen, self._start = _groepen(np.asarray(codes), len(uniek))
+
+    def __len__(self) -> int:
+        return len(self._code)
+
+    def __contains__(self, pnr) -> bool:
+        return str(pnr) in self._code
+
+    def rijen(self, pnr) -> np.ndarray:
+        c = self._code.get(str(pnr))
+        return LEEG if c is None else self._rijen[self._start[c]:self._start[c + 1]]
+
+    def aantal(self, pnr) -> int:
+        c = self._code.get(str(pnr))
+        return 0 if c is None else int(self._start[c + 1] - self._start[c])
+
+
+# ============================================================
+# BITMAP INDEX (filters met meerdere waarden per dimensie)
+# ============================================================
+class BitmapIndex:
+    """
+    Per filterdimensie en per waarde een bitmap over de rijen (np.packbits,
+    1 bit per rij). Een selectie is per dimensie een OR van de bitmaps van
+    de gekozen waarden en over de dimensies een AND; pas op het einde
+    worden dat rijposities. Zijn meer dan de helft van de waarden gekozen
+    (bv. "alles"), dan wordt de OR over de niet-gekozen waarden genomen
+    en omgekeerd, zodat ook grote selecties maar een paar bewerkingen zijn.
+    """
+
+    def __init__(self, dimensies: dict[str, pd.Series]):
+        self.n = len(next(iter(dimensies.values()))) if dimensies else 0
+        self._waarden: dict[str, pd.Index] = {}
+        self._bitmaps: dict[str, np.ndarray] = {}   # dimensie → (waarden, n/8) uint8
+        for naam, s in dimensies.items():
+            codes, uniek = pd.factorize(pd.Series(s).reset_index(drop=True), use_na_sentinel=False)
+            if isinstance(uniek.dtype, pd.CategoricalDtype):
+                uniek = uniek.astype(uniek.categories.dtype)
+            self._waarden[naam] = pd.Index(uniek)
+            rijen, start = _groepen(np.asarray(codes, dtype=np.int64), len(uniek))
+            bits = np.zeros((len(uniek), (self.n + 7) // 8), dtype=np.uint8)
+            code_per_rij = np.repeat(np.arange(len(uniek)), np.diff(start))
+            np.bitwise_or.at(bits, (code_per_rij, rijen >> 3), (128 >> (rijen & 7)).astype(np.uint8))
+            self._bitmaps[naam] = bits
+
+    def _bitmap(self, naam: str, waarden) -> np.ndarray:
+        bits = self._bitmaps[naam]
+        gekozen = np.zeros(len(bits), dtype=bool)
+        codes = self._waarden[naam].get_indexer(pd.Index(list(waarden)))
+        gekozen[codes[codes >= 0]] = True
+        if gekozen.sum() * 2 > len(bits):
+            rest = bits[~gekozen]
+            return ~np.bitwise_or.reduce(rest, axis=0) if len(rest) else np.full(bits.shape[1], 255, np.uint8)
+        keuze = bits[gekozen]
+        return np.bitwise_or.reduce(keuze, axis=0) if len(keuze) else np.zeros(bits.shape[1], np.uint8)
+
+    def masker(self, **filters) -> np.ndarray:
+        """Boolean per rij; per dimensie een lijst gekozen waarden (None = geen filter)."""
+        acc = None
+        for naam, waarden in filters.items():
+            if waarden is None:
+                continue
+            b = self._bitmap(naam, waarden)
+            acc = b if acc is None else acc & b
+        if acc is None:
+            return np.ones(self.n, dtype=bool)
+        return np.unpackbits(acc, count=self.n).astype(bool)
+
+    def rijen(self, **filters) -> np.ndarray:
+        """Rijposities (oplopend) die aan alle filters voldoen."""
+        return np.flatnonzero(self.masker(**filters))
+
+
+# ============================================================
+# N-GRAM INDEX (substring zoeken)
+# ============================================================
+class NgramIndex:
+    """
+    Substring-zoeken zoals `teksten.str.contains(q, regex=False)`, maar via
+    een inverted index.
+
+    Geïndexeerd worden de unieke teksten (namen en voertuigen herhalen zich
+    sterk), met alle n-grammen van 1 tot `n` tekens als postinglijsten.
+    Een zoekterm van hoogstens `n` tekens is één opzoeking; een langere
+    term = doorsnede van de postinglijsten van zijn trigrammen, daarna
+    enkel die kandidaten nog echt controleren.
+    """
+
+    def __init__(self, teksten: pd.Series, n: int = 3):
+        self.n = n
+        codes, uniek = pd.factorize(pd.Series(teksten, dtype=object), use_na_sentinel=True)
+        self.teksten: list[str] = [str(t) for t in uniek]
+        self.lengte = len(codes)
+        self._rijen, self._start = _groepen(np.asarray(codes), len(self.teksten))
+
+        postings: dict[str, list[int]] = defaultdict(list)
+        for i, t in enumerate(self.teksten):
+            grammen = set()
+            for k in range(1, n + 1):
+                grammen.update(t[j:j + k] for j in range(len(t) - k + 1))
+            for g in grammen:
+                postings[g].append(i)
+        self._postings = {g: np.asarray(v, dtype=np.int64) for g, v in postings.items()}
+
+    def waarden(self, q: str) -> np.ndarray:
+        """Codes van de unieke teksten die `q` bevatten."""
+        if not q:
+            return np.arange(len(self.teksten), dtype=np.int64)
+        if len(q) <= self.n:
+            return self._postings.get(q, LEEG)
+        lijsten = []
+        for g in {q[j:j + self.n] for j in range(len(q) - self.n + 1)}:
+            p = self._postings.get(g)
+            if p is None:
+                return LEEG
+            lijsten.append(p)
+        lijsten.sort(key=len)
+        kandidaten = lijsten[0]
+        for p in lijsten[1:]:
+            kandidaten = np.intersect1d(kandidaten, p, assume_unique=True)
+            if len(kandidaten) == 0:
+                return LEEG
+        return np.asarray([c for c in kandidaten if q in self.teksten[c]], dtype=np.int64)
+
+    def zoek(self, q: str) -> np.ndarray:
+        """Rijposities waarvan de tekst `q` bevat (oplopend)."""
+        if not q:
+            return np.arange(self.lengte, dtype=np.int64)
+        return _rijen_voor(self.waarden(q), self._rijen, self._start)
+
+
+def zoek_in(indexen, q: str) -> np.ndarray:
+    """Rijposities die `q` bevatten in minstens één van de indexen (zelfde frame)."""
+    uit = LEEG
+    for idx in indexen:
+        uit = np.union1d(uit, idx.zoek(q))
+    return uit
+
+
+# ============================================================
+# SUGGESTIES (autocomplete)
+# ============================================================
+class SuggestieIndex:
+    """
+    Autocomplete over een verzameling waarden (één per voorkomen).
+
+    De unieke waarden (hoofdletterongevoelig) staan gesorteerd met hun
+    aantal voorkomens: prefix-treffers zijn één bisect-bereik, overige
+    substring-treffers komen uit een NgramIndex. Binnen elk van beide
+    groepen wordt gerangschikt op aantal (meest voorkomend eerst), dan
+    alfabetisch.
+    """
+
+    def __init__(self, waarden: pd.Series):
+        tekst = pd.Series(waarden, dtype=object).dropna().astype(str)
+        sleutel = tekst.str.lower()
+        per_sleutel = pd.DataFrame({"sleutel": sleutel.to_numpy(), "tekst": tekst.to_numpy()}).groupby(
+            "sleutel", sort=True
+        )
+        self._sleutels: list[str] = list(per_sleutel.size().index)
+        self._aantal = per_sleutel.size().to_numpy()
+        self._toon: list[str] = per_sleutel["tekst"].first().tolist()  # eerste schrijfwijze
+        self._ngram = NgramIndex(pd.Series(self._sleutels, dtype=object))
+
+    def __len__(self) -> int:
+        return len(self._sleutels)
+
+    def _top(self, codes: np.ndarray, k: int) -> list[int]:
+        if k <= 0 or len(codes) == 0:
+            return []
+        volgorde = np.lexsort((codes, -self._aantal[codes]))[:k]
+        return codes[volgorde].tolist()
+
+    def suggesties(self, q: str, k: int = 10) -> list[str]:
+        q = (q or "").strip().lower()
+        if not q:
+            return []
+        lo = bisect_left(self._sleutels, q)
+        hi = bisect_left(self._sleutels, q + "\U0010ffff")
+        top = self._top(np.arange(lo, hi, dtype=np.int64), k)
+        if len(top) < k:
+            rest = self._ngram.waarden(q)
+            top += self._top(rest[(rest < lo) | (rest >= hi)], k - len(top))
+        return [self._toon[i] for i in top]
+
+
+def suggestie_indexen(df: pd.DataFrame, kolommen, partitie: str) -> dict:
+    """
+    Eén SuggestieIndex per waarde van `partitie` (bv. _jaar), plus None
+    voor alle rijen samen. De waarden van alle `kolommen` tellen samen.
+    """
+    def bouw(deel: pd.DataFrame) -> SuggestieIndex:
+        return SuggestieIndex(pd.concat([deel[c] for c in kolommen], ignore_index=True) if kolommen else pd.Series())
+
+    out = {None: bouw(df)}
+    for sleutel, deel in df.groupby(partitie, sort=True):
+        out[sleutel] = bouw(deel)
+    return out
+
+
+# ============================================================
+# FUZZY NAMEN (BK-boom op edit-afstand)
+# ============================================================
+def levenshtein(a: str, b: str) -> int:
+    """Edit-afstand (invoegen/verwijderen/vervangen)."""
+    if len(a) < len(b):
+        a, b = b, a
+    vorige = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        huidige = [i]
+        for j, cb in enumerate(b, 1):
+            huidige.append(min(vorige[j] + 1, huidige[j - 1] + 1, vorige[j - 1] + (ca != cb)))
+        vorige = huidige
+    return vorige[-1]
+
+
+class BKBoom:
+    """
+    BK-boom over woorden: alle woorden binnen afstand `tol` van een
+    zoekwoord vinden zonder de afstand tot elk woord te berekenen
+    (driehoeksongelijkheid snoeit de deelbomen).
+    """
+
+    def __init__(self, woorden=()):
+        self._wortel = None  # [woord, {afstand: knoop}]
+        for w in woorden:
+            self.voeg_toe(w)
+
+    def voeg_toe(self, woord: str) -> None:
+        if self._wortel is None:
+            self._wortel = [woord, {}]
+            return
+        knoop = self._wortel
+        while True:
+            d = levenshtein(woord, knoop[0])
+            if d == 0:
+                return
+            kind = knoop[1].get(d)
+            if kind is None:
+                knoop[1][d] = [woord, {}]
+                return
+            knoop = kind
+
+    def zoek(self, woord: str, tol: int) -> list[tuple[int, str]]:
+        """(afstand, woord) voor alle woorden binnen `tol`, dichtste eerst."""
+        if self._wortel is None:
+            return []
+        uit = []
+        stapel = [self._wortel]
+        while stapel:
+            w, kinderen = stapel.pop()
+            d = levenshtein(woord, w)
+            if d <= tol:
+                uit.append((d, w))
+            for afstand, kind in kinderen.items():
+                if d - tol <= afstand <= d + tol:
+                    stapel.append(kind)
+        return sorted(uit)
+
+
+def naam_sleutel(naam) -> str:
+    """Naam vergelijkbaar maken: zonder nummer vooraan, kleine letters, zonder accenten."""
+    t = unicodedata.normalize("NFKD", str(naam))
+    t = "".join(c for c in t if not unicodedata.combining(c))
+    return " ".join(re.sub(r"^\s*\d+\s*[-:–—]?\s*", "", t).lower().split())
+
+
+def _tolerantie(woord: str) -> int:
+    return 1 if len(woord) <= 4 else 2 if len(woord) <= 8 else 3
+
+
+class NaamIndex:
+    """
+    Fuzzy opzoeken van chauffeursnamen (tikfouten, andere schrijfwijze).
+
+    De unieke namen worden opgesplitst in woorden (familienaam, voornaam);
+    de unieke woorden zitten in een BK-boom. Elk woord van de zoekterm
+    zoekt zijn buren binnen een tolerantie die met de woordlengte meegroeit;
+    namen worden gerangschikt op aantal gevonden zoekwoorden en daarna op
+    totale afstand.
+    """
+
+    def __init__(self, namen):
+        self._toon: dict[str, str] = {}  # sleutel → eerste schrijfwijze (zonder nummer)
+        self._spellingen: dict[str, set] = defaultdict(set)  # sleutel → originele waarden
+        for naam in namen:
+            if naam is None or (isinstance(naam, float) and np.isnan(naam)):
+                continue
+            sleutel = naam_sleutel(naam)
+            if sleutel and sleutel not in {"nan", "none", "<na>", "onbekend"}:
+                self._toon.setdefault(sleutel, " ".join(re.sub(r"^\s*\d+\s*[-:–—]?\s*", "", str(naam)).split()))
+                self._spellingen[sleutel].add(naam)
+        self._per_woord: dict[str, list[str]] = defaultdict(list)
+        for sleutel in self._toon:
+            for w in set(sleutel.split()):
+                self._per_woord[w].append(sleutel)
+        self._boom = BKBoom(self._per_woord)
+
+    def __len__(self) -> int:
+        return len(self._toon)
+
+    def spellingen(self, naam: str) -> set:
+        """Alle originele waarden (uit alle bronnen) met dezelfde sleutel als `naam`; voor df[col].isin()."""
+        return self._spellingen.get(naam_sleutel(naam), set())
+
+    def zoek(self, q: str, k: int = 5) -> list[tuple[str, int]]:
+        """De `k` dichtste namen als (naam, totale afstand), beste eerst."""
+        woorden = [w for w in naam_sleutel(q).split() if len(w) >= 2]
+        score: dict[str, list[int]] = {}
+        for w in woorden:
+            beste: dict[str, int] = {}
+            for d, buur in self._boom.zoek(w, _tolerantie(w)):
+                for sleutel in self._per_woord[buur]:
+                    if d < beste.get(sleutel, d + 1):
+                        beste[sleutel] = d
+            for sleutel, d in beste.items():
+                s = score.setdefault(sleutel, [0, 0])
+                s[0] += 1
+                s[1] += d
+        rang = sorted(score.items(), key=lambda kv: (-kv[1][0], kv[1][1], kv[0]))[:k]
+        return [(self._toon[sleutel], s[1]) for sleutel, s in rang]
+
+
+def naam_index(ds) -> NaamIndex:
+    """NaamIndex over alle chauffeursnamen uit BRON, de coachingslijst en de gesprekken."""
+    bronnen = [
+        (ds.bron, ["volledige naam", "chauffeur", "naam", "bestuurder"]),
+        (ds.coaching_voltooid, ["volledige naam"]),
+        (ds.coaching_lopend, ["volledige naam"]),
+        (ds.gesprekken, ["chauffeurnaam", "volledige naam", "naam"]),
+    ]
+    namen: list = []
+    for df, kandidaten in bronnen:
+        col = find_col(df, kandidaten)
+        if col is not None:
+            namen.extend(df[col].dropna().unique().tolist())
+    return NaamIndex(namen)
@@ -0,0 +1,124 @@
+# schade_kubus.py
+# ============================================================
+# Telkubus op BRON (geen Streamlit nodig).
+#
+# Het aantal schadegevallen per combinatie van dimensiewaarden (jaar,
+# kwartaal, maand, teamcoach, locatie, voertuigtype, type, ...), plus de
+# eerste/laatste datum per combinatie. Eén keer opgebouwd per
+# dataset-versie (in de apps via st.cache_resource(versie, _ds)).
+#
+# Samenvattingen zijn een snede (filters op dimensies) + een roll-up
+# (optellen naar minder dimensies) over de cellen van de kubus, in
+# plaats van telkens de ruwe rijen opnieuw te groeperen. Een cel is één
+# voorkomende combinatie: nooit meer cellen dan rijen.
+# ============================================================
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+_MAX_NS = np.iinfo(np.int64).max
+_NAT = np.iinfo(np.int64).min      # NaT als int64
+
+
+def _als_lijst(waarde) -> list:
+    if isinstance(waarde, (list, tuple, set, frozenset, pd.Index, pd.Series, np.ndarray)):
+        return list(waarde)
+    return [waarde]
+
+
+class Kubus:
+    """
+    Kubus(dimensies, datum=None)
+
+    dimensies: naam → labels per rij (Series, allemaal met dezelfde lengte);
+    <NA> is een eigen label. Labels worden gesorteerd (NA achteraan), zodat
+    resultaten dezelfde volgorde hebben als groupby(..., dropna=False).
+    datum: optioneel, voor eerste/laatste per cel.
+    """
+
+    def __init__(self, dimensies: dict[str, pd.Series], datum: pd.Series | None = None):
+        self.dimensies = tuple(dimensies)
+        self.waarden: dict[str, pd.Index] = {}
+        codes = []
+        for naam, s in dimensies.items():
+            c, u = pd.factorize(pd.Series(s).reset_index(drop=True), sort=True, use_na_sentinel=False)
+            if isinstance(u.dtype, pd.CategoricalDtype):
+                u = u.astype(u.categories.dtype)   # labels, geen categorical (fillna e.d. blijven werken)
+            self.waarden[naam] = pd.Index(u, name=naam)
+            codes.append(c.astype(np.int64))
+
+        n = len(codes[0]) if codes else 0
+        stapel = np.column_stack(codes) if codes else np.empty((n, 0), dtype=np.int64)
+        cellen, inverse = np.unique(stapel, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        self._codes = {naam: cellen[:, i] for i, naam in enumerate(self.dimensies)}
+        self.aantal = np.bincount(inverse, minlength=len(cellen)).astype(np.int64)
+
+        self._eerste = self._laatste = None
+        if datum is not None:
+            ns = pd.Series(datum).reset_index(drop=True).to_numpy(dtype="datetime64[ns]").view(np.int64)
+            geldig = ns != _NAT
+            self._eerste = np.full(len(cellen), _MAX_NS, dtype=np.int64)
+            self._laatste = np.full(len(cellen), _NAT, dtype=np.int64)
+            np.minimum.at(self._eerste, inverse[geldig], ns[geldig])
+            np.maximum.at(self._laatste, inverse[geldig], ns[geldig])
+
+    def __len__(self) -> int:
+        return len(self.aantal)
+
+    # ---------- snede ----------
+    def snede(self, **filters) -> np.ndarray:
+        """
+        Boolean-masker op de cellen. Per dimensie één label of een lijst labels
+        (isin); None = geen filter. Onbekende labels matchen niets.
+        """
+        masker = np.ones(len(self.aantal), dtype=bool)
+        for naam, waarde in filters.items():
+            if waarde is None:
+                continue
+            gekozen = self.waarden[naam].get_indexer(pd.Index(_als_lijst(waarde)))
+            masker &= np.isin(self._codes[naam], gekozen[gekozen >= 0])
+        return masker
+
+    def totaal(self, **filters) -> int:
+        return int(self.aantal[self.snede(**filters)].sum())
+
+    # ---------- roll-up ----------
+    def _groepeer(self, per: tuple[str, ...], masker: np.ndarray) -> tuple[pd.Index, np.ndarray]:
+        """(labels, groep per geselecteerde cel) voor de dimensies in `per`."""
+        if len(per) == 1:
+            naam = per[0]
+            codes = self._codes[naam][masker]
+            aanwezig = np.unique(codes)
+            return self.waarden[naam][aanwezig], np.searchsorted(aanwezig, codes)
+        stapel = np.column_stack([self._codes[naam][masker] for naam in per])
+        combi, groep = np.unique(stapel, axis=0, return_inverse=True)
+        index = pd.MultiIndex.from_arrays(
+            [self.waarden[naam][combi[:, i]] for i, naam in enumerate(per)], names=list(per)
+        )
+        return index, groep.reshape(-1)
+
+    def tel(self, per: str | tuple[str, ...], **filters) -> pd.Series:
+        """Aantal per label (of labelcombinatie) van `per` binnen de snede; enkel niet-nul."""
+        return self.samenvatting(per, **filters)["aantal"]
+
+    def samenvatting(self, per: str | tuple[str, ...], **filters) -> pd.DataFrame:
+        """aantal, eerste en laatste datum per label (of combinatie) van `per` binnen de snede."""
+        per = (per,) if isinstance(per, str) else tuple(per)
+        masker = self.snede(**filters)
+        index, groep = self._groepeer(per, masker)
+        out = pd.DataFrame(
+            {"aantal": np.bincount(groep, weights=self.aantal[masker], minlength=len(index)).astype(np.int64)},
+            index=index,
+        )
+        if self._eerste is not None:
+            eerste = np.full(len(index), _MAX_NS, dtype=np.int64)
+            laatste = np.full(len(index), _NAT, dtype=np.int64)
+            np.minimum.at(eerste, groep, self._eerste[masker])
+            np.maximum.at(laatste, groep, self._laatste[masker])
+            eerste[eerste == _MAX_NS] = _NAT
+            out["eerste"] = eerste.view("datetime64[ns]")
+            out["laatste"] = laatste.view("datetime64[ns]")
+        return out
@@ -0,0 +1,335 @@
+# schade_mail.py
+# ============================================================
+# E-mail via SMTP met een pool van sessies en een wachtrij (geen Streamlit nodig).
+#
+# Een SMTP-sessie opzetten (TCP + TLS-handshake + login) kost meer dan
+# het bericht zelf. SmtpPool houdt daarom tot `grootte` ingelogde
+# sessies open en geeft ze opnieuw uit; een sessie die te lang stil lag,
+# wordt eerst met NOOP gecontroleerd. Mailer zet berichten in een
+# wachtrij; verzendthreads nemen telkens tot BATCH berichten samen en
+# sturen ze over één sessie. Tijdelijke fouten (verbinding weg, 4xx)
+# worden met exponentiële backoff opnieuw geprobeerd; definitieve fouten
+# (adres geweigerd, 5xx) komen meteen terug via de Future van het bericht.
+#
+# Lokaal testen: SMTP_HOST=localhost SMTP_PORT=1025 SMTP_STARTTLS=false
+# tegen eender welke SMTP-stand-in (zie ook `python benchmark.py mail`).
+# ============================================================
+
+from __future__ import annotations
+
+import os
+import queue
+import random
+import smtplib
+import ssl
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from typing import Iterator
+
+
+def _vlag(naam: str, standaard: str) -> bool:
+    return os.getenv(naam, standaard).strip().lower() in {"1", "true", "yes"}
+
+
+POOL_GROOTTE = int(os.getenv("SMTP_POOL", "2"))
+POOL_STIL = float(os.getenv("SMTP_POOL_STIL", "30"))     # s stil → eerst NOOP
+BATCH = int(os.getenv("SMTP_BATCH", "20"))
+POGINGEN = int(os.getenv("SMTP_POGINGEN", "4"))
+BACKOFF = float(os.getenv("SMTP_BACKOFF", "1"))          # s, verdubbelt per poging
+
+
+@dataclass(frozen=True)
+class SmtpConfig:
+    host: str
+    port: int = 587
+    user: str = ""
+    password: str = field(default="", repr=False)
+    afzender: str = ""
+    ssl: bool = False                  # meteen TLS (poort 465)
+    starttls: bool = True              # anders: STARTTLS na EHLO (uit voor een lokale stand-in)
+    timeout: float = 30.0
+
+    @classmethod
+    def uit_env(cls) -> "SmtpConfig":
+        port = int(os.getenv("SMTP_PORT", "587"))
+        user = os.getenv("SMTP_USER", "").strip()
+        return cls(
+            host=os.getenv("SMTP_HOST", "").strip(),
+            port=port,
+            user=user,
+            password=os.getenv("SMTP_PASS", "").strip(),
+            afzender=os.getenv("EMAIL_FROM", user or "").strip(),
+            ssl=_vlag("SMTP_SSL", "") or port == 465,
+            starttls=_vlag("SMTP_STARTTLS", "true"),
+            timeout=float(os.getenv("SMTP_TIMEOUT", "30")),
+        )
+
+    @property
+    def volledig(self) -> bool:
+        return bool(self.host and self.port and self.afzender)
+
+
+def bericht(cfg: SmtpConfig, aan: str, onderwerp: str, tekst: str, html: str | None = None) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = cfg.afzender
+    msg["To"] = aan
+    msg["Subject"] = onderwerp
+    msg.set_content(tekst)
+    if html:
+        msg.add_alternative(html, subtype="html")
+    return msg
+
+
+def is_tijdelijk(fout: BaseException) -> bool:
+    """Opnieuw proberen zinvol? Verbindingsfouten en 4xx-antwoorden wel, 5xx en geweigerde adressen niet."""
+    if isinstance(fout, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in fout.recipients.values())
+    if isinstance(fout, smtplib.SMTPResponseException):
+        return 400 <= fout.smtp_code < 500
+    return isinstance(fout, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError))
+
+
+# ============================================================
+# POOL
+# ============================================================
+class SmtpPool:
+    """Tot `grootte` open, ingelogde SMTP-sessies; thread-safe."""
+
+    def __init__(self, cfg: SmtpConfig, grootte: int = POOL_GROOTTE, stil: float = POOL_STIL):
+        self.cfg = cfg
+        self.grootte = max(1, int(grootte))
+        self.stil = stil
+        self._vrij: list[tuple[smtplib.SMTP, float]] = []   # (sessie, laatst gebruikt)
+        self._lock = threading.Lock()
+        self._plaatsen = threading.BoundedSemaphore(self.grootte)
+        self._tellers = dict.fromkeys(("geopend", "hergebruikt", "gesloten"), 0)
+
+    def _open(self) -> smtplib.SMTP:
+        cfg = self.cfg
+        ctx = ssl.create_default_context()
+        if cfg.ssl:
+            s = smtplib.SMTP_SSL(cfg.host, cfg.port, timeout=cfg.timeout, context=ctx)
+        else:
+            s = smtplib.SMTP(cfg.host, cfg.port, timeout=cfg.timeout)
+        try:
+            if not cfg.ssl and cfg.starttls:
+                s.starttls(context=ctx)
+            if cfg.user and cfg.password:
+                s.login(cfg.user, cfg.password)
+        except BaseException:
+            self._sluit(s)
+            raise
+        with self._lock:
+            self._tellers["geopend"] += 1
+        return s
+
+    def _sluit(self, s: smtplib.SMTP) -> None:
+        try:
+            s.quit()
+        except Exception:
+            s.close()
+        with self._lock:
+            self._tellers["gesloten"] += 1
+
+    @staticmethod
+    def _leeft(s: smtplib.SMTP) -> bool:
+        try:
+            return s.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _neem(self) -> smtplib.SMTP:
+        """Een vrije sessie (na een NOOP als ze lang stillag) of anders een nieuwe."""
+        while True:
+            with self._lock:
+                if not self._vrij:
+                    break
+                s, sinds = self._vrij.pop()      # de laatst gebruikte eerst
+            if time.monotonic() - sinds < self.stil or self._leeft(s):
+                with self._lock:
+                    self._tellers["hergebruikt"] += 1
+                return s
+            self._sluit(s)
+        return self._open()
+
+    @contextmanager
+    def sessie(self, nieuw: bool = False) -> Iterator[smtplib.SMTP]:
+        """
+        Een sessie voor de duur van het with-blok (nieuw=True: niet uit de
+        pool maar vers geopend). Loopt er een fout uit het blok, dan wordt
+        de sessie gesloten in plaats van teruggegeven.
+        """
+        self._plaatsen.acquire()
+        try:
+            s = self._open() if nieuw else self._neem()
+            try:
+                yield s
+            except BaseException:
+                self._sluit(s)
+                raise
+            with self._lock:
+                self._vrij.append((s, time.monotonic()))
+        finally:
+            self._plaatsen.release()
+
+    def sluit(self) -> None:
+        """Alle vrije sessies sluiten (QUIT)."""
+        with self._lock:
+            vrij, self._vrij = self._vrij, []
+        for s, _ in vrij:
+            self._sluit(s)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            t = dict(self._tellers)
+            t["vrij"] = len(self._vrij)
+        return t
+
+
+# ============================================================
+# WACHTRIJ
+# ============================================================
+@dataclass
+class _Opdracht:
+    msg: EmailMessage
+    future: Future
+    poging: int = 0
+
+
+class Mailer:
+    """
+    Mailer(cfg) — wachtrij + verzendthreads (één per poolplaats).
+    verstuur() en verstuur_batch() geven meteen een Future per bericht
+    terug: result() is None na aflevering bij de SMTP-server, of geeft de
+    fout na de laatste poging.
+    """
+
+    def __init__(self, cfg: SmtpConfig, pool: SmtpPool | None = None, *, batch: int = BATCH,
+                 pogingen: int = POGINGEN, backoff: float = BACKOFF):
+        self.cfg = cfg
+        self.pool = pool or SmtpPool(cfg)
+        self.batch = max(1, int(batch))
+        self.pogingen = max(1, int(pogingen))
+        self.backoff = backoff
+        self._rij: queue.Queue[_Opdracht | None] = queue.Queue()
+        self._gestopt = threading.Event()
+        self._lock = threading.Lock()
+        self._tellers = dict.fromkeys(("verzonden", "mislukt", "opnieuw", "batches"), 0)
+        self._threads = [
+            threading.Thread(target=self._werk, name=f"schade-mail-{i}", daemon=True)
+            for i in range(self.pool.grootte)
+        ]
+        for t in self._threads:
+            t.start()
+
+    # ---------- aanbieden ----------
+    def zet_in_rij(self, msg: EmailMessage) -> Future:
+        f: Future = Future()
+        self._rij.put(_Opdracht(msg, f))
+        return f
+
+    def verstuur(self, aan: str, onderwerp: str, tekst: str, html: str | None = None) -> Future:
+        if not self.cfg.volledig:
+            raise RuntimeError("SMTP-configuratie ontbreekt in mail.env")
+        return self.zet_in_rij(bericht(self.cfg, aan, onderwerp, tekst, html))
+
+    def verstuur_batch(self, berichten: list[EmailMessage]) -> list[Future]:
+        """Veel berichten tegelijk (bv. meldingen): ze delen sessies, BATCH per keer."""
+        if not self.cfg.volledig:
+            raise RuntimeError("SMTP-configuratie ontbreekt in mail.env")
+        return [self.zet_in_rij(m) for m in berichten]
+
+    # ---------- verzenden ----------
+    def _tel(self, naam: str) -> None:
+        with self._lock:
+            self._tellers[naam] += 1
+
+    def _werk(self) -> None:
+        while True:
+            eerste = self._rij.get()
+            if eerste is None:
+                return
+            batch = [eerste]
+            while len(batch) < self.batch:
+                try:
+                    o = self._rij.get_nowait()
+                except queue.Empty:
+                    break
+                if o is None:
+                    self._rij.put(None)     # stopsignaal voor na deze batch
+                    break
+                batch.append(o)
+            # een geannuleerde Future (nog in de rij) wordt overgeslagen
+            te_doen = [o for o in batch if o.poging or o.future.set_running_or_notify_cancel()]
+            if te_doen:
+                self._verstuur(te_doen)
+
+    def _verstuur(self, te_doen: list[_Opdracht], nieuw: bool = False) -> None:
+        klaar = 0
+        self._tel("batches")
+        try:
+            with self.pool.sessie(nieuw) as s:
+                for o in te_doen:
+                    try:
+                        s.send_message(o.msg)
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                        # fout voor dit bericht; de sessie zelf is nog bruikbaar (smtplib deed RSET)
+                        self._mislukt(o, e)
+                    else:
+                        o.future.set_result(None)
+                        self._tel("verzonden")
+                    klaar += 1
+        except smtplib.SMTPServerDisconnected as e:
+            # de server sloot de sessie (te lang stil, limiet per sessie): de rest één keer
+            # meteen over een verse sessie, pas daarna telt het als mislukte poging
+            if not nieuw:
+                self._verstuur(te_doen[klaar:], nieuw=True)
+                return
+            for o in te_doen[klaar:]:
+                self._mislukt(o, e)
+        except Exception as e:
+            # verbinding/login mislukt: de rest van de batch later opnieuw
+            for o in te_doen[klaar:]:
+                self._mislukt(o, e)
+
+    def _mislukt(self, o: _Opdracht, fout: BaseException) -> None:
+        o.poging += 1
+        if o.poging < self.pogingen and is_tijdelijk(fout):
+            wacht = self.backoff * 2 ** (o.poging - 1) * random.uniform(0.8, 1.2)
+            t = threading.Timer(wacht, self._opnieuw, (o, fout))
+            t.daemon = True
+            t.start()
+            self._tel("opnieuw")
+        else:
+            o.future.set_exception(fout)
+            self._tel("mislukt")
+
+    def _opnieuw(self, o: _Opdracht, fout: BaseException) -> None:
+        if self._gestopt.is_set():
+            o.future.set_exception(fout)     # na stop() geen nieuwe pogingen meer
+            self._tel("mislukt")
+        else:
+            self._rij.put(o)
+
+    # ---------- beheer ----------
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Eerst de rij leegsturen, dan de threads stoppen en de sessies sluiten.
+        Nog geplande nieuwe pogingen mislukken met hun laatste fout.
+        """
+        self._gestopt.set()
+        for _ in self._threads:
+            self._rij.put(None)
+        for t in self._threads:
+            t.join(timeout)
+        self.pool.sluit()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            t = dict(self._tellers)
+        t["in_rij"] = self._rij.qsize()
+        return {**t, **self.pool.stats()}
@@ -0,0 +1,149 @@
+# schade_opwarmen.py
+# ============================================================
+# Caches opwarmen op de achtergrond (geen Streamlit nodig).
+#
+# Eén daemon-thread per proces bouwt de gedeelde dataset (laad_dataset)
+# en roept daarna de geregistreerde opwarmers aan: functies f(ds, vorige)
+# die de per-versie caches van een app vullen (indexen, kubus, model, ...)
+# en daarna de entries van `vorige` (de vorige opgewarmde versie, None de
+# eerste keer) wissen: een nieuwe versie vervangt zo de vorige in plaats
+# van er een volledige set entries bij te zetten.
+# De thread start bij de eerste registratie, dus zodra de server het
+# eerste script draait, en kijkt daarna om de OPWARM_INTERVAL seconden
+# of een bronbestand gewijzigd is (enkel een stat(); zie laad_dataset).
+# Bij een nieuwe versie worden alle opwarmers opnieuw aangeroepen.
+#
+# Zo wacht de eerste gebruiker (en de eerste render na een nieuwe
+# versie) niet op het opbouwen; een sessie die toch vroeger komt, wacht
+# gewoon op dezelfde lock / cache-entry in plaats van dubbel te bouwen.
+# ============================================================
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import traceback
+from typing import Any, Callable
+
+from schade_data import Dataset, laad_dataset
+
+OPWARMEN = os.getenv("SCHADE_OPWARMEN", "1").strip().lower() not in {"0", "false", "no"}
+OPWARM_INTERVAL = float(os.getenv("SCHADE_OPWARM_INTERVAL", "30"))
+
+Opwarmer = Callable[[Dataset, "Dataset | None"], Any]
+
+_opwarmers: dict[str, Opwarmer] = {}
+_gewarmd: dict[str, Dataset] = {}    # naam → laatst opgewarmde dataset
+_status: dict[str, Any] = {"versie": None, "klaar": None, "duur": {}, "fouten": {}}
+_lock = threading.Lock()
+_klaar = threading.Condition(_lock)
+_wekker = threading.Event()
+_draad: threading.Thread | None = None
+
+
+def registreer(naam: str, opwarmer: Opwarmer) -> None:
+    """
+    Registreer (of vervang) opwarmer `naam` en start de thread indien nodig.
+    Goedkoop om bij elke rerun aan te roepen: een al opgewarmde opwarmer
+    wordt pas bij een nieuwe dataset-versie opnieuw aangeroepen.
+    """
+    if not OPWARMEN:
+        return
+    with _lock:
+        nieuw = naam not in _opwarmers
+        _opwarmers[naam] = opwarmer
+    if nieuw:
+        _wekker.set()
+    start()
+
+
+def start() -> None:
+    """Start de opwarm-thread van dit proces (één keer)."""
+    global _draad
+    if not OPWARMEN:
+        return
+    with _lock:
+        if _draad is not None and _draad.is_alive():
+            return
+        _draad = threading.Thread(target=_lus, name="schade-opwarmen", daemon=True)
+        _draad.start()
+
+
+def _versie(naam: str) -> str | None:
+    ds = _gewarmd.get(naam)
+    return ds.versie if ds is not None else None
+
+
+def _ronde() -> None:
+    ds = laad_dataset()
+    with _lock:
+        te_doen = [(n, f) for n, f in _opwarmers.items() if _versie(n) != ds.versie]
+    for naam, opwarmer in te_doen:
+        vorige = _gewarmd.get(naam)
+        t0 = time.perf_counter()
+        fout = None
+        try:
+            opwarmer(ds, vorige)
+        except Exception:
+            # de app bouwt dan zelf (en toont de fout); niet opnieuw proberen tot een nieuwe versie
+            fout = traceback.format_exc(limit=3)
+        with _klaar:
+            _gewarmd[naam] = ds
+            _status["duur"][naam] = round(time.perf_counter() - t0, 3)
+            if fout:
+                _status["fouten"][naam] = fout
+            else:
+                _status["fouten"].pop(naam, None)
+    with _klaar:
+        _status["versie"] = ds.versie
+        _status["fouten"].pop("dataset", None)
+        if te_doen:
+            _status["klaar"] = time.time()
+        _klaar.notify_all()
+
+
+def _lus() -> None:
+    while True:
+        _wekker.clear()
+        try:
+            _ronde()
+        except Exception:
+            # bv. bronbestand (tijdelijk) weg of half geschreven: volgende ronde opnieuw
+            with _klaar:
+                _status["fouten"]["dataset"] = traceback.format_exc(limit=3)
+                _klaar.notify_all()
+        _wekker.wait(OPWARM_INTERVAL)
+
+
+def wacht(timeout: float | None = None) -> bool:
+    """
+    Wacht tot alle geregistreerde opwarmers voor de huidige dataset-versie
+    gedraaid hebben (voor benchmarks en scripts). False bij een timeout of
+    als opwarmen uit staat.
+    """
+    if not OPWARMEN:
+        return False
+    _wekker.set()
+    einde = None if timeout is None else time.monotonic() + timeout
+    with _klaar:
+        while True:
+            versie = _status["versie"]
+            if versie is not None and all(_versie(n) == versie for n in _opwarmers):
+                return True
+            rest = None if einde is None else einde - time.monotonic()
+            if rest is not None and rest <= 0:
+                return False
+            _klaar.wait(rest)
+
+
+def status() -> dict[str, Any]:
+    """Laatst opgewarmde versie, duur per opwarmer (s) en eventuele fouten."""
+    with _lock:
+        return {
+            "versie": _status["versie"],
+            "klaar": _status["klaar"],
+            "duur": dict(_status["duur"]),
+            "fouten": dict(_status["fouten"]),
+            "opwarmers": sorted(_opwarmers),
+        }
@@ -0,0 +1,200 @@
+# schade_overzicht.py
+# ============================================================
+# Samenvattingen per selectie (geen Streamlit nodig).
+#
+# De tellingen achter de tabs van historie.py: per chauffeur, per
+# voertuigtype, per locatie en de coachingstatus per P-nr, uit de
+# telkubus (schade_kubus) en de bitmaps (schade_index) over BRON. Een
+# selectie ("snede") is per dimensie een lijst gekozen waarden, None =
+# geen filter: teamcoach, locatie, voertuig, kwartaal.
+#
+# historie.py toont ze per sessie; rapporten.py schrijft ze per
+# teamcoach weg (batch, zonder Streamlit-server).
+# ============================================================
+
+from __future__ import annotations
+
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from schade_data import Dataset
+from schade_index import BitmapIndex
+from schade_kubus import Kubus
+
+
+def historie_kubus(bron: pd.DataFrame) -> Kubus:
+    """Telkubus over BRON: de sidebar-filters + de dimensies van de tabs."""
+    return Kubus({
+        "teamcoach": bron["teamcoach_disp"],
+        "locatie": bron["Locatie_disp"],
+        "voertuig": bron["BusTram_disp"],
+        "kwartaal": bron["KwartaalP"],
+        "maand": bron["Datum"].dt.to_period("M"),
+        "chauffeur": bron["volledige naam"],
+        "dienstnummer": bron["dienstnummer"],
+    }, datum=bron["Datum"])
+
+
+def historie_bitmaps(bron: pd.DataFrame) -> BitmapIndex:
+    """Bitmaps per sidebar-filterwaarde → rijposities in BRON."""
+    return BitmapIndex({
+        "teamcoach": bron["teamcoach_disp"],
+        "locatie": bron["Locatie_disp"],
+        "voertuig": bron["BusTram_disp"],
+        "kwartaal": bron["KwartaalP"],
+    })
+
+
+def extract_url(x) -> str | None:
+    if pd.isna(x):
+        return None
+    s = str(x).strip()
+    if s.startswith(("http://", "https://")):
+        return s
+    m = re.search(r'HYPERLINK\(\s*"([^"]+)"', s, flags=re.IGNORECASE)
+    return m.group(1) if m else None
+
+
+# ============================================================
+# COACHING
+# ============================================================
+def coaching_pnrs(coachings: pd.DataFrame) -> tuple[set, set]:
+    """(voltooid, lopend): de P-nrs per blad van de coachingslijst (zie bouw_coachings)."""
+    voltooid = coachings.loc[coachings["status"].eq("Voltooid"), "pnr"]
+    lopend = coachings.loc[coachings["status"].eq("Coaching"), "pnr"]
+    return set(voltooid), set(lopend)
+
+
+def coachingstatus(pnrs: list[str], lopend: set, voltooid: set) -> list[str]:
+    """Per P-nr: "Beide", "Lopend", "Voltooid" of "Niet aangevraagd"."""
+    in_l = pd.Index(pnrs).isin(lopend)
+    in_v = pd.Index(pnrs).isin(voltooid)
+    return np.select(
+        [in_l & in_v, in_l, in_v], ["Beide", "Lopend", "Voltooid"], default="Niet aangevraagd"
+    ).tolist()
+
+
+def naam_badge(chauffeurs: pd.DataFrame, pnrs: list[str]) -> list[str]:
+    """Badge + naam uit de chauffeursdimensie (onbekend → het nummer zelf)."""
+    dim = chauffeurs.reindex(pnrs)
+    naam = dim["naam"].fillna(pd.Series(pnrs, index=dim.index, dtype="string"))
+    return (dim["badge"].fillna("") + naam).tolist()
+
+
+# ============================================================
+# TELLINGEN (uit de kubus)
+# ============================================================
+def chauffeur_telling(kubus: Kubus, **snede) -> pd.DataFrame:
+    """chauffeur_raw + aantal, meeste schades eerst."""
+    return (
+        kubus.tel("chauffeur", **snede)
+        .sort_values(ascending=False)
+        .reset_index(name="aantal")
+        .rename(columns={"chauffeur": "chauffeur_raw"})
+    )
+
+
+def voertuig_telling(kubus: Kubus, **snede) -> pd.Series:
+    """Aantal per voertuigtype, meeste eerst (gelijke aantallen in labelvolgorde)."""
+    return kubus.tel("voertuig", **snede).sort_values(ascending=False, kind="stable")
+
+
+def locatie_samenvatting(kubus: Kubus, **snede) -> pd.DataFrame:
+    """Per locatie: Schades, Unieke_chauffeurs, Eerste en Laatste datum."""
+    per_loc = kubus.samenvatting("locatie", **snede)
+    per_ch = kubus.tel(("locatie", "dienstnummer"), **snede)
+    uniek = per_ch[per_ch.index.get_level_values("dienstnummer").notna()].groupby(level="locatie").size()
+    return pd.DataFrame({
+        "Locatie": per_loc.index,
+        "Schades": per_loc["aantal"].to_numpy(),
+        "Unieke_chauffeurs": uniek.reindex(per_loc.index, fill_value=0).to_numpy(),
+        "Eerste": per_loc["eerste"].to_numpy(),
+        "Laatste": per_loc["laatste"].to_numpy(),
+    })
+
+
+def periode(eerste: pd.Series, laatste: pd.Series) -> pd.Series:
+    """"dd-mm-jjjj – dd-mm-jjjj", of "—" als een van beide ontbreekt."""
+    tekst = eerste.dt.strftime("%d-%m-%Y") + " – " + laatste.dt.strftime("%d-%m-%Y")
+    return tekst.where(eerste.notna() & laatste.notna(), "—").astype(object)
+
+
+# ============================================================
+# RAPPORT PER TEAMCOACH
+# ============================================================
+def teamcoach_rapport(ds: Dataset, kubus: Kubus, bitmaps: BitmapIndex, teamcoach: str,
+                      kwartalen: list[str] | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Het overzicht van één teamcoach (tabbladnaam → tabel), zoals in
+    historie.py met enkel die teamcoach (en eventueel kwartalen) gekozen:
+    Overzicht, Chauffeurs (met coachingstatus), Locaties, Voertuigen en
+    de Schadegevallen zelf (nieuwste eerst).
+    """
+    snede = dict(
+        teamcoach=[teamcoach],
+        kwartaal=pd.PeriodIndex(kwartalen, freq="Q") if kwartalen else None,
+    )
+    voltooid, lopend = coaching_pnrs(ds.coachings)
+
+    per_pnr = kubus.samenvatting("dienstnummer", **snede)
+    per_pnr = per_pnr[per_pnr.index.notna()].sort_values("aantal", ascending=False, kind="stable")
+    pnrs = per_pnr.index.astype(str).tolist()
+    beoordeling = ds.chauffeurs["beoordeling"].reindex(pnrs)
+    chauffeurs = pd.DataFrame({
+        "Dienstnr": pnrs,
+        "Naam": naam_badge(ds.chauffeurs, pnrs),
+        "Schades": per_pnr["aantal"].to_numpy(),
+        "Periode": periode(per_pnr["eerste"], per_pnr["laatste"]).to_numpy(),
+        "Status (coachinglijst)": coachingstatus(pnrs, lopend, voltooid),
+        "Beoordeling": beoordeling.fillna("").to_numpy(),
+    })
+
+    loc = locatie_samenvatting(kubus, **snede)
+    loc = loc.assign(Periode=periode(loc["Eerste"], loc["Laatste"]))
+    locaties = (
+        loc[["Locatie", "Schades", "Unieke_chauffeurs", "Periode"]]
+        .sort_values("Schades", ascending=False, kind="stable").reset_index(drop=True)
+    )
+    voertuigen = voertuig_telling(kubus, **snede).rename_axis("Voertuigtype").reset_index(name="Schades")
+
+    bron = ds.bron
+    rijen = bitmaps.rijen(**snede)
+    volgorde = bron["Datum"].iloc[rijen].sort_values(ascending=False, kind="stable").index   # = rijposities
+    deel = bron.iloc[volgorde]
+    link = deel["Link"] if "Link" in deel.columns else pd.Series(pd.NA, index=deel.index, dtype="string")
+    schades = pd.DataFrame({
+        "Datum": deel["Datum"].dt.date,
+        "Dienstnr": deel["dienstnummer"],
+        "Chauffeur": deel["volledige naam_disp"],
+        "Locatie": deel["Locatie_disp"],
+        "Voertuig": deel["BusTram_disp"],
+        "Link": link.map(extract_url).fillna(link),   # geen URL → de tekst uit BRON
+    }).reset_index(drop=True)
+
+    totaal = len(rijen)
+    overzicht = pd.DataFrame({
+        "Gegeven": [
+            "Teamcoach", "Kwartalen", "Schadegevallen", "Chauffeurs met schade",
+            "Gemiddeld aantal schades", "Lopende coaching", "Voltooide coaching", "Gemaakt op",
+        ],
+        "Waarde": [
+            teamcoach,
+            ", ".join(kwartalen) if kwartalen else "alle",
+            totaal,
+            len(chauffeurs),
+            round(totaal / max(1, len(chauffeurs)), 2),
+            int(pd.Index(pnrs).isin(lopend).sum()),
+            int(pd.Index(pnrs).isin(voltooid).sum()),
+            datetime.now().strftime("%d-%m-%Y %H:%M"),
+        ],
+    })
+    return {
+        "Overzicht": overzicht.astype({"Waarde": str}),
+        "Chauffeurs": chauffeurs,
+        "Locaties": locaties,
+        "Voertuigen": voertuigen,
+        "Schadegevallen": schades,
+    }
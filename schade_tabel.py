@@ -0,0 +1,96 @@
+# schade_tabel.py
+# ============================================================
+# Tabellen en exports voor de Streamlit-apps.
+#
+# Zoekresultaten komen als rijposities uit de indexen (schade_index).
+# Enkel de rijen van de zichtbare pagina worden opgebouwd en naar de
+# browser gestuurd (één st.dataframe = één Arrow-payload), samen met het
+# totaal. Payload en rendertijd blijven zo begrensd, hoe breed de
+# zoekopdracht ook is.
+#
+# Downloadknoppen maken hun bestand pas bij een klik (schade_export).
+# ============================================================
+
+from __future__ import annotations
+
+import os
+from functools import partial
+from typing import Callable, Hashable
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from schade_export import EXPORT_FORMATEN, Tabel, als_bestand, zonder_interne_kolommen
+
+PAGINA_GROOTTE = int(os.getenv("SCHADE_PAGINA_GROOTTE", "50"))
+
+
+def pagina_posities(posities: np.ndarray, pagina: int, grootte: int = PAGINA_GROOTTE) -> np.ndarray:
+    """De rijposities van pagina `pagina` (vanaf 1)."""
+    start = (pagina - 1) * grootte
+    return posities[start:start + grootte]
+
+
+def gepagineerde_tabel(
+    key: str,
+    posities: np.ndarray,
+    rijen_voor: Callable[[np.ndarray], pd.DataFrame],
+    *,
+    sleutel: Hashable = None,
+    grootte: int = PAGINA_GROOTTE,
+    **dataframe_kwargs,
+) -> None:
+    """
+    Toon `posities` (in weergavevolgorde) per pagina van `grootte` rijen.
+    rijen_voor(deel) bouwt de tabel voor enkel die posities. Verandert
+    `sleutel` (bv. de zoekterm + jaarfilter), dan begint de tabel weer op
+    pagina 1. De overige argumenten gaan naar st.dataframe.
+    """
+    totaal = len(posities)
+    paginas = max(1, -(-totaal // grootte))
+    k_pagina, k_sleutel = f"{key}_pagina", f"{key}_sleutel"
+    if st.session_state.get(k_sleutel) != sleutel:
+        st.session_state[k_sleutel] = sleutel
+        st.session_state[k_pagina] = 1
+    pagina = min(max(1, int(st.session_state.get(k_pagina, 1))), paginas)
+
+    if paginas > 1:
+        st.session_state[k_pagina] = pagina
+        c1, c2 = st.columns([1, 3])
+        pagina = int(c1.number_input("Pagina", min_value=1, max_value=paginas, step=1, key=k_pagina))
+        eerste = (pagina - 1) * grootte + 1
+        c2.caption(f"Rijen {eerste}–{min(totaal, eerste + grootte - 1)} van {totaal} · pagina {pagina}/{paginas}")
+
+    st.dataframe(rijen_voor(pagina_posities(posities, pagina, grootte)), **dataframe_kwargs)
+
+
+def exportknoppen(
+    label: str,
+    tabellen: dict[str, Tabel],
+    bestandsnaam: str,
+    *,
+    key: str,
+    formaten: tuple[str, ...] = ("csv", "parquet", "xlsx"),
+    help: str | None = None,
+) -> None:
+    """
+    Eén downloadknop per formaat. Het bestand wordt pas gemaakt als erop
+    geklikt wordt (callable als data), niet bij elke rerun; een klik
+    herstart de app niet. Het wordt op schijf opgebouwd (als_bestand);
+    Streamlit leest het afgewerkte bestand één keer in het geheugen om het
+    te serveren. Interne _-kolommen gaan nooit mee. CSV/Parquet: precies
+    één tabel.
+    """
+    tabellen = {naam: zonder_interne_kolommen(tabel) for naam, tabel in tabellen.items()}
+    for kol, formaat in zip(st.columns(len(formaten)), formaten):
+        naam, mime, ext = EXPORT_FORMATEN[formaat]
+        kol.download_button(
+            f"⬇️ {label} ({naam})",
+            partial(als_bestand, tabellen, formaat),
+            file_name=f"{bestandsnaam}{ext}",
+            mime=mime,
+            key=f"{key}_{formaat}",
+            help=help,
+            on_click="ignore",
+        )